@@ -2,6 +2,7 @@
 Configuration de l'application Flask
 """
 import os
+import tempfile
 
 basedir = os.path.abspath(os.path.dirname(__file__))
 
@@ -22,6 +23,45 @@ class Config:
     
     # Pagination
     ITEMS_PER_PAGE = 20
+    API_PAGE_SIZE = 100  # Taille de page par défaut des listes de l'API (pagination par curseur)
+    API_MAX_PAGE_SIZE = 1000
+    
+    # Durée de vie (secondes) du cache des données communes des templates
+    # (année courante, fils d'annonces, analyses par matière), 0 = désactivé
+    CONTEXT_CACHE_TTL = int(os.environ.get('CONTEXT_CACHE_TTL') or 600)
+    
+    # Durée de vie (secondes) du cache des utilisateurs connectés, 0 = désactivé
+    USER_CACHE_TTL = int(os.environ.get('USER_CACHE_TTL') or 300)
+    
+    # Génération des bulletins par lots (nombre de processus, 0 = tous les cœurs)
+    BULLETIN_WORKERS = int(os.environ.get('BULLETIN_WORKERS') or 0) or None
+    
+    # Import des listes d'élèves (processus de hachage des mots de passe, 0 = tous les cœurs)
+    IMPORT_WORKERS = int(os.environ.get('IMPORT_WORKERS') or 0) or None
+    
+    # Cache disque des bulletins PDF (taille maximale en octets)
+    BULLETIN_CACHE_DIR = os.environ.get('BULLETIN_CACHE_DIR') or \
+        os.path.join(basedir, 'gestion_scolaire', 'cache', 'bulletins')
+    BULLETIN_CACHE_MAX_BYTES = int(os.environ.get('BULLETIN_CACHE_MAX_BYTES') or 200 * 1024 * 1024)
+    
+    # Profilage SQL par requête (en-têtes X-SQL-*, page /admin/perf)
+    SQL_PROFILING = os.environ.get('SQL_PROFILING', 'false').lower() in ['true', 'on', '1']
+    SQL_SLOW_QUERY_MS = float(os.environ.get('SQL_SLOW_QUERY_MS') or 100)
+    SQL_PROFILE_TOP = 20  # Instructions les plus lentes conservées
+    SQL_QUERY_BUDGET = int(os.environ.get('SQL_QUERY_BUDGET') or 0) or None  # Requêtes max par route
+    SQL_QUERY_BUDGETS = {}  # Budgets par endpoint, ex: {'parent.dashboard': 10}
+    SQL_QUERY_BUDGET_STRICT = False  # Lever QueryBudgetExceeded au lieu d'avertir
+    
+    # Journal d'audit écrit par lots en arrière-plan (False = écriture synchrone)
+    AUDIT_ASYNC = os.environ.get('AUDIT_ASYNC', 'true').lower() in ['true', 'on', '1']
+    AUDIT_BATCH_SIZE = 200  # Événements insérés par transaction
+    AUDIT_FLUSH_INTERVAL = 1.0  # Attente maximale (secondes) avant l'écriture d'un lot incomplet
+    AUDIT_QUEUE_SIZE = 10000  # Au-delà, les événements sont écrits immédiatement
+    
+    # Rétention du journal d'audit (mois entiers conservés en base) et archives mensuelles
+    AUDIT_RETENTION_MONTHS = int(os.environ.get('AUDIT_RETENTION_MONTHS') or 12)
+    AUDIT_ARCHIVE_DIR = os.environ.get('AUDIT_ARCHIVE_DIR') or \
+        os.path.join(basedir, 'gestion_scolaire', 'archives', 'audit')
     
     @staticmethod
     def init_app(app):
@@ -39,6 +79,10 @@ class TestingConfig(Config):
     """Configuration de test"""
     TESTING = True
     SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
+    SQL_QUERY_BUDGET_STRICT = True
+    AUDIT_ASYNC = False
+    BULLETIN_CACHE_DIR = os.path.join(tempfile.gettempdir(), 'gestion_scolaire_test', 'bulletins')
+    AUDIT_ARCHIVE_DIR = os.path.join(tempfile.gettempdir(), 'gestion_scolaire_test', 'audit')
 
 
 class ProductionConfig(Config):
@@ -58,28 +58,39 @@ def create_app(config_name='development'):
     app.register_blueprint(parent_bp, url_prefix='/parent')
     app.register_blueprint(api_bp, url_prefix='/api')
     
-    # Charger le user loader
-    from gestion_scolaire.models import User
+    # Commandes CLI
+    from gestion_scolaire.commands import register_commands
+    register_commands(app)
+    
+    # Profilage SQL par requête (optionnel)
+    if app.config.get('SQL_PROFILING'):
+        from gestion_scolaire.profiling import init_profiling
+        init_profiling(app)
+    
+    # Charger le user loader (principal en cache, voir user_cache.py)
+    from gestion_scolaire.user_cache import load_principal
     
     @login_manager.user_loader
     def load_user(user_id):
-        return db.session.get(User, int(user_id))
+        return load_principal(int(user_id))
     
     # Context processors globaux
     @app.context_processor
     def utility_processor():
         """Fonctions utilitaires disponibles dans tous les templates"""
-        from gestion_scolaire.models import AcademicYear, Announcement
+        from flask_login import current_user
+        from gestion_scolaire.cache import current_year_name
+        from gestion_scolaire.announcements import announcement_feed
         from datetime import datetime
         
+        # Servis par le cache partagé (voir cache.py), invalidés par les routes admin
         def get_current_year():
-            year = AcademicYear.query.filter_by(is_current=True).first()
-            return year.name if year else "2024-2025"
+            return current_year_name()
         
         def get_recent_announcements(limit=5):
-            return Announcement.query.filter_by(is_active=True)\
-                .order_by(Announcement.created_at.desc())\
-                .limit(limit).all()
+            if not current_user.is_authenticated:
+                return []
+            return announcement_feed(current_user, limit)
         
         def now():
             return datetime.now()
@@ -0,0 +1,143 @@
+"""
+Annonces - Fil d'annonces par public
+
+Une annonce est visible si elle est active, non expirée et destinée à tous
+ou au rôle de l'utilisateur. Une annonce ciblée sur une classe n'est
+montrée qu'aux élèves de la classe et à leurs parents ; enseignants et
+administrateurs les voient toutes (l'administration voit tous les publics).
+
+Les listes courtes (tableaux de bord, templates) lisent un fil (rôle,
+classe) des ANNOUNCEMENT_FEED_SIZE annonces les plus récentes, chargé en
+une requête appuyée sur les index d'Announcement puis conservé dans le
+cache partagé ; les routes d'administration l'invalident à chaque
+création, modification ou suppression. L'expiration est filtrée en SQL au
+chargement et de nouveau à la lecture, un fil pouvant rester en cache après
+l'échéance d'une annonce.
+
+La page des annonces liste toutes les annonces visibles, paginées, par une
+requête directe avec les mêmes règles (announcement_page).
+"""
+from collections import namedtuple
+from datetime import datetime
+from flask import current_app
+from sqlalchemy.orm import joinedload
+from gestion_scolaire import db
+from gestion_scolaire.cache import get_shared_cache
+from gestion_scolaire.models import Announcement, User
+
+ANNOUNCEMENT_FEED_SIZE = 20  # Annonces conservées par fil ; les listes courtes en demandent moins
+ANNOUNCEMENT_FEEDS_KEY = 'announcement_feeds'
+
+# Public (target_audience) propre à chaque rôle, en plus de 'all'
+ROLE_AUDIENCES = {'student': 'students', 'teacher': 'teachers', 'parent': 'parents'}
+# Rôles pour lesquels le ciblage par classe restreint la visibilité
+CLASS_SCOPED_ROLES = ('student', 'parent')
+
+# Annonce détachée de la session : utilisable dans n'importe quelle requête
+AnnouncementView = namedtuple('AnnouncementView', [
+    'id', 'title', 'content', 'priority', 'target_audience', 'target_class_id',
+    'author_name', 'created_at', 'expires_at'
+])
+
+
+def _visible(query, role, class_ids):
+    """Restreint une requête sur Announcement aux annonces visibles pour le rôle et les classes"""
+    query = query.filter(Announcement.is_active == True)\
+        .filter((Announcement.expires_at.is_(None)) | (Announcement.expires_at > datetime.utcnow()))
+
+    audience = ROLE_AUDIENCES.get(role)
+    if audience:
+        query = query.filter(Announcement.target_audience.in_(['all', audience]))
+    if role in CLASS_SCOPED_ROLES:
+        if class_ids:
+            query = query.filter((Announcement.target_class_id.is_(None)) |
+                                 (Announcement.target_class_id.in_(class_ids)))
+        else:
+            query = query.filter(Announcement.target_class_id.is_(None))
+    return query
+
+
+def _load_feed(role, class_id):
+    """Annonces visibles pour (rôle, classe), les plus récentes d'abord"""
+    query = db.session.query(
+        Announcement.id, Announcement.title, Announcement.content, Announcement.priority,
+        Announcement.target_audience, Announcement.target_class_id,
+        User.first_name, User.last_name, User.username,
+        Announcement.created_at, Announcement.expires_at
+    ).outerjoin(User, User.id == Announcement.author_id)
+    query = _visible(query, role, [class_id] if class_id else [])
+
+    rows = query.order_by(Announcement.created_at.desc(), Announcement.id.desc())\
+        .limit(ANNOUNCEMENT_FEED_SIZE).all()
+
+    return tuple(
+        AnnouncementView(
+            row.id, row.title, row.content, row.priority, row.target_audience,
+            row.target_class_id,
+            f'{row.first_name} {row.last_name}' if row.first_name and row.last_name else row.username,
+            row.created_at, row.expires_at
+        )
+        for row in rows
+    )
+
+
+def audience_feed(role, class_id=None):
+    """Fil (rôle, classe) servi par le cache partagé (chargé au premier appel)"""
+    if role not in CLASS_SCOPED_ROLES:
+        class_id = None
+    feeds = get_shared_cache().get_or_set(ANNOUNCEMENT_FEEDS_KEY, dict)
+    key = (role, class_id)
+    feed = feeds.get(key)
+    if feed is None:
+        feed = _load_feed(role, class_id)
+        feeds[key] = feed
+    return feed
+
+
+def _user_class_ids(user):
+    """Classes qui déterminent le fil : classe de l'élève, classes des enfants d'un parent"""
+    if user.role == 'student':
+        return [user.current_class_id] if user.current_class_id else []
+    if user.role == 'parent' and user.children_ids:
+        return [class_id for (class_id,) in db.session.query(User.current_class_id)
+                .filter(User.id.in_(user.children_ids), User.current_class_id.isnot(None))
+                .distinct().all()]
+    return []
+
+
+def announcement_feed(user, limit=None):
+    """
+    Annonces visibles par l'utilisateur, les plus récentes d'abord.
+
+    Un parent dont les enfants sont dans plusieurs classes reçoit la fusion
+    des fils de ces classes.
+    """
+    class_ids = _user_class_ids(user)
+    if len(class_ids) > 1:
+        merged = {a.id: a for class_id in class_ids for a in audience_feed(user.role, class_id)}
+        feed = sorted(merged.values(), key=lambda a: (a.created_at, a.id), reverse=True)
+    else:
+        feed = audience_feed(user.role, class_ids[0] if class_ids else None)
+
+    now = datetime.utcnow()
+    feed = [a for a in feed if a.expires_at is None or a.expires_at > now]
+    return feed[:limit] if limit else feed
+
+
+def announcement_page(user, page=1, per_page=None):
+    """
+    Page des annonces visibles par l'utilisateur, les plus récentes d'abord
+    (requête directe, sans cache ni limite de fil).
+
+    Returns:
+        Pagination d'objets Announcement (auteur chargé)
+    """
+    query = _visible(Announcement.query.options(joinedload(Announcement.author)),
+                     user.role, _user_class_ids(user))
+    return query.order_by(Announcement.created_at.desc(), Announcement.id.desc())\
+        .paginate(page=page, per_page=per_page or current_app.config['ITEMS_PER_PAGE'], error_out=False)
+
+
+def invalidate_announcements():
+    """À appeler après création, modification ou suppression d'une annonce"""
+    get_shared_cache().invalidate(ANNOUNCEMENT_FEEDS_KEY)
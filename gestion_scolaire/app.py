@@ -4,8 +4,8 @@ from flask_login import LoginManager, UserMixin, login_user, login_required, log
 from werkzeug.security import generate_password_hash, check_password_hash
 import os
 from datetime import datetime
-import tempfile
-from gestion_scolaire.pdf_generator import generate_bulletin_pdf
+from gestion_scolaire.pdf_generator import generate_bulletin_pdf, new_pdf_buffer
+from gestion_scolaire.ranking import compute_class_ranking
 import logging
 
 app = Flask(__name__)
@@ -621,32 +621,20 @@ def generate_report():
     rank_1_moy_val = "N/A"
     
     if current_user.current_class and requested_period:
-        students_in_class = User.query.filter_by(current_class_id=current_user.current_class_id, role='student').all()
-        student_averages = []
-        for student_in_class in students_in_class:
-            grades_for_student_in_class = Grade.query.filter_by(student_id=student_in_class.id, period=requested_period).all()
-            if grades_for_student_in_class: # Only consider students with grades in this period
-                # Convert to the dictionary format for calculate_moy_ponderee
-                formatted_grades_for_calc = [
-                    {'moy_cl': g.moy_cl, 'n_compo': g.n_compo, 'coef': g.coef}
-                    for g in grades_for_student_in_class
-                ]
-                avg = calculate_moy_ponderee(formatted_grades_for_calc)
-                student_averages.append({'student_id': student_in_class.id, 'average': avg})
+        # Single grouped query over the whole class (see gestion_scolaire.ranking)
+        ranking = compute_class_ranking(
+            current_user.current_class_id, requested_period,
+            session=db.session, grade_model=Grade, user_model=User
+        )
         
-        if student_averages:
-            # Sort students by average descending
-            student_averages.sort(key=lambda x: x['average'], reverse=True)
-            
+        if ranking.averages:
             # Find rank of current_user
-            for i, data in enumerate(student_averages):
-                if data['student_id'] == current_user.id:
-                    current_rank = f"{i + 1}er/ère"
-                    break # Found current student's rank
+            user_rank = ranking.rank_of(current_user.id)
+            if user_rank is not None:
+                current_rank = f"{user_rank}er/ère"
             
             # Get average of the top student (rank 1)
-            if student_averages: # Check again in case current student had no grades and list became empty
-                 rank_1_moy_val = f"{student_averages[0]['average']:.2f}/20".replace('.',',')
+            rank_1_moy_val = f"{ranking.stats['highest']:.2f}/20".replace('.',',')
 
     summary_data = {
         'appr_p1': get_appreciation_for_average(moy_p1_calc), 
@@ -661,33 +649,21 @@ def generate_report():
     }
     # --- End of Data Retrieval and Structuring ---
     
-    # Create a temporary file for the PDF
-    with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as temp_file:
-        pdf_path = temp_file.name
-        # CALL THE NEW FUNCTION with the new data structure
-        generate_bulletin_pdf(pdf_path, student_data, grades_part1, grades_part2, summary_data)
-        
-        try:
-            response = send_file(
-                pdf_path,
-                as_attachment=True,
-                download_name=f'report_card_{current_user.username}.pdf'
-            )
-            # Delete the file after it's been sent
-            @response.call_on_close
-            def cleanup():
-                try:
-                    os.remove(pdf_path)
-                except Exception as e:
-                    app.logger.error(f"Error deleting temporary PDF file: {e}")
-            return response
-        except Exception as e:
-            # Clean up in case of error
-            if os.path.exists(pdf_path):
-                os.remove(pdf_path)
-            app.logger.error(f"Error generating or sending report card for {current_user.username}: {e}", exc_info=True)
-            flash(f'Error generating report card. Please contact support. Error: {e}', 'danger')
-            return redirect(url_for('student_interface'))
+    # Render into memory (spilled to a self-deleting temp file only if very large)
+    try:
+        pdf_buffer = new_pdf_buffer()
+        generate_bulletin_pdf(pdf_buffer, student_data, grades_part1, grades_part2, summary_data)
+        # send_file closes the buffer once the response has been sent
+        return send_file(
+            pdf_buffer,
+            mimetype='application/pdf',
+            as_attachment=True,
+            download_name=f'report_card_{current_user.username}.pdf'
+        )
+    except Exception as e:
+        app.logger.error(f"Error generating or sending report card for {current_user.username}: {e}", exc_info=True)
+        flash(f'Error generating report card. Please contact support. Error: {e}', 'danger')
+        return redirect(url_for('student_interface'))
 
 # School Class Management Routes
 @app.route('/manage_school_classes')
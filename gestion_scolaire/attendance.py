@@ -0,0 +1,151 @@
+"""
+Présences - Enregistrement des appels et statistiques
+
+Un appel (classe, jour, demi-journée) est écrit avec un nombre constant de
+requêtes : les relevés existants sont chargés en une fois, les insertions et
+mises à jour sont calculées en mémoire puis envoyées en masse.
+
+Les statistiques sont calculées par la base (GROUP BY statut) sans charger
+les relevés individuels.
+"""
+from sqlalchemy import func
+from gestion_scolaire import db
+from gestion_scolaire.models import Attendance, ATTENDANCE_STATUS
+
+
+def save_roll_call(class_id, attendance_date, entries, recorded_by=None, period=''):
+    """
+    Enregistre l'appel d'une classe. Ne fait pas le commit.
+
+    Args:
+        class_id: Classe concernée
+        attendance_date: Jour de l'appel
+        entries: Dict {student_id: (status, reason)}
+        recorded_by: Utilisateur qui fait l'appel
+        period: Demi-journée ('morning', 'afternoon') ou '' pour la journée
+
+    Returns:
+        Dict {'created', 'updated'}
+    """
+    period = period or ''
+
+    existing = dict(
+        db.session.query(Attendance.student_id, Attendance.id).filter(
+            Attendance.class_id == class_id,
+            Attendance.date == attendance_date,
+            Attendance.period == period,
+            Attendance.student_id.in_(entries.keys())
+        ).all()
+    ) if entries else {}
+
+    inserts = []
+    updates = []
+    for student_id, (status, reason) in entries.items():
+        if status not in ATTENDANCE_STATUS:
+            status = 'present'
+        reason = reason or None
+
+        record_id = existing.get(student_id)
+        if record_id:
+            updates.append({'id': record_id, 'status': status, 'reason': reason})
+        else:
+            inserts.append({
+                'student_id': student_id,
+                'class_id': class_id,
+                'date': attendance_date,
+                'period': period,
+                'status': status,
+                'reason': reason,
+                'recorded_by': recorded_by
+            })
+
+    if updates:
+        db.session.bulk_update_mappings(Attendance, updates)
+    if inserts:
+        db.session.bulk_insert_mappings(Attendance, inserts)
+
+    return {'created': len(inserts), 'updated': len(updates)}
+
+
+# ============================================
+# STATISTIQUES
+# ============================================
+
+def _empty_stats():
+    stats = {status: 0 for status in ATTENDANCE_STATUS}
+    stats['total'] = 0
+    stats['rate'] = None
+    return stats
+
+
+def _finalize(stats):
+    """Complète le total et le taux de présence (None si aucun relevé)"""
+    stats['total'] = sum(stats[status] for status in ATTENDANCE_STATUS)
+    stats['rate'] = round(stats['present'] / stats['total'] * 100, 1) if stats['total'] else None
+    return stats
+
+
+def attendance_stats(student_id, month=None):
+    """
+    Nombre de relevés par statut et taux de présence d'un élève.
+
+    Args:
+        student_id: Élève concerné
+        month: Limiter à un mois (1-12), toutes années confondues
+
+    Returns:
+        Dict {'present', 'absent', 'late', 'excused', 'total', 'rate'}
+    """
+    query = db.session.query(Attendance.status, func.count(Attendance.id))\
+        .filter(Attendance.student_id == student_id)
+    if month:
+        query = query.filter(db.extract('month', Attendance.date) == month)
+
+    stats = _empty_stats()
+    for status, count in query.group_by(Attendance.status).all():
+        if status in ATTENDANCE_STATUS:
+            stats[status] = count
+    return _finalize(stats)
+
+
+def attendance_stats_for_students(student_ids):
+    """Statistiques de plusieurs élèves en une requête : {student_id: stats}"""
+    student_ids = set(student_ids)
+    result = {student_id: _empty_stats() for student_id in student_ids}
+    if not student_ids:
+        return result
+
+    rows = db.session.query(Attendance.student_id, Attendance.status, func.count(Attendance.id))\
+        .filter(Attendance.student_id.in_(student_ids))\
+        .group_by(Attendance.student_id, Attendance.status).all()
+    for student_id, status, count in rows:
+        if status in ATTENDANCE_STATUS:
+            result[student_id][status] = count
+
+    for stats in result.values():
+        _finalize(stats)
+    return result
+
+
+def monthly_attendance_stats(student_id):
+    """
+    Statistiques d'un élève mois par mois.
+
+    Returns:
+        Liste de dicts triée par mois, chacun avec 'month' ('AAAA-MM') en plus
+        des champs de attendance_stats
+    """
+    year = db.extract('year', Attendance.date)
+    month = db.extract('month', Attendance.date)
+    rows = db.session.query(year, month, Attendance.status, func.count(Attendance.id))\
+        .filter(Attendance.student_id == student_id)\
+        .group_by(year, month, Attendance.status).all()
+
+    months = {}
+    for row_year, row_month, status, count in rows:
+        key = f'{int(row_year):04d}-{int(row_month):02d}'
+        stats = months.setdefault(key, _empty_stats())
+        if status in ATTENDANCE_STATUS:
+            stats[status] = count
+
+    return [dict(_finalize(months[key]), month=key) for key in sorted(months)]
@@ -0,0 +1,205 @@
+"""
+Journal d'audit asynchrone
+
+Les routes ne commitent plus elles-mêmes les lignes AuditLog : audit_event
+dépose l'événement dans une file en mémoire (bornée, AUDIT_QUEUE_SIZE),
+vidée par un thread d'arrière-plan qui insère les lignes par lots
+(AUDIT_BATCH_SIZE lignes ou AUDIT_FLUSH_INTERVAL secondes). Une connexion
+ne paie donc plus une transaction d'écriture supplémentaire, et les
+insertions d'audit ne se disputent plus le verrou SQLite avec la saisie
+des notes.
+
+Les événements suivent la transaction de l'appelant : audit_event les
+garde dans la session (session.info) et ils ne sont déposés dans la file
+qu'après son commit ; un rollback les abandonne.
+
+- La date de l'événement est celle de l'appel, pas celle de l'insertion.
+- File pleine : l'événement est écrit immédiatement (aucune perte).
+- Arrêt du processus : la file est vidée (atexit).
+- AUDIT_ASYNC = False (tests) : écriture synchrone, dans la transaction
+  de l'appelant.
+"""
+import atexit
+import json
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+from flask import current_app, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from gestion_scolaire import db
+from gestion_scolaire.models import AuditLog
+
+_STOP = object()
+PENDING_KEY = 'pending_audit_events'
+
+
+def _insert_rows(rows):
+    db.session.execute(AuditLog.__table__.insert(), rows)
+
+
+class AuditWriter:
+    """File d'événements d'audit et thread d'écriture par lots d'une application"""
+
+    def __init__(self, app, batch_size=200, flush_interval=1.0, max_queue=10000):
+        self.app = app
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_queue = max_queue
+        self._lock = threading.Lock()
+        self._queue = None
+        self._thread = None
+        self._pid = None
+        atexit.register(self.close)
+
+    def _ensure_worker(self):
+        """Démarre le thread au premier événement (et après un fork)"""
+        if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+                return
+            self._queue = queue.Queue(self.max_queue)
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='audit-writer', daemon=True)
+            self._thread.start()
+
+    def submit(self, row):
+        """Dépose un événement ; l'écrit immédiatement si la file est pleine"""
+        self._ensure_worker()
+        try:
+            self._queue.put_nowait(row)
+        except queue.Full:
+            self.app.logger.warning('File du journal d\'audit pleine : écriture synchrone')
+            self._write([row])
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            row = self._queue.get()
+            if row is _STOP:
+                self._queue.task_done()
+                break
+            batch = [row]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    row = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                if row is _STOP:
+                    stopping = True
+                    break
+                batch.append(row)
+            try:
+                self._write(batch)
+            finally:
+                for _row in batch:
+                    self._queue.task_done()
+                if stopping:
+                    self._queue.task_done()
+
+    def _write(self, rows):
+        """Insère un lot dans sa propre transaction (contexte d'application dédié)"""
+        with self.app.app_context():
+            try:
+                _insert_rows(rows)
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+                self.app.logger.exception(f'Écriture du journal d\'audit impossible ({len(rows)} événements perdus)')
+
+    def flush(self):
+        """Attend l'écriture de tous les événements déposés"""
+        if self._queue is not None and self._pid == os.getpid() and self._thread.is_alive():
+            self._queue.join()
+
+    def close(self, timeout=5.0):
+        """Vide la file puis arrête le thread (appelé à l'arrêt du processus)"""
+        if self._thread is None or self._pid != os.getpid() or not self._thread.is_alive():
+            return
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+
+
+def get_audit_writer(app=None):
+    """Retourne l'écrivain du journal d'audit de l'application (créé à la demande)"""
+    app = app or current_app._get_current_object()
+    writer = app.extensions.get('audit_writer')
+    if writer is None:
+        writer = AuditWriter(
+            app,
+            batch_size=app.config['AUDIT_BATCH_SIZE'],
+            flush_interval=app.config['AUDIT_FLUSH_INTERVAL'],
+            max_queue=app.config['AUDIT_QUEUE_SIZE']
+        )
+        app.extensions['audit_writer'] = writer
+    return writer
+
+
+def audit_event(action, user_id=None, entity_type=None, entity_id=None, details=None, ip_address=None):
+    """
+    Enregistre une action dans le journal d'audit.
+
+    Args:
+        action: Code de l'action (ex: "user_login", "grade_updated")
+        user_id: Auteur de l'action
+        entity_type, entity_id: Objet concerné
+        details: Texte ou dict (sérialisé en JSON)
+        ip_address: Adresse du client (par défaut celle de la requête courante)
+
+    À appeler avant le commit de l'appelant : l'événement n'est écrit que
+    si la transaction de la session est validée (ajouté à la transaction
+    en mode synchrone, déposé dans la file après le commit en mode
+    asynchrone) et il est abandonné en cas de rollback.
+    """
+    if isinstance(details, (dict, list)):
+        details = json.dumps(details, ensure_ascii=False)
+    if ip_address is None and has_request_context():
+        ip_address = request.remote_addr
+    row = {
+        'user_id': user_id,
+        'action': action,
+        'entity_type': entity_type,
+        'entity_id': entity_id,
+        'details': details,
+        'ip_address': ip_address,
+        'created_at': datetime.utcnow()
+    }
+
+    if not current_app.config.get('AUDIT_ASYNC'):
+        _insert_rows([row])
+        return
+    pending = db.session.info.get(PENDING_KEY)
+    if pending is None:
+        pending = db.session.info[PENDING_KEY] = (get_audit_writer(), [])
+    pending[1].append(row)
+
+
+@event.listens_for(Session, 'after_commit')
+def _submit_pending_events(session):
+    """Dépose dans la file les événements de la transaction validée"""
+    pending = session.info.pop(PENDING_KEY, None)
+    if pending is not None:
+        writer, rows = pending
+        for row in rows:
+            writer.submit(row)
+
+
+@event.listens_for(Session, 'after_soft_rollback')
+def _drop_pending_events(session, previous_transaction):
+    """Abandonne les événements d'une transaction annulée (hors savepoint)"""
+    if not previous_transaction.nested:
+        session.info.pop(PENDING_KEY, None)
+
+
+def flush_audit_log():
+    """Attend l'écriture des événements en file (commandes CLI, tests)"""
+    writer = current_app.extensions.get('audit_writer')
+    if writer is not None:
+        writer.flush()
@@ -0,0 +1,164 @@
+"""
+Archivage du journal d'audit
+
+Les lignes AuditLog plus anciennes que la durée de rétention
+(AUDIT_RETENTION_MONTHS, mois entiers) sont déplacées vers des fichiers
+mensuels compressés (JSON lines + gzip, audit-AAAA-MM.jsonl.gz dans
+AUDIT_ARCHIVE_DIR) : la table reste de taille bornée et sa page
+d'administration rapide, l'historique reste consultable par le lecteur
+d'archives.
+
+Chaque lot est d'abord ajouté au fichier du mois (nouveau membre gzip),
+puis supprimé de la table. Une interruption entre les deux peut dupliquer
+des lignes dans l'archive : le lecteur les ignore (identifiant déjà lu).
+"""
+import gzip
+import json
+import os
+import re
+import time
+from datetime import datetime
+from gestion_scolaire import db
+from gestion_scolaire.models import AuditLog
+
+ARCHIVE_BATCH_SIZE = 5000  # Lignes archivées puis supprimées par transaction
+ARCHIVE_PAGE_SIZE = 50  # Lignes par page du lecteur d'archives
+ARCHIVE_PREFIX = 'audit-'
+ARCHIVE_SUFFIX = '.jsonl.gz'
+MONTH_PATTERN = re.compile(r'^\d{4}-(0[1-9]|1[0-2])$')
+ARCHIVE_COLUMNS = ('id', 'user_id', 'action', 'entity_type', 'entity_id', 'details', 'ip_address', 'created_at')
+
+
+class ArchiveReport:
+    """Bilan d'un archivage"""
+
+    def __init__(self, cutoff):
+        self.cutoff = cutoff
+        self.archived = 0
+        self.months = {}  # 'AAAA-MM' -> lignes archivées
+        self.batches = 0
+        self.elapsed = 0.0
+
+
+def retention_cutoff(months, now=None):
+    """Premier jour du mois, months mois avant le mois courant : les lignes antérieures sont archivées"""
+    now = now or datetime.utcnow()
+    index = now.year * 12 + now.month - 1 - months
+    return datetime(index // 12, index % 12 + 1, 1)
+
+
+def archive_path(archive_dir, month):
+    """Fichier d'archive d'un mois 'AAAA-MM' (ValueError si le mois est invalide)"""
+    if not MONTH_PATTERN.match(month or ''):
+        raise ValueError(f'Mois invalide: {month}')
+    return os.path.join(archive_dir, f'{ARCHIVE_PREFIX}{month}{ARCHIVE_SUFFIX}')
+
+
+def _serialize(row):
+    data = {column: getattr(row, column) for column in ARCHIVE_COLUMNS}
+    data['created_at'] = row.created_at.isoformat()
+    return json.dumps(data, ensure_ascii=False)
+
+
+def archive_audit_logs(months, archive_dir, batch_size=ARCHIVE_BATCH_SIZE, dry_run=False, now=None):
+    """
+    Déplace vers les archives mensuelles les lignes antérieures à la rétention.
+
+    Args:
+        months: Durée de rétention en mois entiers
+        archive_dir: Dossier des archives (créé si besoin)
+        batch_size: Lignes par lot (un fichier écrit puis une transaction de suppression)
+        dry_run: Compter les lignes concernées sans rien écrire ni supprimer
+        now: Date de référence (par défaut maintenant)
+
+    Returns:
+        ArchiveReport
+    """
+    start = time.perf_counter()
+    report = ArchiveReport(retention_cutoff(months, now))
+    table = AuditLog.__table__
+    if not dry_run:
+        os.makedirs(archive_dir, exist_ok=True)
+
+    last_id = 0
+    while True:
+        rows = db.session.query(table)\
+            .filter(table.c.created_at < report.cutoff, table.c.id > last_id)\
+            .order_by(table.c.id).limit(batch_size).all()
+        if not rows:
+            break
+        last_id = rows[-1].id
+
+        by_month = {}
+        for row in rows:
+            by_month.setdefault(row.created_at.strftime('%Y-%m'), []).append(row)
+
+        for month, month_rows in sorted(by_month.items()):
+            report.months[month] = report.months.get(month, 0) + len(month_rows)
+            if dry_run:
+                continue
+            with gzip.open(archive_path(archive_dir, month), 'at', encoding='utf-8') as f:
+                for row in month_rows:
+                    f.write(_serialize(row) + '\n')
+
+        if not dry_run:
+            db.session.execute(table.delete().where(table.c.id.in_([row.id for row in rows])))
+            db.session.commit()
+        report.archived += len(rows)
+        report.batches += 1
+
+    report.elapsed = time.perf_counter() - start
+    return report
+
+
+# ============================================
+# LECTURE DES ARCHIVES
+# ============================================
+
+def list_archives(archive_dir):
+    """Archives disponibles, de la plus récente à la plus ancienne : [{'month', 'size'}]"""
+    if not os.path.isdir(archive_dir):
+        return []
+    archives = []
+    for name in os.listdir(archive_dir):
+        if not (name.startswith(ARCHIVE_PREFIX) and name.endswith(ARCHIVE_SUFFIX)):
+            continue
+        month = name[len(ARCHIVE_PREFIX):-len(ARCHIVE_SUFFIX)]
+        if MONTH_PATTERN.match(month):
+            archives.append({'month': month, 'size': os.path.getsize(os.path.join(archive_dir, name))})
+    archives.sort(key=lambda archive: archive['month'], reverse=True)
+    return archives
+
+
+def read_archive(archive_dir, month):
+    """Lignes archivées d'un mois (dicts, created_at en datetime), sans doublons"""
+    path = archive_path(archive_dir, month)
+    if not os.path.exists(path):
+        return
+    seen = set()
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        for line in f:
+            if not line.strip():
+                continue
+            entry = json.loads(line)
+            if entry['id'] in seen:
+                continue
+            seen.add(entry['id'])
+            entry['created_at'] = datetime.fromisoformat(entry['created_at'])
+            yield entry
+
+
+def search_archive(archive_dir, month, user_id=None, action=None, page=1, per_page=ARCHIVE_PAGE_SIZE):
+    """
+    Recherche dans l'archive d'un mois, du plus récent au plus ancien.
+
+    Returns:
+        (lignes de la page, nombre total de lignes correspondantes)
+    """
+    entries = [
+        entry for entry in read_archive(archive_dir, month)
+        if (user_id is None or entry['user_id'] == user_id) and (not action or entry['action'] == action)
+    ]
+    entries.sort(key=lambda entry: (entry['created_at'], entry['id']), reverse=True)
+    offset = (max(page, 1) - 1) * per_page
+    return entries[offset:offset + per_page], len(entries)
@@ -0,0 +1,258 @@
+"""
+Banc d'essai des routes critiques
+
+Chaque scénario est rejoué par le client de test Flask sur la base courante
+(de préférence le jeu synthétique, flask generate-data) : latence
+(percentiles p50/p90/p95/p99) et nombre de requêtes SQL par appel. Les
+résultats sont enregistrés en JSON et comparés à une référence pour
+signaler les régressions.
+
+Les scénarios d'écriture (saisie de notes, appel) réécrivent des valeurs
+existantes : ils peuvent être rejoués sans changer les données.
+"""
+import json
+import platform
+import statistics
+import time
+from datetime import datetime
+from gestion_scolaire import db
+from gestion_scolaire.models import User, SchoolClass, Grade, Attendance, parent_student
+from gestion_scolaire.profiling import count_queries, instrument_engine
+
+PERCENTILES = (50, 90, 95, 99)
+DEFAULT_TOLERANCE = 0.20  # Hausse de latence p95 tolérée par rapport à la référence
+BULLETIN_ITERATIONS_DIVISOR = 5  # La génération de bulletins est rejouée moins souvent
+
+
+class Scenario:
+    """Un appel HTTP mesuré, joué sous l'identité d'un utilisateur"""
+
+    def __init__(self, name, user_id, method, url, json_body=None, form=None, iterations_divisor=1):
+        self.name = name
+        self.user_id = user_id
+        self.method = method
+        self.url = url
+        self.json_body = json_body
+        self.form = form
+        self.iterations_divisor = iterations_divisor
+
+    def call(self, client):
+        return client.open(self.url, method=self.method, json=self.json_body, data=self.form)
+
+
+def _percentile(sorted_values, percent):
+    """Percentile par interpolation linéaire sur une liste triée"""
+    if len(sorted_values) == 1:
+        return sorted_values[0]
+    position = (len(sorted_values) - 1) * percent / 100
+    lower = int(position)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (position - lower)
+
+
+def _login(client, user_id):
+    """Ouvre une session Flask-Login sans passer par le formulaire (pas de hachage)"""
+    with client.session_transaction() as session:
+        session['_user_id'] = str(user_id)
+        session['_fresh'] = True
+
+
+# ============================================
+# SCÉNARIOS
+# ============================================
+
+def _largest_class():
+    """Classe qui a le plus d'élèves"""
+    return db.session.query(SchoolClass.id)\
+        .join(User, User.current_class_id == SchoolClass.id)\
+        .filter(User.role == 'student')\
+        .group_by(SchoolClass.id)\
+        .order_by(db.func.count(User.id).desc(), SchoolClass.id).first()
+
+
+def build_scenarios():
+    """
+    Scénarios de référence à partir des données présentes.
+
+    Returns:
+        Liste de Scenario (les scénarios sans données adaptées sont omis)
+    """
+    first = lambda role: db.session.query(User.id).filter_by(role=role).order_by(User.id).limit(1).scalar()
+    admin_id = first('admin')
+    teacher_id = first('teacher')
+    parent_id = db.session.query(parent_student.c.parent_id).order_by(parent_student.c.parent_id).limit(1).scalar()
+    student_id = db.session.query(Grade.student_id).order_by(Grade.student_id).limit(1).scalar()
+
+    scenarios = []
+    for name, user_id, url in [
+        ('admin_dashboard', admin_id, '/admin/dashboard'),
+        ('teacher_dashboard', teacher_id, '/teacher/dashboard'),
+        ('student_dashboard', student_id, '/student/dashboard'),
+        ('parent_dashboard', parent_id, '/parent/dashboard')
+    ]:
+        if user_id:
+            scenarios.append(Scenario(name, user_id, 'GET', url))
+
+    largest = _largest_class()
+    if not largest or not admin_id:
+        return scenarios
+    class_id = largest.id
+    scenarios.append(Scenario('class_stats', admin_id, 'GET', f'/api/stats/class/{class_id}'))
+
+    # Grille de notes existante de la classe, période la plus fournie
+    period = db.session.query(Grade.period).join(User, User.id == Grade.student_id)\
+        .filter(User.current_class_id == class_id)\
+        .group_by(Grade.period).order_by(db.func.count(Grade.id).desc()).limit(1).scalar()
+    if period:
+        grades = db.session.query(Grade.student_id, Grade.subject_name, Grade.moy_cl, Grade.n_compo, Grade.coef)\
+            .join(User, User.id == Grade.student_id)\
+            .filter(User.current_class_id == class_id, Grade.period == period).all()
+        scenarios.append(Scenario('grade_entry', teacher_id or admin_id, 'POST', '/api/grades/bulk', json_body={
+            'period': period,
+            'grades': [
+                {'student_id': g.student_id, 'subject_name': g.subject_name,
+                 'moy_cl': g.moy_cl, 'n_compo': g.n_compo, 'coef': g.coef}
+                for g in grades
+            ]
+        }))
+        scenarios.append(Scenario(
+            'bulletin_generation', teacher_id or admin_id, 'GET',
+            f'/teacher/bulletins/generate-all?class_id={class_id}&period={period}&format=zip',
+            iterations_divisor=BULLETIN_ITERATIONS_DIVISOR
+        ))
+
+    # Appel du jour le plus récent de la classe (ou d'aujourd'hui)
+    day = db.session.query(db.func.max(Attendance.date)).filter(Attendance.class_id == class_id).scalar()
+    day = day or datetime.utcnow().date()
+    student_ids = [sid for (sid,) in db.session.query(User.id)
+                   .filter_by(role='student', current_class_id=class_id).all()]
+    form = {'class_id': str(class_id), 'date': day.isoformat()}
+    for index, sid in enumerate(student_ids):
+        form[f'status_{sid}'] = 'absent' if index % 10 == 0 else 'present'
+    scenarios.append(Scenario('attendance_save', teacher_id or admin_id, 'POST', '/teacher/attendance/save', form=form))
+
+    return scenarios
+
+
+# ============================================
+# EXÉCUTION ET COMPARAISON
+# ============================================
+
+def run_scenario(app, scenario, iterations=20, warmup=2):
+    """
+    Rejoue un scénario et mesure chaque appel. Chaque appel a son propre
+    contexte d'application (g, utilisateur connecté, session SQLAlchemy),
+    comme en production, même si la commande CLI en a déjà ouvert un.
+
+    Returns:
+        Dict {'iterations', 'status', 'mean_ms', 'min_ms', 'max_ms', 'p50_ms'..., 'queries'}
+    """
+    iterations = max(1, iterations // scenario.iterations_divisor)
+    client = app.test_client()
+    _login(client, scenario.user_id)
+
+    for _n in range(warmup):
+        with app.app_context():
+            scenario.call(client)
+
+    timings = []
+    queries = []
+    statuses = set()
+    for _n in range(iterations):
+        with app.app_context(), count_queries() as stats:
+            start = time.perf_counter()
+            response = scenario.call(client)
+            response.get_data()
+            timings.append((time.perf_counter() - start) * 1000)
+        queries.append(stats.count)
+        statuses.add(response.status_code)
+
+    timings.sort()
+    result = {
+        'iterations': iterations,
+        'status': sorted(statuses),
+        'mean_ms': round(statistics.fmean(timings), 2),
+        'min_ms': round(timings[0], 2),
+        'max_ms': round(timings[-1], 2),
+        'queries': int(statistics.median(queries))
+    }
+    for percent in PERCENTILES:
+        result[f'p{percent}_ms'] = round(_percentile(timings, percent), 2)
+    return result
+
+
+def dataset_summary():
+    """Volumes de la base mesurée (pour interpréter les résultats)"""
+    return {
+        'students': User.query.filter_by(role='student').count(),
+        'classes': SchoolClass.query.count(),
+        'grades': Grade.query.count(),
+        'attendance': Attendance.query.count()
+    }
+
+
+def run_benchmarks(app, iterations=20, warmup=2, only=None, progress=None):
+    """
+    Exécute les scénarios de référence.
+
+    Args:
+        app: Application Flask (base déjà peuplée)
+        iterations: Appels mesurés par scénario
+        warmup: Appels non mesurés avant la mesure
+        only: Noms des scénarios à exécuter (tous si None)
+        progress: Fonction appelée avec (nom, résultat) après chaque scénario
+
+    Returns:
+        Dict {'meta': {...}, 'results': {nom: mesures}}
+    """
+    instrument_engine(app)
+    with app.app_context():
+        scenarios = [s for s in build_scenarios() if not only or s.name in only]
+        meta = {
+            'created_at': datetime.utcnow().isoformat(timespec='seconds'),
+            'iterations': iterations,
+            'python': platform.python_version(),
+            'database': db.engine.dialect.name,
+            'dataset': dataset_summary()
+        }
+
+    results = {}
+    for scenario in scenarios:
+        results[scenario.name] = run_scenario(app, scenario, iterations, warmup)
+        if progress:
+            progress(scenario.name, results[scenario.name])
+    return {'meta': meta, 'results': results}
+
+
+def compare_results(current, baseline, tolerance=DEFAULT_TOLERANCE):
+    """
+    Compare deux résultats de run_benchmarks.
+
+    Une régression est une latence p95 supérieure de plus de tolerance à la
+    référence, ou un nombre de requêtes SQL en hausse.
+
+    Returns:
+        Liste de dicts {'scenario', 'metric', 'baseline', 'current'}
+    """
+    regressions = []
+    for name, result in current['results'].items():
+        reference = baseline.get('results', {}).get(name)
+        if not reference:
+            continue
+        if result['p95_ms'] > reference['p95_ms'] * (1 + tolerance):
+            regressions.append({'scenario': name, 'metric': 'p95_ms',
+                                'baseline': reference['p95_ms'], 'current': result['p95_ms']})
+        if result['queries'] > reference['queries']:
+            regressions.append({'scenario': name, 'metric': 'queries',
+                                'baseline': reference['queries'], 'current': result['queries']})
+    return regressions
+
+
+def save_results(results, path):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2, ensure_ascii=False)
+
+
+def load_results(path):
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
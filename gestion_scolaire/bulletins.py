@@ -0,0 +1,346 @@
+"""
+Bulletins - Préparation des données et génération par lots
+
+Les données d'une classe entière sont chargées en une seule requête, puis les
+PDF sont rendus en parallèle dans un ProcessPoolExecutor (ReportLab est lié
+au CPU). Le résultat est une archive ZIP ou un PDF unique fusionné.
+"""
+import io
+import os
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from pypdf import PdfReader, PdfWriter
+from gestion_scolaire.models import (
+    User, SchoolClass, Grade, BulletinStructure, StudentPeriodSummary
+)
+from gestion_scolaire.pdf_generator import generate_bulletin_pdf, BulletinRenderer
+from gestion_scolaire.pdf_cache import get_bulletin_cache
+
+DEFAULT_SCHOOL_NAME = 'Lycée Michel ALLAIRE'
+OUTPUT_FORMATS = ['zip', 'pdf']
+
+
+# ============================================
+# PRÉPARATION DES DONNÉES
+# ============================================
+
+def build_grades_table(subjects, grades_dict):
+    """Construit les lignes du tableau de notes pour une liste de matières"""
+    table = []
+    for subject in subjects:
+        grade = grades_dict.get(subject)
+        if grade:
+            row = {
+                'subject': subject,
+                'moy_cl': grade.moy_cl,
+                'n_compo': grade.n_compo,
+                'coef': grade.coef,
+                'mg': grade.average,
+                'moy_coef': grade.weighted_average,
+                'appreciation': grade.appreciation or grade.auto_appreciation()
+            }
+        else:
+            row = {
+                'subject': subject,
+                'moy_cl': '-',
+                'n_compo': '-',
+                'coef': '-',
+                'mg': '-',
+                'moy_coef': '-',
+                'appreciation': '-'
+            }
+        table.append(row)
+    return table
+
+
+def build_bulletin_data(student, class_name, structure, grades, period, rank=None):
+    """
+    Prépare les arguments de generate_bulletin_pdf pour un élève.
+
+    Le résultat ne contient que des types simples afin de pouvoir être
+    transmis à un processus de rendu.
+    """
+    grades_dict = {g.subject_name: g for g in grades}
+
+    student_data = {
+        'name': student.full_name,
+        'class': class_name,
+        'period': period,
+        'school_name': structure.school_name or DEFAULT_SCHOOL_NAME
+    }
+
+    grades_part1 = build_grades_table(structure.get_subjects_part1_list(), grades_dict)
+    grades_part2 = build_grades_table(structure.get_subjects_part2_list(), grades_dict)
+
+    # Calculer le résumé
+    valid_grades = [g for g in grades if g.moy_cl is not None and g.n_compo is not None]
+
+    if valid_grades:
+        total_weighted = sum(g.weighted_average for g in valid_grades)
+        total_coef = sum(g.coef for g in valid_grades)
+        general_average = round(total_weighted / total_coef, 2) if total_coef > 0 else 0
+    else:
+        total_weighted = 0
+        total_coef = 0
+        general_average = 0
+
+    summary_data = {
+        'total_points': round(total_weighted, 2),
+        'total_coef': total_coef,
+        'general_average': general_average,
+        'appreciation': Grade.get_appreciation(general_average) if general_average > 0 else '-',
+        'rank': str(rank) if rank else '-',
+        'class_average': '-'  # À implémenter si nécessaire
+    }
+
+    return {
+        'student_id': student.id,
+        'class_name': class_name,
+        'filename': f'bulletin_{student.username}_{str(period).replace(" ", "_")}.pdf',
+        'student_data': student_data,
+        'grades_part1': grades_part1,
+        'grades_part2': grades_part2,
+        'summary_data': summary_data
+    }
+
+
+def build_flat_bulletin_data(student, grades, period):
+    """
+    Prépare un bulletin simplifié (toutes les notes dans un seul tableau),
+    utilisé pour les téléchargements élève et parent.
+    """
+    total_weighted = sum(g.weighted_average for g in grades)
+    total_coef = sum(g.coef for g in grades)
+    general_average = round(total_weighted / total_coef, 2) if total_coef > 0 else 0
+
+    student_data = {
+        'name': student.full_name,
+        'matricule': student.matricule or '-',
+        'class': student.current_class.name if student.current_class else '-',
+        'period': period,
+        'school_name': DEFAULT_SCHOOL_NAME
+    }
+
+    grades_data = []
+    for g in grades:
+        grades_data.append({
+            'subject': g.subject_name,
+            'moy_cl': g.moy_cl,
+            'n_compo': g.n_compo,
+            'coef': g.coef,
+            'mg': g.average,
+            'appreciation': g.appreciation or g.auto_appreciation()
+        })
+
+    summary_data = {
+        'total_points': round(total_weighted, 2),
+        'total_coef': total_coef,
+        'general_average': general_average,
+        'appreciation': Grade.get_appreciation(general_average)
+    }
+
+    return {
+        'student_id': student.id,
+        'class_name': student_data['class'],
+        'filename': f'bulletin_{student.username}_P{period}.pdf',
+        'student_data': student_data,
+        'grades_part1': grades_data,
+        'grades_part2': [],
+        'summary_data': summary_data
+    }
+
+
+def cached_bulletin_path(bulletin, period):
+    """Chemin du PDF d'un bulletin préparé, servi depuis le cache disque"""
+    return get_bulletin_cache().get_or_render(
+        bulletin['student_id'], period,
+        bulletin['student_data'], bulletin['grades_part1'],
+        bulletin['grades_part2'], bulletin['summary_data']
+    )
+
+
+def collect_class_bulletins(class_id, period, student_ids=None):
+    """
+    Prépare les bulletins de tous les élèves d'une classe pour une période.
+
+    Les notes et les rangs de la classe sont chargés en une requête chacun.
+
+    Returns:
+        Liste de bulletins (voir build_bulletin_data), vide si la classe
+        n'a pas de structure de bulletin.
+    """
+    school_class = SchoolClass.query.get(class_id)
+    if not school_class or not school_class.bulletin_structure:
+        return []
+    structure = school_class.bulletin_structure
+
+    students_query = User.query.filter_by(role='student', current_class_id=class_id)
+    if student_ids:
+        students_query = students_query.filter(User.id.in_(student_ids))
+    students = students_query.order_by(User.last_name, User.first_name).all()
+    if not students:
+        return []
+
+    ids = [s.id for s in students]
+    grades_by_student = {}
+    for grade in Grade.query.filter(Grade.student_id.in_(ids), Grade.period == period).all():
+        grades_by_student.setdefault(grade.student_id, []).append(grade)
+
+    ranks = dict(
+        StudentPeriodSummary.query.with_entities(StudentPeriodSummary.student_id, StudentPeriodSummary.rank)
+        .filter(StudentPeriodSummary.student_id.in_(ids), StudentPeriodSummary.period == period).all()
+    )
+
+    return [
+        build_bulletin_data(student, school_class.name, structure,
+                            grades_by_student.get(student.id, []), period,
+                            rank=ranks.get(student.id))
+        for student in students
+    ]
+
+
+def collect_school_bulletins(period):
+    """Prépare les bulletins de toutes les classes disposant d'une structure"""
+    classes = SchoolClass.query.join(BulletinStructure).order_by(SchoolClass.name).all()
+    bulletins = []
+    for school_class in classes:
+        bulletins.extend(collect_class_bulletins(school_class.id, period))
+    return bulletins
+
+
+# ============================================
+# RENDU PARALLÈLE
+# ============================================
+
+def render_bulletin(bulletin):
+    """Rend un bulletin en mémoire (exécuté dans un processus de travail)"""
+    buffer = io.BytesIO()
+    generate_bulletin_pdf(buffer, bulletin['student_data'], bulletin['grades_part1'],
+                          bulletin['grades_part2'], bulletin['summary_data'])
+    return buffer.getvalue()
+
+
+def benchmark_render(bulletins, count=100):
+    """
+    Mesure le temps de rendu par bulletin, avec et sans réutilisation des
+    styles et blocs statiques.
+
+    Le mode « cold » crée un BulletinRenderer par bulletin, ce qui reproduit
+    l'ancien comportement de generate_bulletin_pdf (tout reconstruire à
+    chaque appel) ; le mode « shared » réutilise une seule instance.
+
+    Returns:
+        Dict {'count', 'cold_ms', 'shared_ms', 'speedup'} (temps moyens en ms)
+    """
+    samples = [bulletins[i % len(bulletins)] for i in range(count)]
+
+    def run(renderer_for):
+        start = time.perf_counter()
+        for bulletin in samples:
+            renderer_for().render(io.BytesIO(), bulletin['student_data'], bulletin['grades_part1'],
+                                  bulletin['grades_part2'], bulletin['summary_data'])
+        return (time.perf_counter() - start) * 1000 / count
+
+    shared = BulletinRenderer()
+    run(lambda: shared)  # Préchauffage (polices, imports paresseux)
+    cold_ms = run(BulletinRenderer)
+    shared_ms = run(lambda: shared)
+
+    return {
+        'count': count,
+        'cold_ms': round(cold_ms, 2),
+        'shared_ms': round(shared_ms, 2),
+        'speedup': round(cold_ms / shared_ms, 2) if shared_ms > 0 else None
+    }
+
+
+class BatchReport:
+    """Mesures d'un traitement par lots"""
+
+    def __init__(self, count, elapsed, workers):
+        self.count = count
+        self.elapsed = elapsed
+        self.workers = workers
+
+    @property
+    def per_second(self):
+        return self.count / self.elapsed if self.elapsed > 0 else 0.0
+
+    def to_dict(self):
+        return {
+            'count': self.count,
+            'elapsed': round(self.elapsed, 3),
+            'workers': self.workers,
+            'bulletins_per_second': round(self.per_second, 2)
+        }
+
+    def __repr__(self):
+        return f'<BatchReport {self.count} bulletins in {self.elapsed:.2f}s ({self.per_second:.1f}/s)>'
+
+
+def render_bulletins(bulletins, max_workers=None):
+    """
+    Rend une liste de bulletins en parallèle.
+
+    Returns:
+        (liste des PDF en bytes dans l'ordre d'entrée, BatchReport)
+    """
+    workers = max_workers or os.cpu_count() or 1
+    workers = max(1, min(workers, len(bulletins)))
+
+    start = time.perf_counter()
+    if workers == 1:
+        pdfs = [render_bulletin(b) for b in bulletins]
+    else:
+        chunksize = max(1, len(bulletins) // (workers * 4))
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            pdfs = list(executor.map(render_bulletin, bulletins, chunksize=chunksize))
+    elapsed = time.perf_counter() - start
+
+    return pdfs, BatchReport(len(bulletins), elapsed, workers)
+
+
+def pack_zip(bulletins, pdfs, output, group_by_class=False):
+    """Regroupe les PDF dans une archive ZIP écrite dans output"""
+    with zipfile.ZipFile(output, 'w', zipfile.ZIP_DEFLATED) as archive:
+        for bulletin, pdf in zip(bulletins, pdfs):
+            name = bulletin['filename']
+            if group_by_class:
+                name = f"{bulletin['class_name'].replace('/', '-')}/{name}"
+            archive.writestr(name, pdf)
+
+
+def merge_pdfs(pdfs, output):
+    """Fusionne les PDF en un document unique écrit dans output"""
+    writer = PdfWriter()
+    for pdf in pdfs:
+        for page in PdfReader(io.BytesIO(pdf)).pages:
+            writer.add_page(page)
+    writer.write(output)
+
+
+def generate_batch(bulletins, output, output_format='zip', max_workers=None, group_by_class=False):
+    """
+    Génère un lot de bulletins.
+
+    Args:
+        bulletins: Bulletins préparés (collect_class_bulletins / collect_school_bulletins)
+        output: Objet fichier binaire de destination (fichier ouvert, new_pdf_buffer()...)
+        output_format: 'zip' (un PDF par élève) ou 'pdf' (document fusionné)
+        max_workers: Nombre de processus (par défaut: nombre de cœurs)
+        group_by_class: Un dossier par classe dans l'archive ZIP
+
+    Returns:
+        BatchReport
+    """
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError(f'Format de sortie inconnu: {output_format}')
+
+    pdfs, report = render_bulletins(bulletins, max_workers)
+
+    if output_format == 'pdf':
+        merge_pdfs(pdfs, output)
+    else:
+        pack_zip(bulletins, pdfs, output, group_by_class)
+    return report
@@ -0,0 +1,101 @@
+"""
+Cache en mémoire partagé (par processus)
+
+TTLCache est un cache LRU à durée de vie, sûr entre threads. Le cache
+partagé de l'application (get_shared_cache) conserve les données quasi
+statiques affichées par les templates : année scolaire courante, fils
+d'annonces (announcements.py), analyses par matière. Elles sont
+invalidées explicitement par les routes qui les modifient ; le TTL
+(CONTEXT_CACHE_TTL) borne le décalage entre processus d'un même
+déploiement.
+"""
+import threading
+import time
+from collections import OrderedDict
+from flask import current_app
+from gestion_scolaire import db
+from gestion_scolaire.models import AcademicYear
+
+DEFAULT_YEAR_NAME = '2024-2025'
+CURRENT_YEAR_KEY = 'current_year'
+
+_MISSING = object()
+
+
+class TTLCache:
+    """Cache LRU à durée de vie, partagé entre threads"""
+
+    def __init__(self, ttl, max_entries=1000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        """Renvoie la valeur ou default si absente ou expirée"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return default
+            expires, value = entry
+            if expires < time.monotonic():
+                del self._entries[key]
+                return default
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        if self.ttl <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get_or_set(self, key, loader):
+        """Renvoie la valeur en cache ou l'obtient par loader() et la conserve"""
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            value = loader()
+            self.set(key, value)
+        return value
+
+    def invalidate(self, *keys):
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+def get_shared_cache(app=None):
+    """Retourne le cache partagé de l'application (créé à la demande)"""
+    app = app or current_app._get_current_object()
+    cache = app.extensions.get('shared_cache')
+    if cache is None:
+        cache = TTLCache(app.config['CONTEXT_CACHE_TTL'])
+        app.extensions['shared_cache'] = cache
+    return cache
+
+
+# ============================================
+# DONNÉES COMMUNES DES TEMPLATES
+# ============================================
+
+def _load_current_year():
+    year = db.session.query(AcademicYear.name).filter_by(is_current=True).first()
+    return year.name if year else DEFAULT_YEAR_NAME
+
+
+def current_year_name():
+    """Nom de l'année scolaire courante"""
+    return get_shared_cache().get_or_set(CURRENT_YEAR_KEY, _load_current_year)
+
+
+def invalidate_current_year():
+    """À appeler après création ou changement de l'année courante"""
+    get_shared_cache().invalidate(CURRENT_YEAR_KEY)
+
@@ -0,0 +1,205 @@
+"""
+Statistiques de classe - Calcul en une seule requête
+
+Toutes les notes de la classe, toutes périodes confondues, sont lues en une
+requête (jointure externe depuis les élèves, pour compter aussi ceux sans
+note). Les moyennes générales par élève et les MG par matière sont ensuite
+agrégées en mémoire : moyenne, extrêmes, médiane, écart type, quartiles et
+taux de réussite, par période et par matière.
+
+L'analyse par matière d'une classe et d'une période (distribution des MG,
+classement des élèves) est conservée dans le cache partagé jusqu'à la
+prochaine modification des notes de la classe : summaries.refresh_class_ranks
+marque la classe (invalidate_class_analytics_on_commit) et l'entrée est
+supprimée après le commit, pour qu'une requête concurrente ne remette pas
+en cache l'état d'avant la modification. Le TTL du cache borne le décalage
+entre processus.
+"""
+import statistics
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from gestion_scolaire import db
+from gestion_scolaire.cache import get_shared_cache
+from gestion_scolaire.models import Grade, User, STANDARD_PERIODS
+from gestion_scolaire.ranking import compute_ranks
+
+PASS_MARK = 10  # Moyenne minimale pour être compté comme reçu (sur 20)
+MAX_MARK = 20
+HISTOGRAM_BUCKET_WIDTH = 2  # Histogramme des MG par tranches de 2 points
+ANALYTICS_KEY = 'subject_analytics'
+STALE_ANALYTICS_KEY = 'stale_class_analytics'  # Classes à invalider au commit (session.info)
+
+
+def describe(values):
+    """
+    Statistiques descriptives d'une série de moyennes.
+
+    L'écart type est celui de la population (la classe entière, pas un
+    échantillon) ; les quartiles sont calculés par interpolation inclusive.
+
+    Returns:
+        Dict {'count', 'average', 'highest', 'lowest', 'median', 'std_dev',
+              'q1', 'q3', 'pass_rate'} (valeurs à 0 si la série est vide)
+    """
+    if not values:
+        return {
+            'count': 0, 'average': 0, 'highest': 0, 'lowest': 0, 'median': 0,
+            'std_dev': 0, 'q1': 0, 'q3': 0, 'pass_rate': 0
+        }
+    if len(values) > 1:
+        q1, _median, q3 = statistics.quantiles(values, n=4, method='inclusive')
+    else:
+        q1 = q3 = values[0]
+    return {
+        'count': len(values),
+        'average': round(statistics.fmean(values), 2),
+        'highest': round(max(values), 2),
+        'lowest': round(min(values), 2),
+        'median': round(statistics.median(values), 2),
+        'std_dev': round(statistics.pstdev(values), 2),
+        'q1': round(q1, 2),
+        'q3': round(q3, 2),
+        'pass_rate': round(100 * sum(1 for v in values if v >= PASS_MARK) / len(values), 1)
+    }
+
+
+def _class_grades(class_id):
+    """(student_id, période, matière, MG, coef) de tous les élèves de la classe ; None pour un élève sans note"""
+    mg = (Grade.moy_cl + 2 * Grade.n_compo) / 3.0
+    return db.session.query(User.id, Grade.period, Grade.subject_name, mg, Grade.coef)\
+        .outerjoin(Grade, Grade.student_id == User.id)\
+        .filter(User.current_class_id == class_id, User.role == 'student').all()
+
+
+def compute_class_statistics(class_id):
+    """
+    Statistiques d'une classe par période, globales et par matière.
+
+    Returns:
+        Dict {'student_count', 'periods': {période: {...describe,
+              'class_average', 'student_with_grades', 'subjects': {matière: describe}}}}.
+        Les périodes standard figurent toujours, même sans note.
+    """
+    student_ids = set()
+    totals = {}  # période -> {élève: [points, coefs]}
+    subject_values = {}  # période -> {matière: [MG]}
+
+    for student_id, period, subject_name, mg, coef in _class_grades(class_id):
+        student_ids.add(student_id)
+        if period is None:
+            continue
+        points = totals.setdefault(period, {}).setdefault(student_id, [0.0, 0])
+        points[0] += mg * coef
+        points[1] += coef
+        subject_values.setdefault(period, {}).setdefault(subject_name, []).append(mg)
+
+    periods = list(STANDARD_PERIODS) + sorted(p for p in totals if p not in STANDARD_PERIODS)
+    result = {'student_count': len(student_ids), 'periods': {}}
+    for period in periods:
+        averages = [points / coefs for points, coefs in totals.get(period, {}).values() if coefs > 0]
+        period_stats = describe(averages)
+        # Clés historiques de l'API
+        period_stats['class_average'] = period_stats['average']
+        period_stats['student_with_grades'] = period_stats['count']
+        period_stats['subjects'] = {
+            subject_name: describe(values)
+            for subject_name, values in sorted(subject_values.get(period, {}).items())
+        }
+        result['periods'][period] = period_stats
+    return result
+
+
+# ============================================
+# ANALYSE PAR MATIÈRE
+# ============================================
+
+def histogram(values, width=HISTOGRAM_BUCKET_WIDTH):
+    """
+    Répartition des notes par tranches [min, max[ de width points ; la
+    dernière tranche inclut la note maximale.
+
+    Returns:
+        Liste de dicts {'min', 'max', 'count'}
+    """
+    bucket_count = MAX_MARK // width
+    counts = [0] * bucket_count
+    for value in values:
+        index = min(max(int(value // width), 0), bucket_count - 1)
+        counts[index] += 1
+    return [
+        {'min': index * width, 'max': (index + 1) * width, 'count': count}
+        for index, count in enumerate(counts)
+    ]
+
+
+def _subject_grades(class_id, period):
+    """(student_id, prénom, nom, identifiant, matière, MG) des notes de la classe pour la période"""
+    mg = (Grade.moy_cl + 2 * Grade.n_compo) / 3.0
+    return db.session.query(
+        User.id, User.first_name, User.last_name, User.username, Grade.subject_name, mg
+    ).join(Grade, Grade.student_id == User.id)\
+        .filter(User.current_class_id == class_id, User.role == 'student', Grade.period == period).all()
+
+
+def compute_subject_analytics(class_id, period):
+    """
+    Analyse par matière d'une classe pour une période (une requête) :
+    statistiques descriptives, histogramme et classement des élèves.
+
+    Returns:
+        Dict {'class_id', 'period', 'subjects': {matière: {...describe,
+              'histogram': [...], 'ranking': [{'student_id', 'name', 'average', 'rank'}]}}}
+    """
+    names = {}
+    marks = {}  # matière -> {élève: MG}
+    for student_id, first_name, last_name, username, subject_name, mg in _subject_grades(class_id, period):
+        names[student_id] = f'{first_name} {last_name}' if first_name and last_name else username
+        marks.setdefault(subject_name, {})[student_id] = mg
+
+    subjects = {}
+    for subject_name, by_student in sorted(marks.items()):
+        values = list(by_student.values())
+        ranks = compute_ranks(by_student)
+        subject = describe(values)
+        subject['histogram'] = histogram(values)
+        subject['ranking'] = [
+            {'student_id': student_id, 'name': names[student_id],
+             'average': round(by_student[student_id], 2), 'rank': rank}
+            for student_id, rank in sorted(ranks.items(), key=lambda item: (item[1], names[item[0]]))
+        ]
+        subjects[subject_name] = subject
+    return {'class_id': class_id, 'period': period, 'subjects': subjects}
+
+
+def subject_analytics(class_id, period):
+    """Analyse par matière servie par le cache partagé (calculée au premier appel)"""
+    periods = get_shared_cache().get_or_set((ANALYTICS_KEY, class_id), dict)
+    analytics = periods.get(period)
+    if analytics is None:
+        analytics = compute_subject_analytics(class_id, period)
+        periods[period] = analytics
+    return analytics
+
+
+def invalidate_class_analytics(*class_ids):
+    """À appeler quand les notes ou les élèves d'une classe changent (toutes périodes)"""
+    get_shared_cache().invalidate(*[(ANALYTICS_KEY, class_id) for class_id in class_ids])
+
+
+def invalidate_class_analytics_on_commit(*class_ids):
+    """Invalide l'analyse des classes après le commit de la transaction en cours"""
+    db.session.info.setdefault(STALE_ANALYTICS_KEY, set()).update(class_ids)
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_stale_analytics(session):
+    class_ids = session.info.pop(STALE_ANALYTICS_KEY, None)
+    if class_ids:
+        invalidate_class_analytics(*class_ids)
+
+
+@event.listens_for(Session, 'after_soft_rollback')
+def _drop_stale_analytics(session, previous_transaction):
+    # Modifications annulées : le cache reste valable
+    if not previous_transaction.nested:
+        session.info.pop(STALE_ANALYTICS_KEY, None)
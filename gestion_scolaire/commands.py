@@ -0,0 +1,215 @@
+"""
+Commandes CLI Flask - Tâches d'administration (flask <commande>)
+"""
+import click
+from flask.cli import with_appcontext
+
+
+@click.command('generate-bulletins')
+@click.option('--period', required=True, help='Période des bulletins (ex: 1)')
+@click.option('--class-id', type=int, default=None, help='Classe (par défaut: tout l\'établissement)')
+@click.option('--format', 'output_format', type=click.Choice(['zip', 'pdf']), default='zip')
+@click.option('--workers', type=int, default=None, help='Nombre de processus (par défaut: tous les cœurs)')
+@click.option('--output', type=click.Path(dir_okay=False, writable=True), default=None)
+@with_appcontext
+def generate_bulletins_command(period, class_id, output_format, workers, output):
+    """Génère les bulletins d'une classe ou de l'établissement et affiche le débit"""
+    from gestion_scolaire.bulletins import (
+        collect_class_bulletins, collect_school_bulletins, generate_batch
+    )
+    
+    if class_id:
+        bulletins = collect_class_bulletins(class_id, period)
+    else:
+        bulletins = collect_school_bulletins(period)
+    
+    if not bulletins:
+        click.echo('Aucun bulletin à générer.')
+        return
+    
+    output = output or f'bulletins_P{period}.{output_format}'
+    with open(output, 'wb') as f:
+        report = generate_batch(bulletins, f, output_format=output_format,
+                                max_workers=workers, group_by_class=not class_id)
+    
+    click.echo(f'✅ {report.count} bulletins générés en {report.elapsed:.2f}s '
+               f'({report.per_second:.1f} bulletins/s, {report.workers} processus) -> {output}')
+
+
+@click.command('benchmark-bulletins')
+@click.option('--period', required=True, help='Période des bulletins utilisés comme échantillon')
+@click.option('--class-id', type=int, default=None, help='Classe (par défaut: tout l\'établissement)')
+@click.option('--count', type=int, default=100, show_default=True, help='Nombre de rendus par mode')
+@with_appcontext
+def benchmark_bulletins_command(period, class_id, count):
+    """Compare le temps de rendu par bulletin avec et sans styles précompilés"""
+    from gestion_scolaire.bulletins import (
+        collect_class_bulletins, collect_school_bulletins, benchmark_render
+    )
+    
+    if class_id:
+        bulletins = collect_class_bulletins(class_id, period)
+    else:
+        bulletins = collect_school_bulletins(period)
+    
+    if not bulletins:
+        click.echo('Aucun bulletin à rendre.')
+        return
+    
+    result = benchmark_render(bulletins, count)
+    click.echo(f"{result['count']} rendus par mode")
+    click.echo(f"  styles reconstruits : {result['cold_ms']:.2f} ms/bulletin")
+    click.echo(f"  styles partagés     : {result['shared_ms']:.2f} ms/bulletin")
+    click.echo(f"  gain                : x{result['speedup']}")
+
+
+@click.command('upgrade-schema')
+@with_appcontext
+def upgrade_schema_command():
+    """Met à niveau une base existante (dédoublonnage et nouveaux index)"""
+    from flask import current_app
+    from gestion_scolaire.database import upgrade_schema
+    
+    upgrade_schema(current_app._get_current_object())
+
+
+@click.command('archive-audit-logs')
+@click.option('--months', type=click.IntRange(0, None), default=None,
+              help='Mois entiers conservés en base (par défaut: AUDIT_RETENTION_MONTHS)')
+@click.option('--dry-run', is_flag=True, help='Compter les lignes à archiver sans rien modifier')
+@with_appcontext
+def archive_audit_logs_command(months, dry_run):
+    """Déplace les lignes anciennes du journal d'audit vers des archives mensuelles (jsonl.gz)"""
+    from flask import current_app
+    from gestion_scolaire.audit_archive import archive_audit_logs
+    
+    if months is None:
+        months = current_app.config['AUDIT_RETENTION_MONTHS']
+    archive_dir = current_app.config['AUDIT_ARCHIVE_DIR']
+    
+    report = archive_audit_logs(months, archive_dir, dry_run=dry_run)
+    
+    for month, count in sorted(report.months.items()):
+        click.echo(f'  {month}  {count:>8} lignes')
+    if dry_run:
+        click.echo(f'✅ {report.archived} lignes antérieures au {report.cutoff:%d/%m/%Y} à archiver (aucune modification)')
+    else:
+        click.echo(f'✅ {report.archived} lignes antérieures au {report.cutoff:%d/%m/%Y} archivées '
+                   f'en {report.elapsed:.2f}s -> {archive_dir}')
+
+
+@click.command('import-roster')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--default-password', default=None, help='Mot de passe des lignes qui n\'en fournissent pas')
+@click.option('--dry-run', is_flag=True, help='Valider le fichier sans créer de compte')
+@click.option('--batch-size', type=int, default=None, help='Comptes par transaction')
+@click.option('--workers', type=int, default=None, help='Processus de hachage (par défaut: tous les cœurs)')
+@with_appcontext
+def import_roster_command(path, default_password, dry_run, batch_size, workers):
+    """Importe une liste d'élèves (CSV ou XLSX) avec classes, matricules et parents"""
+    from gestion_scolaire.roster import read_roster, import_roster, ROSTER_BATCH_SIZE
+    
+    with open(path, 'rb') as f:
+        try:
+            records = read_roster(f, path)
+        except ValueError as e:
+            raise click.ClickException(str(e))
+    
+    def progress(done, total):
+        click.echo(f'  {done}/{total} élèves importés')
+    
+    report = import_roster(records, default_password=default_password, dry_run=dry_run,
+                           batch_size=batch_size or ROSTER_BATCH_SIZE, max_workers=workers,
+                           progress=progress)
+    
+    for error in report.errors:
+        click.echo(f"Ligne {error['line'] or '-'} : {error['error']}", err=True)
+    
+    if report.errors:
+        raise click.ClickException(f'{len(report.errors)} erreur(s), {report.created} élève(s) importé(s)')
+    if dry_run:
+        click.echo(f'✅ {report.valid}/{report.total} lignes valides (aucun compte créé)')
+    else:
+        click.echo(f'✅ {report.created} élèves importés, {report.links} liens parents, '
+                   f'{report.batches} lot(s) en {report.elapsed:.2f}s ({report.workers} processus)')
+
+
+@click.command('generate-data')
+@click.option('--students', type=click.IntRange(500, 50000), default=2000, show_default=True,
+              help='Nombre d\'élèves')
+@click.option('--seed', type=int, default=42, show_default=True, help='Graine aléatoire')
+@click.option('--students-per-class', type=click.IntRange(10, 100), default=40, show_default=True)
+@click.option('--attendance-days', type=click.IntRange(0, 200), default=180, show_default=True,
+              help='Jours ouvrés de présences')
+@click.option('--reset', is_flag=True, help='Vider la base et recréer les données par défaut avant génération')
+@with_appcontext
+def generate_data_command(students, seed, students_per_class, attendance_days, reset):
+    """Génère un établissement synthétique pour les mesures de performance"""
+    from flask import current_app
+    from gestion_scolaire import db
+    from gestion_scolaire.database import init_db
+    from gestion_scolaire.synthetic import generate_school, SYNTHETIC_PASSWORD
+    
+    if reset:
+        db.drop_all()
+        init_db(current_app._get_current_object())
+    
+    try:
+        report = generate_school(students=students, seed=seed, students_per_class=students_per_class,
+                                 attendance_days=attendance_days,
+                                 progress=lambda message: click.echo(f'  {message}'))
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    
+    for table, count in report.counts.items():
+        click.echo(f'  {table:<20} {count:>10}')
+    click.echo(f'✅ Établissement généré en {report.elapsed:.1f}s (graine {seed}) ; '
+               f'mot de passe des comptes générés : {SYNTHETIC_PASSWORD}')
+
+
+@click.command('benchmark')
+@click.option('--iterations', type=click.IntRange(1), default=20, show_default=True,
+              help='Appels mesurés par scénario')
+@click.option('--warmup', type=click.IntRange(0), default=2, show_default=True)
+@click.option('--only', multiple=True, help='Scénario à exécuter (option répétable)')
+@click.option('--output', type=click.Path(dir_okay=False, writable=True), default=None,
+              help='Fichier JSON des résultats')
+@click.option('--baseline', type=click.Path(exists=True, dir_okay=False), default=None,
+              help='Résultats de référence à comparer')
+@click.option('--tolerance', type=float, default=0.20, show_default=True,
+              help='Hausse de latence p95 tolérée (0.20 = +20 %)')
+@with_appcontext
+def benchmark_command(iterations, warmup, only, output, baseline, tolerance):
+    """Mesure latence et requêtes SQL des routes critiques ; code 1 en cas de régression"""
+    from flask import current_app
+    from gestion_scolaire.benchmarks import run_benchmarks, compare_results, save_results, load_results
+    
+    def progress(name, result):
+        click.echo(f"  {name:<20} p50 {result['p50_ms']:>9.1f} ms   p95 {result['p95_ms']:>9.1f} ms   "
+                   f"{result['queries']:>5} requêtes   HTTP {','.join(map(str, result['status']))}")
+    
+    results = run_benchmarks(current_app._get_current_object(), iterations=iterations, warmup=warmup,
+                             only=set(only) or None, progress=progress)
+    if output:
+        save_results(results, output)
+        click.echo(f'Résultats enregistrés dans {output}')
+    
+    if baseline:
+        regressions = compare_results(results, load_results(baseline), tolerance)
+        for regression in regressions:
+            click.echo(f"❌ {regression['scenario']} : {regression['metric']} "
+                       f"{regression['baseline']} -> {regression['current']}", err=True)
+        if regressions:
+            raise SystemExit(1)
+        click.echo('✅ Aucune régression par rapport à la référence')
+
+
+def register_commands(app):
+    """Enregistre les commandes CLI de l'application"""
+    app.cli.add_command(generate_bulletins_command)
+    app.cli.add_command(benchmark_bulletins_command)
+    app.cli.add_command(upgrade_schema_command)
+    app.cli.add_command(archive_audit_logs_command)
+    app.cli.add_command(import_roster_command)
+    app.cli.add_command(generate_data_command)
+    app.cli.add_command(benchmark_command)
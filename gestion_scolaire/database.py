@@ -207,8 +207,124 @@ def init_db(app=None):
         
         # Commit toutes les données
         db.session.commit()
+        
+        # Agrégats des moyennes par période
+        from gestion_scolaire.summaries import rebuild_all_summaries
+        rebuild_all_summaries()
+        db.session.commit()
         print("✅ Base de données initialisée avec succès")
 
+def dedupe_grades():
+    """
+    Supprime les notes en double (même élève, matière et période) en gardant
+    la plus récemment modifiée, puis recalcule les agrégats concernés.
+    
+    Returns:
+        Nombre de notes supprimées
+    """
+    from sqlalchemy import func
+    from gestion_scolaire.models import Grade
+    from gestion_scolaire.summaries import on_grade_changed
+    
+    duplicate_keys = db.session.query(Grade.student_id, Grade.subject_name, Grade.period)\
+        .group_by(Grade.student_id, Grade.subject_name, Grade.period)\
+        .having(func.count(Grade.id) > 1).all()
+    
+    removed = 0
+    affected = set()
+    for student_id, subject_name, period in duplicate_keys:
+        grades = Grade.query.filter_by(student_id=student_id, subject_name=subject_name, period=period)\
+            .order_by(Grade.updated_at.desc(), Grade.id.desc()).all()
+        for grade in grades[1:]:
+            db.session.delete(grade)
+            removed += 1
+        affected.add((student_id, period))
+    
+    db.session.flush()
+    for student_id, period in affected:
+        on_grade_changed(student_id, period)
+    
+    return removed
+
+
+def dedupe_attendance():
+    """
+    Normalise les demi-journées vides (NULL -> '') puis supprime les relevés
+    de présence en double (même élève, classe, jour et demi-journée) en
+    gardant le plus récent.
+    
+    Returns:
+        Nombre de relevés supprimés
+    """
+    from sqlalchemy import func
+    from gestion_scolaire.models import Attendance
+    
+    Attendance.query.filter(Attendance.period.is_(None)).update({'period': ''}, synchronize_session=False)
+    
+    keep_ids = db.session.query(func.max(Attendance.id))\
+        .group_by(Attendance.student_id, Attendance.class_id, Attendance.date, Attendance.period)
+    removed = Attendance.query.filter(Attendance.id.notin_(keep_ids))\
+        .delete(synchronize_session=False)
+    return removed
+
+
+def upgrade_schema(app=None):
+    """
+    Met à niveau une base existante : db.create_all() ne crée que les tables
+    manquantes, pas les colonnes ni les index ajoutés depuis aux tables
+    existantes.
+    
+    Chaque étape est idempotente ; la commande peut être relancée sans risque.
+    """
+    if app is None:
+        from gestion_scolaire import create_app
+        app = create_app()
+    
+    with app.app_context():
+        from gestion_scolaire.models import Grade, Attendance, AuditLog, Message, MessageThread, Announcement
+        from gestion_scolaire.messaging import recount_unread_messages, assign_message_threads
+        from gestion_scolaire.summaries import rebuild_all_summaries
+        
+        db.create_all()
+        
+        # Colonnes ajoutées aux tables existantes
+        added_columns = (
+            ('users', 'unread_messages', 'INTEGER NOT NULL DEFAULT 0'),
+            ('messages', 'thread_id', 'INTEGER REFERENCES message_threads (id)'),
+        )
+        inspector = db.inspect(db.engine)
+        for table, column, definition in added_columns:
+            if column not in {existing['name'] for existing in inspector.get_columns(table)}:
+                db.session.execute(db.text(f'ALTER TABLE {table} ADD COLUMN {column} {definition}'))
+        
+        recount_unread_messages()
+        db.session.commit()
+        print("✅ Compteurs de messages non lus à jour")
+        
+        created = assign_message_threads()
+        db.session.commit()
+        print(f"✅ Conversations créées: {created}")
+        
+        # Index uniques : dédoublonner avant de les créer
+        removed = dedupe_grades()
+        db.session.commit()
+        print(f"✅ Notes en double supprimées: {removed}")
+        
+        # Agrégats des moyennes par période (table créée vide par create_all)
+        rebuild_all_summaries()
+        db.session.commit()
+        print("✅ Moyennes par période recalculées")
+        
+        removed = dedupe_attendance()
+        db.session.commit()
+        print(f"✅ Présences en double supprimées: {removed}")
+        
+        for model in (Grade, Attendance, AuditLog, Message, MessageThread, Announcement):
+            for index in model.__table__.indexes:
+                index.create(db.engine, checkfirst=True)
+        print("✅ Index à jour")
+
+
 def setup_database():
     """Point d'entrée CLI pour la configuration de la base de données"""
     print("🔧 Configuration de la base de données...")
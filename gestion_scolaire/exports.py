@@ -0,0 +1,184 @@
+"""
+Exports en flux des notes et des présences (NDJSON ou CSV)
+
+Les lignes sont lues par lots avec un curseur côté serveur (yield_per) et
+écrites au fil de l'eau : la mémoire utilisée ne dépend pas du volume exporté
+et les premiers octets partent dès le premier lot.
+"""
+import csv
+import json
+from sqlalchemy import and_, or_
+from gestion_scolaire import db
+from gestion_scolaire.models import User, SchoolClass, Grade, Attendance, AcademicYear
+
+EXPORT_FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv'
+}
+EXPORT_BATCH_SIZE = 1000  # Lignes lues par aller-retour avec la base
+EXPORT_CHUNK_BYTES = 64 * 1024  # Taille des paquets envoyés au client
+
+GRADE_COLUMNS = [
+    'id', 'student_id', 'matricule', 'student_name', 'class_name', 'subject_name',
+    'period', 'academic_year', 'moy_cl', 'n_compo', 'coef', 'average', 'appreciation', 'updated_at'
+]
+ATTENDANCE_COLUMNS = [
+    'id', 'student_id', 'matricule', 'student_name', 'class_name',
+    'date', 'period', 'status', 'reason'
+]
+
+
+def _full_name(first_name, last_name, username):
+    """Même règle que User.full_name, sans charger l'objet"""
+    if first_name and last_name:
+        return f'{first_name} {last_name}'
+    return username
+
+
+def _academic_year(name):
+    """Année scolaire par son nom ; lève ValueError si elle n'existe pas"""
+    year = AcademicYear.query.filter_by(name=name).first()
+    if not year:
+        raise ValueError(f'Année scolaire inconnue: {name}')
+    return year
+
+
+def iter_grades(class_id=None, period=None, academic_year=None):
+    """
+    Parcourt les notes sous forme de dicts (colonnes GRADE_COLUMNS).
+    Les filtres sont validés immédiatement, la lecture se fait à l'itération.
+
+    Args:
+        class_id: Classe actuelle des élèves
+        period: Période des notes
+        academic_year: Nom de l'année scolaire ; les notes sans année sont
+            rattachées par leur date si l'année a des bornes
+    """
+    query = db.session.query(
+        Grade.id, Grade.student_id, User.matricule, User.first_name, User.last_name, User.username,
+        SchoolClass.name, Grade.subject_name, Grade.period, Grade.academic_year,
+        Grade.moy_cl, Grade.n_compo, Grade.coef, Grade.appreciation, Grade.updated_at
+    ).join(User, User.id == Grade.student_id)\
+        .outerjoin(SchoolClass, SchoolClass.id == User.current_class_id)
+
+    if class_id:
+        query = query.filter(User.current_class_id == class_id)
+    if period:
+        query = query.filter(Grade.period == period)
+    if academic_year:
+        year = _academic_year(academic_year)
+        condition = Grade.academic_year == year.name
+        if year.start_date and year.end_date:
+            condition = or_(condition, and_(
+                Grade.academic_year.is_(None),
+                Grade.date >= year.start_date,
+                Grade.date <= year.end_date
+            ))
+        query = query.filter(condition)
+
+    return (_grade_row(row) for row in query.order_by(Grade.id).yield_per(EXPORT_BATCH_SIZE))
+
+
+def _grade_row(row):
+    (grade_id, student_id, matricule, first_name, last_name, username, class_name,
+     subject_name, period, academic_year, moy_cl, n_compo, coef, appreciation, updated_at) = row
+    return {
+        'id': grade_id,
+        'student_id': student_id,
+        'matricule': matricule,
+        'student_name': _full_name(first_name, last_name, username),
+        'class_name': class_name,
+        'subject_name': subject_name,
+        'period': period,
+        'academic_year': academic_year,
+        'moy_cl': moy_cl,
+        'n_compo': n_compo,
+        'coef': coef,
+        'average': round((moy_cl + 2 * n_compo) / 3, 2),
+        'appreciation': appreciation,
+        'updated_at': updated_at.isoformat() if updated_at else None
+    }
+
+
+def iter_attendance(class_id=None, academic_year=None, start=None, end=None):
+    """
+    Parcourt les relevés de présence sous forme de dicts (colonnes ATTENDANCE_COLUMNS).
+    Les filtres sont validés immédiatement, la lecture se fait à l'itération.
+
+    Args:
+        class_id: Classe de l'appel
+        academic_year: Nom de l'année scolaire (bornes start_date / end_date)
+        start, end: Bornes de dates incluses (date)
+    """
+    query = db.session.query(
+        Attendance.id, Attendance.student_id, User.matricule, User.first_name, User.last_name,
+        User.username, SchoolClass.name, Attendance.date, Attendance.period,
+        Attendance.status, Attendance.reason
+    ).join(User, User.id == Attendance.student_id)\
+        .outerjoin(SchoolClass, SchoolClass.id == Attendance.class_id)
+
+    if class_id:
+        query = query.filter(Attendance.class_id == class_id)
+    if academic_year:
+        year = _academic_year(academic_year)
+        start = max(filter(None, [start, year.start_date]), default=None)
+        end = min(filter(None, [end, year.end_date]), default=None)
+    if start:
+        query = query.filter(Attendance.date >= start)
+    if end:
+        query = query.filter(Attendance.date <= end)
+
+    return (_attendance_row(row) for row in query.order_by(Attendance.id).yield_per(EXPORT_BATCH_SIZE))
+
+
+def _attendance_row(row):
+    (record_id, student_id, matricule, first_name, last_name, username, class_name,
+     record_date, period, status, reason) = row
+    return {
+        'id': record_id,
+        'student_id': student_id,
+        'matricule': matricule,
+        'student_name': _full_name(first_name, last_name, username),
+        'class_name': class_name,
+        'date': record_date.isoformat(),
+        'period': period or '',
+        'status': status,
+        'reason': reason
+    }
+
+
+class _LineBuffer:
+    """Cible de csv.writer qui renvoie la ligne écrite au lieu de la stocker"""
+
+    def write(self, value):
+        return value
+
+
+def stream_rows(rows, columns, output_format):
+    """
+    Sérialise des dicts au fil de l'eau.
+
+    Les lignes sont regroupées par paquets d'environ EXPORT_CHUNK_BYTES pour
+    limiter le nombre d'écritures réseau ; l'en-tête CSV part immédiatement.
+
+    Returns:
+        Générateur de chaînes (NDJSON ou CSV)
+    """
+    if output_format == 'csv':
+        writer = csv.writer(_LineBuffer())
+        yield writer.writerow(columns)
+        lines = (writer.writerow([row[column] for column in columns]) for row in rows)
+    else:
+        lines = (json.dumps(row, ensure_ascii=False) + '\n' for row in rows)
+
+    chunk = []
+    size = 0
+    for line in lines:
+        chunk.append(line)
+        size += len(line)
+        if size >= EXPORT_CHUNK_BYTES:
+            yield ''.join(chunk)
+            chunk = []
+            size = 0
+    if chunk:
+        yield ''.join(chunk)
@@ -0,0 +1,222 @@
+"""
+Saisie des notes par lots
+
+Une grille complète (classe × matières pour une période) est validée en une
+passe, puis écrite en une seule transaction par un upsert ensembliste sur la
+clé (élève, matière, période) ; les agrégats sont recalculés une fois pour
+toute la classe.
+"""
+from datetime import datetime
+from gestion_scolaire import db
+from gestion_scolaire.models import User, Grade
+from gestion_scolaire.summaries import on_grades_changed
+from gestion_scolaire.audit import audit_event
+
+# Lignes par instruction INSERT (limite de paramètres des anciennes versions de SQLite)
+UPSERT_BATCH_SIZE = 90
+UPSERT_UPDATED_COLUMNS = ('moy_cl', 'n_compo', 'coef', 'appreciation', 'teacher_id', 'updated_at')
+
+
+def _parse_entry(entry):
+    """Convertit une ligne de la grille ; lève ValueError avec un message lisible"""
+    try:
+        student_id = int(entry['student_id'])
+    except (KeyError, ValueError, TypeError):
+        raise ValueError('Élève invalide')
+
+    subject_name = str(entry.get('subject_name') or '').strip()
+    if not subject_name:
+        raise ValueError('Matière requise')
+
+    try:
+        moy_cl = float(entry['moy_cl'])
+        n_compo = float(entry['n_compo'])
+        coef = int(entry.get('coef') or 1)
+    except (KeyError, ValueError, TypeError):
+        raise ValueError('Format de nombre invalide')
+
+    if not (0 <= moy_cl <= 20 and 0 <= n_compo <= 20):
+        raise ValueError('Les notes doivent être entre 0 et 20')
+    if coef < 1:
+        raise ValueError('Le coefficient doit être au moins 1')
+
+    return {
+        'student_id': student_id,
+        'subject_name': subject_name,
+        'moy_cl': moy_cl,
+        'n_compo': n_compo,
+        'coef': coef
+    }
+
+
+def validate_grade_entries(entries, class_id=None, subjects=None):
+    """
+    Valide une grille de notes en une passe.
+
+    Args:
+        entries: Liste de dicts {student_id, subject_name, moy_cl, n_compo, coef}
+        class_id: Si fourni, tous les élèves doivent appartenir à cette classe
+        subjects: Si fourni, matières autorisées (structure de bulletin)
+
+    Returns:
+        (lignes valides, erreurs) où chaque erreur est {'index', 'error'}
+    """
+    rows = []
+    errors = []
+    seen = set()
+
+    for index, entry in enumerate(entries):
+        try:
+            row = _parse_entry(entry)
+        except ValueError as e:
+            errors.append({'index': index, 'error': str(e)})
+            continue
+
+        key = (row['student_id'], row['subject_name'])
+        if key in seen:
+            errors.append({'index': index, 'error': f"Note en double pour {row['subject_name']}"})
+            continue
+        if subjects is not None and row['subject_name'] not in subjects:
+            errors.append({'index': index, 'error': f"Matière inconnue: {row['subject_name']}"})
+            continue
+        seen.add(key)
+        rows.append((index, row))
+
+    # Vérification des élèves en une requête
+    student_ids = {row['student_id'] for _index, row in rows}
+    classes = dict(
+        db.session.query(User.id, User.current_class_id)
+        .filter(User.id.in_(student_ids), User.role == 'student').all()
+    ) if student_ids else {}
+
+    valid = []
+    for index, row in rows:
+        if row['student_id'] not in classes:
+            errors.append({'index': index, 'error': f"Élève introuvable: {row['student_id']}"})
+        elif class_id is not None and classes[row['student_id']] != class_id:
+            errors.append({'index': index, 'error': f"L'élève {row['student_id']} n'appartient pas à la classe"})
+        else:
+            valid.append(row)
+
+    errors.sort(key=lambda e: e['index'])
+    return valid, errors
+
+
+def _dialect_insert():
+    """Construction INSERT ... ON CONFLICT du SGBD courant (None si non supporté)"""
+    dialect = db.session.get_bind().dialect.name
+    if dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+        return insert
+    if dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+        return insert
+    return None
+
+
+def _existing_grade_ids(rows, period):
+    """Identifiants des notes déjà présentes pour les clés de la grille (une requête)"""
+    student_ids = {row['student_id'] for row in rows}
+    subject_names = {row['subject_name'] for row in rows}
+    return {
+        (student_id, subject_name): grade_id
+        for grade_id, student_id, subject_name in db.session.query(
+            Grade.id, Grade.student_id, Grade.subject_name
+        ).filter(
+            Grade.student_id.in_(student_ids),
+            Grade.subject_name.in_(subject_names),
+            Grade.period == period
+        ).all()
+    }
+
+
+def upsert_grades(rows, period, teacher_id=None, audit=True):
+    """
+    Écrit une grille validée : met à jour les notes existantes et crée les
+    autres, clé (élève, matière, période). Ne fait pas le commit. Un
+    événement "grades_saved" est ajouté au journal d'audit si audit est vrai.
+
+    Sous SQLite et PostgreSQL, l'écriture est un INSERT ... ON CONFLICT DO
+    UPDATE appuyé sur l'index unique de Grade : deux écritures concurrentes
+    ne peuvent pas créer de doublon. Les autres SGBD passent par une
+    recherche groupée suivie d'insertions et mises à jour en masse.
+
+    Returns:
+        Dict {'created', 'updated'}
+    """
+    if not rows:
+        return {'created': 0, 'updated': 0}
+
+    existing = _existing_grade_ids(rows, period)
+    now = datetime.utcnow()
+    values = []
+    for row in rows:
+        average = round((row['moy_cl'] + 2 * row['n_compo']) / 3, 2)
+        values.append(dict(row,
+                           period=period,
+                           teacher_id=teacher_id,
+                           appreciation=Grade.get_appreciation(average),
+                           date=now,
+                           created_at=now,
+                           updated_at=now))
+
+    insert = _dialect_insert()
+    if insert is not None:
+        for start in range(0, len(values), UPSERT_BATCH_SIZE):
+            stmt = insert(Grade.__table__).values(values[start:start + UPSERT_BATCH_SIZE])
+            stmt = stmt.on_conflict_do_update(
+                index_elements=['student_id', 'period', 'subject_name'],
+                set_={column: stmt.excluded[column] for column in UPSERT_UPDATED_COLUMNS}
+            )
+            db.session.execute(stmt)
+    else:
+        inserts = []
+        updates = []
+        for value in values:
+            grade_id = existing.get((value['student_id'], value['subject_name']))
+            if grade_id:
+                update = {column: value[column] for column in UPSERT_UPDATED_COLUMNS}
+                update['id'] = grade_id
+                updates.append(update)
+            else:
+                inserts.append(value)
+        if updates:
+            db.session.bulk_update_mappings(Grade, updates)
+        if inserts:
+            db.session.bulk_insert_mappings(Grade, inserts)
+
+    on_grades_changed({row['student_id'] for row in rows}, period)
+
+    updated = sum(1 for row in rows if (row['student_id'], row['subject_name']) in existing)
+    if audit:
+        audit_event('grades_saved', user_id=teacher_id, entity_type='Grade', details={
+            'period': period,
+            'created': len(rows) - updated,
+            'updated': updated,
+            'students': len({row['student_id'] for row in rows})
+        })
+    return {'created': len(rows) - updated, 'updated': updated}
+
+
+def save_grade(student_id, subject_name, period, moy_cl, n_compo, coef, teacher_id=None):
+    """
+    Crée ou met à jour une note unique (clé élève, matière, période).
+    Ne fait pas le commit.
+
+    Returns:
+        (Grade, created)
+    """
+    result = upsert_grades([{
+        'student_id': student_id,
+        'subject_name': subject_name,
+        'moy_cl': moy_cl,
+        'n_compo': n_compo,
+        'coef': coef
+    }], period, teacher_id=teacher_id, audit=False)
+
+    grade = Grade.query.filter_by(student_id=student_id, subject_name=subject_name, period=period)\
+        .populate_existing().one()
+    created = result['created'] == 1
+    audit_event('grade_created' if created else 'grade_updated', user_id=teacher_id,
+                entity_type='Grade', entity_id=grade.id)
+    return grade, created
@@ -0,0 +1,238 @@
+"""
+Messagerie interne - Envoi, lecture et boîtes paginées
+
+Le nombre de messages non lus de chaque utilisateur est dénormalisé dans
+users.unread_messages : incrémenté à l'envoi, décrémenté à la lecture
+(mark_messages_read, mark_thread_read). Le tableau de bord lit une
+colonne par clé primaire au lieu de compter les messages.
+
+Les boîtes de réception et d'envoi sont paginées par curseur sur
+(created_at, id), du plus récent au plus ancien, appuyées sur les index
+(recipient_id, created_at) et (sender_id, created_at) : le coût d'une page
+ne dépend pas de la taille de l'historique.
+
+Les messages échangés entre deux utilisateurs sont regroupés dans une
+conversation (MessageThread). La liste des conversations, avec dernier
+message et nombre de non lus, est obtenue en une requête groupée ; une
+conversation ouverte est marquée lue par un seul UPDATE.
+"""
+from collections import namedtuple
+from datetime import datetime
+from flask import current_app
+from sqlalchemy import func, case, and_, or_
+from sqlalchemy.orm import joinedload, aliased
+from gestion_scolaire import db
+from gestion_scolaire.models import User, Message, MessageThread
+from gestion_scolaire.pagination import keyset_page
+
+MAILBOXES = ('inbox', 'sent')
+
+# Ligne de la liste des conversations
+ThreadSummary = namedtuple('ThreadSummary', 'thread last_message other unread')
+
+
+def thread_between(user_id, other_id, subject):
+    """
+    Conversation entre deux utilisateurs, créée si besoin avec subject pour objet.
+    Ne fait pas le commit ; une création concurrente de la même paire lève
+    IntegrityError au commit (contrainte uq_message_threads_pair).
+    """
+    low, high = sorted((user_id, other_id))
+    thread = MessageThread.query.filter_by(user_low_id=low, user_high_id=high).first()
+    if thread is None:
+        thread = MessageThread(user_low_id=low, user_high_id=high, subject=subject)
+        db.session.add(thread)
+    return thread
+
+
+def send_message(sender_id, recipient_id, subject, content):
+    """
+    Crée un message dans la conversation des deux utilisateurs et incrémente
+    le compteur du destinataire. Ne fait pas le commit.
+    """
+    thread = thread_between(sender_id, recipient_id, subject)
+    message = Message(thread=thread, sender_id=sender_id, recipient_id=recipient_id,
+                      subject=subject, content=content)
+    db.session.add(message)
+    db.session.query(User).filter(User.id == recipient_id)\
+        .update({User.unread_messages: User.unread_messages + 1}, synchronize_session=False)
+    return message
+
+
+def reply_to_thread(thread, sender_id, content):
+    """Répond dans une conversation à l'autre participant. Ne fait pas le commit."""
+    recipient_id = thread.user_high_id if sender_id == thread.user_low_id else thread.user_low_id
+    subject = f'Re: {thread.subject}'[:200]
+    return send_message(sender_id, recipient_id, subject, content)
+
+
+def mark_messages_read(user_id, message_ids):
+    """
+    Marque comme lus les messages reçus par user_id parmi message_ids.
+
+    La mise à jour ne porte que sur les messages encore non lus : deux
+    lectures concurrentes ne décrémentent le compteur qu'une fois.
+    Ne fait pas le commit.
+
+    Returns:
+        Nombre de messages marqués
+    """
+    if not message_ids:
+        return 0
+    return _mark_read(user_id, Message.id.in_(list(message_ids)))
+
+
+def mark_thread_read(user_id, thread_id):
+    """
+    Marque comme lus, en un seul UPDATE, les messages de la conversation
+    reçus par user_id. Ne fait pas le commit.
+
+    Returns:
+        Nombre de messages marqués
+    """
+    return _mark_read(user_id, Message.thread_id == thread_id)
+
+
+def _mark_read(user_id, criterion):
+    """Marque lus les messages non lus de user_id filtrés par criterion et met à jour son compteur"""
+    marked = db.session.query(Message).filter(
+        criterion,
+        Message.recipient_id == user_id,
+        Message.is_read == False
+    ).update({Message.is_read: True, Message.read_at: datetime.utcnow()}, synchronize_session=False)
+    if marked:
+        db.session.query(User).filter(User.id == user_id).update(
+            {User.unread_messages: case((User.unread_messages > marked, User.unread_messages - marked), else_=0)},
+            synchronize_session=False
+        )
+    return marked
+
+
+def unread_count(user_id):
+    """Nombre de messages non lus (compteur dénormalisé)"""
+    return db.session.query(User.unread_messages).filter(User.id == user_id).scalar() or 0
+
+
+def mailbox_page(user_id, box='inbox', cursor=None, limit=None):
+    """
+    Page d'une boîte, du plus récent au plus ancien.
+
+    Args:
+        box: 'inbox' (reçus) ou 'sent' (envoyés)
+        cursor: Curseur de la page précédente (None pour la première)
+        limit: Messages par page (ITEMS_PER_PAGE par défaut)
+
+    Returns:
+        (messages, curseur de la page suivante ou None)
+
+    Raises:
+        ValueError si la boîte ou le curseur est invalide
+    """
+    if box not in MAILBOXES:
+        raise ValueError(f'Boîte inconnue: {box}')
+    if box == 'inbox':
+        query = Message.query.filter(Message.recipient_id == user_id)\
+            .options(joinedload(Message.sender))
+    else:
+        query = Message.query.filter(Message.sender_id == user_id)\
+            .options(joinedload(Message.recipient))
+
+    return keyset_page(
+        query, [Message.created_at, Message.id],
+        key=lambda m: (m.created_at, m.id),
+        cursor=cursor,
+        limit=limit or current_app.config['ITEMS_PER_PAGE'],
+        descending=True
+    )
+
+
+def thread_list(user_id, before=None, limit=None):
+    """
+    Conversations de user_id, de la plus récemment active à la plus ancienne.
+
+    Une requête : les messages sont groupés par conversation (dernier message
+    = plus grand identifiant, nombre de non lus reçus), puis joints au
+    dernier message et à l'interlocuteur.
+
+    Args:
+        before: Curseur de la page précédente (identifiant du dernier message
+            de sa dernière conversation), None pour la première
+        limit: Conversations par page (ITEMS_PER_PAGE par défaut)
+
+    Returns:
+        (liste de ThreadSummary, curseur de la page suivante ou None)
+    """
+    limit = limit or current_app.config['ITEMS_PER_PAGE']
+    unread = func.sum(case((and_(Message.recipient_id == user_id, Message.is_read == False), 1), else_=0))
+    stats = db.session.query(
+        Message.thread_id.label('thread_id'),
+        func.max(Message.id).label('last_message_id'),
+        unread.label('unread')
+    ).join(MessageThread, MessageThread.id == Message.thread_id)\
+     .filter(or_(MessageThread.user_low_id == user_id, MessageThread.user_high_id == user_id))\
+     .group_by(Message.thread_id)
+    if before is not None:
+        stats = stats.having(func.max(Message.id) < before)
+    stats = stats.subquery()
+
+    other = aliased(User)
+    other_id = case((MessageThread.user_low_id == user_id, MessageThread.user_high_id),
+                    else_=MessageThread.user_low_id)
+    rows = db.session.query(MessageThread, Message, other, stats.c.unread)\
+        .join(stats, stats.c.thread_id == MessageThread.id)\
+        .join(Message, Message.id == stats.c.last_message_id)\
+        .join(other, other.id == other_id)\
+        .order_by(stats.c.last_message_id.desc())\
+        .limit(limit + 1).all()
+
+    summaries = [ThreadSummary(thread, last_message, other_user, thread_unread or 0)
+                 for thread, last_message, other_user, thread_unread in rows[:limit]]
+    next_cursor = summaries[-1].last_message.id if len(rows) > limit else None
+    return summaries, next_cursor
+
+
+def thread_messages(thread_id):
+    """Messages d'une conversation, dans l'ordre chronologique"""
+    return Message.query.filter_by(thread_id=thread_id)\
+        .order_by(Message.created_at, Message.id).all()
+
+
+def assign_message_threads():
+    """
+    Range dans une conversation les messages qui n'en ont pas (mise à niveau,
+    données générées) : une conversation par paire d'utilisateurs, ayant pour
+    objet celui du premier message. Ne fait pas le commit.
+
+    Returns:
+        Nombre de conversations créées
+    """
+    low = case((Message.sender_id < Message.recipient_id, Message.sender_id), else_=Message.recipient_id)
+    high = case((Message.sender_id < Message.recipient_id, Message.recipient_id), else_=Message.sender_id)
+    pairs = db.session.query(low.label('low'), high.label('high'), func.min(Message.id).label('first_id'))\
+        .filter(Message.thread_id.is_(None)).group_by(low, high).subquery()
+    first_message = aliased(Message)
+    rows = db.session.query(pairs.c.low, pairs.c.high, first_message.subject)\
+        .join(first_message, first_message.id == pairs.c.first_id).all()
+    if not rows:
+        return 0
+
+    existing = set(db.session.query(MessageThread.user_low_id, MessageThread.user_high_id).all())
+    now = datetime.utcnow()
+    missing = [{'user_low_id': pair_low, 'user_high_id': pair_high, 'subject': subject, 'created_at': now}
+               for pair_low, pair_high, subject in rows if (pair_low, pair_high) not in existing]
+    if missing:
+        db.session.execute(MessageThread.__table__.insert(), missing)
+
+    thread_id = db.session.query(MessageThread.id).filter(
+        MessageThread.user_low_id == low, MessageThread.user_high_id == high
+    ).scalar_subquery()
+    db.session.query(Message).filter(Message.thread_id.is_(None))\
+        .update({Message.thread_id: thread_id}, synchronize_session=False)
+    return len(missing)
+
+
+def recount_unread_messages():
+    """Recalcule tous les compteurs de messages non lus (mise à niveau, rattrapage)"""
+    unread = db.session.query(func.count(Message.id))\
+        .filter(Message.recipient_id == User.id, Message.is_read == False).scalar_subquery()
+    db.session.query(User).update({User.unread_messages: unread}, synchronize_session=False)
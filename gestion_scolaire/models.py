@@ -69,6 +69,9 @@ class User(UserMixin, db.Model):
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     last_login = db.Column(db.DateTime, nullable=True)
     
+    # Messages reçus non lus (compteur dénormalisé, voir messaging.py)
+    unread_messages = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    
     def set_password(self, password):
         """Hache et stocke le mot de passe"""
         self.password_hash = generate_password_hash(password)
@@ -193,9 +196,13 @@ class Subject(db.Model):
 class Grade(db.Model):
     """Modèle pour les notes des étudiants"""
     __tablename__ = 'grades'
+    __table_args__ = (
+        # Une note par élève, période et matière ; sert aussi aux recherches (élève, période)
+        db.Index('uq_grade_student_period_subject', 'student_id', 'period', 'subject_name', unique=True),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
-    student_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
+    student_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     subject_id = db.Column(db.Integer, db.ForeignKey('subjects.id'), nullable=True)
     subject_name = db.Column(db.String(100), nullable=False)  # Nom de la matière (pour flexibilité)
     
@@ -258,6 +265,36 @@ class Grade(db.Model):
         return f'<Grade {self.subject_name} for student {self.student_id}: {self.average}>'
 
 
+class StudentPeriodSummary(db.Model):
+    """Agrégat matérialisé des notes d'un élève pour une période"""
+    __tablename__ = 'student_period_summaries'
+    __table_args__ = (
+        db.UniqueConstraint('student_id', 'period', name='uq_summary_student_period'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    student_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
+    period = db.Column(db.String(50), nullable=False)
+    
+    # Totaux (MG × coef et somme des coefficients)
+    total_points = db.Column(db.Float, nullable=False, default=0)
+    total_coef = db.Column(db.Integer, nullable=False, default=0)
+    general_average = db.Column(db.Float, nullable=False, default=0)
+    grade_count = db.Column(db.Integer, nullable=False, default=0)
+    
+    # Rang dans la classe pour la période
+    rank = db.Column(db.Integer, nullable=True)
+    
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    # Relations
+    student = db.relationship('User', backref=db.backref('period_summaries', lazy='dynamic',
+                                                         cascade='all, delete-orphan'))
+    
+    def __repr__(self):
+        return f'<StudentPeriodSummary {self.student_id} - {self.period}: {self.general_average}>'
+
+
 class BulletinStructure(db.Model):
     """Modèle pour la structure des bulletins par classe"""
     __tablename__ = 'bulletin_structures'
@@ -301,9 +338,15 @@ class BulletinStructure(db.Model):
 class Attendance(db.Model):
     """Modèle pour le suivi des présences"""
     __tablename__ = 'attendance'
+    __table_args__ = (
+        # Un relevé par élève, classe, jour et demi-journée
+        db.Index('uq_attendance_student_class_date_period', 'student_id', 'class_id', 'date', 'period', unique=True),
+        # Appel d'une classe pour un jour
+        db.Index('ix_attendance_class_date', 'class_id', 'date'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
-    student_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
+    student_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     class_id = db.Column(db.Integer, db.ForeignKey('school_classes.id'), nullable=False)
     date = db.Column(db.Date, nullable=False, index=True)
     
@@ -311,8 +354,9 @@ class Attendance(db.Model):
     status = db.Column(db.String(20), nullable=False, default='present')
     reason = db.Column(db.Text, nullable=True)
     
-    # Période de la journée (optionnel)
-    period = db.Column(db.String(20), nullable=True)  # 'morning', 'afternoon'
+    # Période de la journée : 'morning', 'afternoon' ou '' (journée entière).
+    # Jamais NULL, sinon l'index unique ne s'appliquerait pas.
+    period = db.Column(db.String(20), nullable=False, default='', server_default='')
     
     # Enregistré par
     recorded_by = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=True)
@@ -328,11 +372,56 @@ class Attendance(db.Model):
         return f'<Attendance {self.student_id} - {self.date}: {self.status}>'
 
 
+class MessageThread(db.Model):
+    """Conversation entre deux utilisateurs (parent et enseignant ou administration)"""
+    __tablename__ = 'message_threads'
+    __table_args__ = (
+        # Une seule conversation par paire, rangée dans l'ordre des identifiants
+        db.UniqueConstraint('user_low_id', 'user_high_id', name='uq_message_threads_pair'),
+        db.Index('ix_message_threads_high', 'user_high_id'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    user_low_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    user_high_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    
+    # Objet du premier message
+    subject = db.Column(db.String(200), nullable=False)
+    
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    # Relations
+    user_low = db.relationship('User', foreign_keys=[user_low_id])
+    user_high = db.relationship('User', foreign_keys=[user_high_id])
+    messages = db.relationship('Message', backref='thread', lazy='dynamic')
+    
+    def has_participant(self, user_id):
+        """Vérifie que l'utilisateur participe à la conversation"""
+        return user_id in (self.user_low_id, self.user_high_id)
+    
+    def other_participant(self, user_id):
+        """L'interlocuteur de user_id"""
+        return self.user_high if user_id == self.user_low_id else self.user_low
+    
+    def __repr__(self):
+        return f'<MessageThread {self.user_low_id}-{self.user_high_id}>'
+
+
 class Message(db.Model):
     """Modèle pour la messagerie interne"""
     __tablename__ = 'messages'
+    __table_args__ = (
+        # Boîte de réception (plus récents d'abord) et messages non lus
+        db.Index('ix_messages_recipient_created', 'recipient_id', 'created_at'),
+        db.Index('ix_messages_recipient_unread', 'recipient_id', 'is_read', 'created_at'),
+        # Messages envoyés
+        db.Index('ix_messages_sender_created', 'sender_id', 'created_at'),
+        # Messages d'une conversation
+        db.Index('ix_messages_thread_created', 'thread_id', 'created_at'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
+    thread_id = db.Column(db.Integer, db.ForeignKey('message_threads.id'), nullable=True)
     sender_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     recipient_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     
@@ -348,11 +437,6 @@ class Message(db.Model):
     sender = db.relationship('User', foreign_keys=[sender_id], backref='sent_messages')
     recipient = db.relationship('User', foreign_keys=[recipient_id], backref='received_messages')
     
-    def mark_as_read(self):
-        """Marque le message comme lu"""
-        self.is_read = True
-        self.read_at = datetime.utcnow()
-    
     def __repr__(self):
         return f'<Message from {self.sender_id} to {self.recipient_id}>'
 
@@ -360,6 +444,12 @@ class Message(db.Model):
 class Announcement(db.Model):
     """Modèle pour les annonces générales"""
     __tablename__ = 'announcements'
+    __table_args__ = (
+        # Fils d'annonces : actives les plus récentes, par public ou par classe
+        db.Index('ix_announcements_active_created', 'is_active', 'created_at'),
+        db.Index('ix_announcements_active_audience', 'is_active', 'target_audience', 'created_at'),
+        db.Index('ix_announcements_class_active', 'target_class_id', 'is_active', 'created_at'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(200), nullable=False)
@@ -394,6 +484,12 @@ class Announcement(db.Model):
 class AuditLog(db.Model):
     """Modèle pour tracer les actions importantes"""
     __tablename__ = 'audit_logs'
+    __table_args__ = (
+        # Journal paginé par date, archivage des lignes anciennes
+        db.Index('ix_audit_logs_created_at', 'created_at'),
+        # Historique d'un utilisateur
+        db.Index('ix_audit_logs_user_created', 'user_id', 'created_at'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=True)
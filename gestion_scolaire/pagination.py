@@ -0,0 +1,137 @@
+"""
+Pagination par curseur (keyset) et sélection de champs pour l'API
+
+Au lieu d'un OFFSET, chaque page reprend après la clé de tri du dernier
+élément renvoyé : le coût d'une page ne dépend pas de sa position dans la
+liste. Le curseur est la clé de tri encodée en base64 (opaque pour le client).
+"""
+import base64
+import json
+from datetime import datetime
+from decimal import Decimal
+from flask import current_app
+from sqlalchemy import and_, or_
+
+
+def encode_cursor(values):
+    """Encode une clé de tri en curseur opaque"""
+    payload = json.dumps(list(values), separators=(',', ':'), default=str)
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii')
+
+
+def decode_cursor(cursor):
+    """Décode un curseur ; lève ValueError s'il est invalide"""
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8'))
+    except (ValueError, UnicodeError):
+        raise ValueError('Curseur invalide')
+    if not isinstance(values, list):
+        raise ValueError('Curseur invalide')
+    return values
+
+
+def page_size(requested):
+    """Taille de page bornée par la configuration"""
+    default = current_app.config.get('API_PAGE_SIZE', 100)
+    maximum = current_app.config.get('API_MAX_PAGE_SIZE', 1000)
+    if not requested or requested < 1:
+        return default
+    return min(requested, maximum)
+
+
+def _after(columns, values, descending=False):
+    """Condition « strictement après » pour une clé de tri multi-colonnes"""
+    clauses = []
+    for i, column in enumerate(columns):
+        equal = [columns[j] == values[j] for j in range(i)]
+        clauses.append(and_(*equal, column < values[i] if descending else column > values[i]))
+    return or_(*clauses)
+
+
+def _cursor_value(column, value):
+    """
+    Valeur du curseur convertie au type de la colonne (les dates voyagent en
+    texte) ; lève ValueError si elle n'est pas un scalaire du type attendu.
+    None est refusé : une clé de tri ne se compare pas à NULL.
+    """
+    if not isinstance(value, (str, int, float, bool)):
+        raise ValueError('Curseur invalide')
+    try:
+        python_type = column.type.python_type
+    except NotImplementedError:
+        return value
+    if python_type is datetime:
+        if not isinstance(value, str):
+            raise ValueError('Curseur invalide')
+        try:
+            return datetime.fromisoformat(value)
+        except ValueError:
+            raise ValueError('Curseur invalide')
+    if python_type is bool:
+        expected = (bool,)
+    elif python_type is int:
+        expected = (int,)
+    elif python_type in (float, Decimal):
+        expected = (int, float)
+    else:
+        expected = (python_type,)
+    # bool est un int en Python : ne l'accepter que pour une colonne booléenne
+    if not isinstance(value, expected) or (isinstance(value, bool) and python_type is not bool):
+        raise ValueError('Curseur invalide')
+    return value
+
+
+def keyset_page(query, columns, key, cursor=None, limit=None, descending=False):
+    """
+    Renvoie une page d'une requête triée sur columns (la dernière colonne doit
+    être unique, typiquement la clé primaire).
+
+    Args:
+        query: Requête filtrée, non triée
+        columns: Expressions de tri
+        key: Fonction ligne -> valeurs de columns pour cette ligne
+        cursor: Curseur reçu du client (None pour la première page)
+        limit: Taille de page demandée (bornée par API_MAX_PAGE_SIZE)
+        descending: Ordre décroissant sur toutes les colonnes (plus récents d'abord)
+
+    Returns:
+        (lignes de la page, curseur de la page suivante ou None)
+
+    Raises:
+        ValueError si le curseur est invalide
+    """
+    limit = page_size(limit)
+    if cursor:
+        values = decode_cursor(cursor)
+        if len(values) != len(columns):
+            raise ValueError('Curseur invalide')
+        values = [_cursor_value(column, value) for column, value in zip(columns, values)]
+        query = query.filter(_after(columns, values, descending))
+
+    order = [column.desc() for column in columns] if descending else columns
+    rows = query.order_by(*order).limit(limit + 1).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(key(rows[-1]))
+    return rows, next_cursor
+
+
+def parse_fields(param, available):
+    """
+    Sélection de champs (?fields=id,name).
+
+    Args:
+        param: Valeur du paramètre (None ou vide = tous les champs)
+        available: Champs disponibles, dans l'ordre par défaut
+
+    Raises:
+        ValueError si un champ est inconnu
+    """
+    if not param:
+        return list(available)
+    fields = [f.strip() for f in param.split(',') if f.strip()]
+    unknown = [f for f in fields if f not in available]
+    if unknown:
+        raise ValueError(f"Champ(s) inconnu(s): {', '.join(unknown)}")
+    return fields
@@ -0,0 +1,174 @@
+"""
+Cache disque des bulletins PDF
+
+Les bulletins sont adressés par le contenu : la clé est l'empreinte SHA-256
+des données passées à generate_bulletin_pdf. Un bulletin déjà rendu est servi
+directement depuis le disque, sans ReportLab.
+
+Organisation : <dossier>/<student_id>/<période>/<empreinte>.pdf
+L'éviction suit l'ordre LRU (date de dernier accès = mtime) dès que la taille
+totale dépasse la limite configurée. La taille totale est tenue à jour en
+mémoire (écritures, invalidations) : le dossier n'est parcouru que lorsque
+la limite est dépassée, et l'éviction redescend à EVICTION_TARGET de la
+limite pour que les rendus suivants ne relancent pas un parcours chacun.
+
+La taille en mémoire ne compte que les écritures du processus ; elle est
+donc remesurée sur disque toutes les RESYNC_WRITES écritures. Avec N
+processus (workers, ProcessPoolExecutor), le cache peut dépasser la limite
+d'au plus environ N × RESYNC_WRITES bulletins avant qu'un parcours ne le
+ramène sous la limite.
+"""
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+from flask import current_app
+from werkzeug.utils import secure_filename
+from gestion_scolaire.pdf_generator import generate_bulletin_pdf
+
+EVICTION_TARGET = 0.9  # Fraction de la limite visée après une éviction
+RESYNC_WRITES = 50  # Écritures du processus entre deux mesures sur disque
+
+
+class BulletinCache:
+    """Cache de bulletins PDF sur disque, borné en taille"""
+
+    def __init__(self, directory, max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._total = None  # Taille totale connue en octets (None = à mesurer)
+        self._writes = 0  # Écritures depuis la dernière mesure
+        os.makedirs(self.directory, exist_ok=True)
+
+    @staticmethod
+    def make_key(student_data, grades_part1, grades_part2, summary_data):
+        """Empreinte des données d'entrée du bulletin"""
+        payload = json.dumps(
+            [student_data, grades_part1, grades_part2, summary_data],
+            sort_keys=True, default=str, ensure_ascii=False
+        )
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def _student_dir(self, student_id, period=None):
+        path = os.path.join(self.directory, str(int(student_id)))
+        if period is not None:
+            path = os.path.join(path, secure_filename(str(period)) or '_')
+        return path
+
+    def path_for(self, student_id, period, key):
+        return os.path.join(self._student_dir(student_id, period), f'{key}.pdf')
+
+    def get(self, student_id, period, key):
+        """Retourne le chemin du bulletin en cache, ou None"""
+        path = self.path_for(student_id, period, key)
+        try:
+            os.utime(path)  # Marquer comme récemment utilisé
+        except FileNotFoundError:
+            return None
+        return path
+
+    def get_or_render(self, student_id, period, student_data, grades_part1, grades_part2, summary_data):
+        """
+        Retourne le chemin d'un bulletin à jour, en le rendant si nécessaire.
+        """
+        key = self.make_key(student_data, grades_part1, grades_part2, summary_data)
+        path = self.get(student_id, period, key)
+        if path:
+            return path
+
+        path = self.path_for(student_id, period, key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        # Écriture atomique : rendu dans un fichier temporaire du même dossier
+        fd, tmp_path = tempfile.mkstemp(suffix='.tmp', dir=os.path.dirname(path))
+        os.close(fd)
+        try:
+            generate_bulletin_pdf(tmp_path, student_data, grades_part1, grades_part2, summary_data)
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+        with self._lock:
+            self._writes += 1
+            if self._writes >= RESYNC_WRITES:
+                self._total = None  # Prendre en compte les écritures des autres processus
+            elif self._total is not None:
+                self._total += os.path.getsize(path)
+        self.evict()
+        return path
+
+    def invalidate(self, student_id, period=None):
+        """Supprime les bulletins en cache d'un élève (pour une période ou toutes)"""
+        directory = self._student_dir(student_id, period)
+        with self._lock:
+            removed = sum(size for _mtime, size, _path in self._entries(directory))
+            shutil.rmtree(directory, ignore_errors=True)
+            if self._total is not None:
+                self._total = max(0, self._total - removed)
+
+    def clear(self):
+        """Vide entièrement le cache"""
+        with self._lock:
+            shutil.rmtree(self.directory, ignore_errors=True)
+            os.makedirs(self.directory, exist_ok=True)
+            self._total = 0
+            self._writes = 0
+
+    def _entries(self, directory=None):
+        for root, _dirs, files in os.walk(directory or self.directory):
+            for name in files:
+                if not name.endswith('.pdf'):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                yield stat.st_mtime, stat.st_size, path
+
+    def size(self):
+        """Taille totale du cache en octets"""
+        return sum(size for _mtime, size, _path in self._entries())
+
+    def evict(self):
+        """
+        Supprime les bulletins les moins récemment utilisés quand la taille
+        dépasse la limite (parcours du dossier uniquement dans ce cas).
+        """
+        with self._lock:
+            if self._total is not None and self._total <= self.max_bytes:
+                return
+            entries = list(self._entries())
+            total = sum(size for _mtime, size, _path in entries)
+            if total > self.max_bytes:
+                target = self.max_bytes * EVICTION_TARGET
+                for _mtime, size, path in sorted(entries):
+                    try:
+                        os.remove(path)
+                    except FileNotFoundError:
+                        pass
+                    total -= size
+                    if total <= target:
+                        break
+            self._total = total
+            self._writes = 0
+
+
+def get_bulletin_cache(app=None):
+    """Retourne le cache de bulletins de l'application (créé à la demande)"""
+    app = app or current_app._get_current_object()
+    cache = app.extensions.get('bulletin_cache')
+    if cache is None:
+        cache = BulletinCache(app.config['BULLETIN_CACHE_DIR'],
+                              app.config['BULLETIN_CACHE_MAX_BYTES'])
+        app.extensions['bulletin_cache'] = cache
+    return cache
+
+
+def invalidate_student_bulletins(student_id, period=None):
+    """Invalide les bulletins en cache d'un élève après modification de ses notes"""
+    get_bulletin_cache().invalidate(student_id, period)
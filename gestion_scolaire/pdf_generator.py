@@ -2,6 +2,8 @@
 Générateur de bulletins PDF - Version améliorée
 """
 import os
+import tempfile
+import threading
 from reportlab.lib.pagesizes import A4
 from reportlab.lib import colors
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
@@ -10,204 +12,110 @@ from reportlab.platypus import SimpleDocTemplate, Paragraph, Table, TableStyle,
 from reportlab.lib.enums import TA_CENTER, TA_LEFT, TA_RIGHT
 from datetime import datetime
 
+# Au-delà de cette taille, un tampon PDF bascule de la mémoire vers un fichier temporaire
+PDF_SPOOL_MAX_MEMORY = 5 * 1024 * 1024
 
-def generate_bulletin_pdf(pdf_path, student_data, grades_part1, grades_part2, summary_data):
+
+def new_pdf_buffer(max_memory=PDF_SPOOL_MAX_MEMORY):
     """
-    Génère un bulletin de notes au format PDF professionnel.
+    Crée un tampon de sortie pour un PDF.
     
-    Args:
-        pdf_path: Chemin où sauvegarder le PDF
-        student_data: Dict contenant les infos de l'école et de l'élève
-            - name: Nom complet de l'élève
-            - class: Nom de la classe
-            - period: Période (1ère Période, 2e Période, etc.)
-            - school_name: Nom de l'école
-        grades_part1: Liste des notes pour les matières principales
-            Chaque élément: {subject, moy_cl, n_compo, coef, mg, moy_coef, appreciation}
-        grades_part2: Liste des notes pour les matières secondaires
-        summary_data: Dict contenant les totaux et moyennes
-            - total_points: Total des points coefficientés
-            - total_coef: Total des coefficients
-            - general_average: Moyenne générale
-            - appreciation: Appréciation globale
+    Le contenu reste en mémoire jusqu'à max_memory octets puis est déplacé dans
+    un fichier temporaire, supprimé automatiquement à la fermeture du tampon
+    (send_file ferme le fichier une fois la réponse envoyée).
     """
-    doc = SimpleDocTemplate(
-        pdf_path, 
-        pagesize=A4,
-        rightMargin=15*mm, 
-        leftMargin=15*mm,
-        topMargin=15*mm, 
-        bottomMargin=15*mm
-    )
-    
-    styles = getSampleStyleSheet()
-    
-    # Styles personnalisés
-    title_style = ParagraphStyle(
-        'CustomTitle',
-        parent=styles['Heading1'],
-        fontSize=16,
-        alignment=TA_CENTER,
-        spaceAfter=10,
-        textColor=colors.darkblue,
-        fontName='Helvetica-Bold'
-    )
-    
-    subtitle_style = ParagraphStyle(
-        'Subtitle',
-        parent=styles['Heading2'],
-        fontSize=12,
-        alignment=TA_CENTER,
-        spaceAfter=8,
-        textColor=colors.black
-    )
-    
-    header_style = ParagraphStyle(
-        'Header',
-        parent=styles['Normal'],
-        fontSize=10,
-        alignment=TA_CENTER,
-        spaceAfter=6
-    )
-    
-    info_style = ParagraphStyle(
-        'Info',
-        parent=styles['Normal'],
-        fontSize=10,
-        alignment=TA_LEFT,
-        spaceAfter=4
-    )
-    
-    section_style = ParagraphStyle(
-        'Section',
-        parent=styles['Heading3'],
-        fontSize=11,
-        alignment=TA_LEFT,
-        spaceAfter=6,
-        textColor=colors.darkblue,
-        fontName='Helvetica-Bold'
-    )
-    
-    story = []
-    
-    # ========== EN-TÊTE ==========
-    school_name = student_data.get('school_name', 'Lycée Michel ALLAIRE')
-    header_data = [
-        [Paragraph(f"<b>{school_name}</b>", header_style)],
-        [Paragraph("BP: 580 - Ségou, Mali", header_style)],
-        [Paragraph("Tél: 21-32-11-20 / 79 07 03 60", header_style)]
-    ]
-    header_table = Table(header_data, colWidths=[180*mm])
-    header_table.setStyle(TableStyle([
-        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-        ('BOTTOMPADDING', (0, 0), (-1, -1), 2),
-    ]))
-    story.append(header_table)
-    story.append(Spacer(1, 10))
-    
-    # Ligne de séparation
-    line_table = Table([['']]) 
-    line_table.setStyle(TableStyle([
-        ('LINEBELOW', (0, 0), (-1, -1), 2, colors.darkblue),
-    ]))
-    story.append(line_table)
-    story.append(Spacer(1, 10))
+    return tempfile.SpooledTemporaryFile(max_size=max_memory, mode='w+b', suffix='.pdf')
+
+
+def _rewind(output):
+    """Replace un objet fichier au début pour qu'il puisse être relu/streamé"""
+    if hasattr(output, 'seek'):
+        output.seek(0)
+    return output
+
+
+# Mise en page commune des bulletins
+PAGE_MARGIN = 15*mm
+GRADES_HEADERS = ['MATIÈRE', 'MOY.CL', 'N.COMPO', 'M.G.', 'COEF', 'MOY×COEF', 'APPRÉCIATION']
+GRADES_COL_WIDTHS = [35*mm, 18*mm, 18*mm, 15*mm, 12*mm, 22*mm, 60*mm]
+STUDENT_COL_WIDTHS = [25*mm, 65*mm, 25*mm, 65*mm]
+SUMMARY_COL_WIDTHS = [50*mm, 50*mm]
+SIGNATURE_COL_WIDTHS = [60*mm, 60*mm, 60*mm]
+
+
+def _format_number(value):
+    """Formate une valeur numérique du tableau de notes ('-' et textes inchangés)"""
+    if isinstance(value, (int, float)):
+        return f"{value:.2f}"
+    return str(value)
+
+
+class BulletinRenderer:
+    """
+    Moteur de rendu des bulletins.
     
-    # ========== TITRE DU BULLETIN ==========
-    period = student_data.get('period', '1ère Période')
-    story.append(Paragraph(f"<b>BULLETIN DE NOTES - {period}</b>", title_style))
-    story.append(Spacer(1, 8))
+    Les styles de paragraphes, les TableStyle, les largeurs de colonnes et les
+    blocs statiques (en-tête de l'établissement, signatures, titres de section)
+    sont construits une seule fois puis réutilisés pour chaque élève.
     
-    # ========== INFORMATIONS ÉLÈVE ==========
-    student_info_data = [
-        ['Élève:', student_data.get('name', 'N/A'), 'Classe:', student_data.get('class', 'N/A')],
-        ['Année scolaire:', '2024-2025', 'Date:', datetime.now().strftime('%d/%m/%Y')]
-    ]
-    student_table = Table(student_info_data, colWidths=[25*mm, 65*mm, 25*mm, 65*mm])
-    student_table.setStyle(TableStyle([
-        ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
-        ('FONTNAME', (2, 0), (2, -1), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, -1), 10),
-        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-        ('BOTTOMPADDING', (0, 0), (-1, -1), 4),
-        ('TOPPADDING', (0, 0), (-1, -1), 4),
-        ('BACKGROUND', (0, 0), (-1, -1), colors.Color(0.95, 0.95, 0.95)),
-        ('BOX', (0, 0), (-1, -1), 1, colors.grey),
-    ]))
-    story.append(student_table)
-    story.append(Spacer(1, 12))
+    Les blocs statiques étant des flowables partagés, une instance ne doit pas
+    être utilisée par plusieurs threads à la fois : passer par
+    get_bulletin_renderer(), qui en fournit une par thread (et donc par
+    processus de rendu).
+    """
     
-    # ========== FONCTION POUR CRÉER UN TABLEAU DE NOTES ==========
-    def create_grades_table(grades_list, title):
-        """Crée un tableau de notes formaté"""
-        section_elements = []
-        section_elements.append(Paragraph(f"<b>{title}</b>", section_style))
-        section_elements.append(Spacer(1, 4))
-        
-        # En-têtes
-        headers = ['MATIÈRE', 'MOY.CL', 'N.COMPO', 'M.G.', 'COEF', 'MOY×COEF', 'APPRÉCIATION']
-        data = [headers]
-        
-        total_mg = 0
-        total_coef = 0
-        total_weighted = 0
-        
-        for grade in grades_list:
-            moy_cl = grade.get('moy_cl', '-')
-            n_compo = grade.get('n_compo', '-')
-            mg = grade.get('mg', '-')
-            coef = grade.get('coef', '-')
-            moy_coef = grade.get('moy_coef', '-')
-            
-            # Formater les nombres
-            if isinstance(moy_cl, (int, float)):
-                moy_cl_str = f"{moy_cl:.2f}"
-                total_mg += moy_cl
-            else:
-                moy_cl_str = str(moy_cl)
-            
-            if isinstance(n_compo, (int, float)):
-                n_compo_str = f"{n_compo:.2f}"
-            else:
-                n_compo_str = str(n_compo)
-            
-            if isinstance(mg, (int, float)):
-                mg_str = f"{mg:.2f}"
-            else:
-                mg_str = str(mg)
-            
-            if isinstance(coef, (int, float)):
-                coef_str = str(int(coef))
-                total_coef += coef
-            else:
-                coef_str = str(coef)
-            
-            if isinstance(moy_coef, (int, float)):
-                moy_coef_str = f"{moy_coef:.2f}"
-                total_weighted += moy_coef
-            else:
-                moy_coef_str = str(moy_coef)
-            
-            row = [
-                grade.get('subject', 'N/A'),
-                moy_cl_str,
-                n_compo_str,
-                mg_str,
-                coef_str,
-                moy_coef_str,
-                grade.get('appreciation', '-')
-            ]
-            data.append(row)
+    def __init__(self):
+        styles = getSampleStyleSheet()
         
-        # Ligne de total
-        if total_coef > 0:
-            section_avg = total_weighted / total_coef
-            data.append(['TOTAL/MOYENNE', '', '', f"{section_avg:.2f}", str(int(total_coef)), f"{total_weighted:.2f}", ''])
+        self.title_style = ParagraphStyle(
+            'CustomTitle',
+            parent=styles['Heading1'],
+            fontSize=16,
+            alignment=TA_CENTER,
+            spaceAfter=10,
+            textColor=colors.darkblue,
+            fontName='Helvetica-Bold'
+        )
+        self.header_style = ParagraphStyle(
+            'Header',
+            parent=styles['Normal'],
+            fontSize=10,
+            alignment=TA_CENTER,
+            spaceAfter=6
+        )
+        self.section_style = ParagraphStyle(
+            'Section',
+            parent=styles['Heading3'],
+            fontSize=11,
+            alignment=TA_LEFT,
+            spaceAfter=6,
+            textColor=colors.darkblue,
+            fontName='Helvetica-Bold'
+        )
+        self.footer_style = ParagraphStyle(
+            'Footer',
+            parent=styles['Normal'],
+            fontSize=8,
+            alignment=TA_CENTER,
+            textColor=colors.grey
+        )
         
-        # Créer le tableau
-        table = Table(data, colWidths=[35*mm, 18*mm, 18*mm, 15*mm, 12*mm, 22*mm, 60*mm])
-        table.setStyle(TableStyle([
+        self.header_table_style = TableStyle([
+            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+            ('BOTTOMPADDING', (0, 0), (-1, -1), 2),
+        ])
+        self.student_table_style = TableStyle([
+            ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
+            ('FONTNAME', (2, 0), (2, -1), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, -1), 10),
+            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+            ('BOTTOMPADDING', (0, 0), (-1, -1), 4),
+            ('TOPPADDING', (0, 0), (-1, -1), 4),
+            ('BACKGROUND', (0, 0), (-1, -1), colors.Color(0.95, 0.95, 0.95)),
+            ('BOX', (0, 0), (-1, -1), 1, colors.grey),
+        ])
+        self.grades_table_style = TableStyle([
             # En-tête
             ('BACKGROUND', (0, 0), (-1, 0), colors.Color(0.2, 0.3, 0.5)),
             ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
@@ -237,106 +145,237 @@ def generate_bulletin_pdf(pdf_path, student_data, grades_part1, grades_part2, su
             ('BOTTOMPADDING', (0, 0), (-1, -1), 3),
             ('LEFTPADDING', (0, 0), (-1, -1), 3),
             ('RIGHTPADDING', (0, 0), (-1, -1), 3),
+        ])
+        self.summary_table_style = TableStyle([
+            ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, -1), 10),
+            ('ALIGN', (0, 0), (0, -1), 'LEFT'),
+            ('ALIGN', (1, 0), (1, -1), 'CENTER'),
+            ('BACKGROUND', (0, 0), (-1, -1), colors.Color(0.95, 0.95, 0.95)),
+            ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
+            ('BOX', (0, 0), (-1, -1), 1, colors.black),
+            ('TOPPADDING', (0, 0), (-1, -1), 5),
+            ('BOTTOMPADDING', (0, 0), (-1, -1), 5),
+            # Mise en évidence de la moyenne générale
+            ('BACKGROUND', (0, 2), (-1, 2), colors.Color(0.9, 0.95, 1)),
+            ('FONTNAME', (0, 2), (-1, 2), 'Helvetica-Bold'),
+        ])
+        
+        # Ligne de séparation
+        self.separator = Table([['']])
+        self.separator.setStyle(TableStyle([
+            ('LINEBELOW', (0, 0), (-1, -1), 2, colors.darkblue),
         ]))
         
-        section_elements.append(table)
-        return section_elements
-    
-    # ========== TABLEAUX DES NOTES ==========
-    if grades_part1:
-        for elem in create_grades_table(grades_part1, "MATIÈRES PRINCIPALES"):
-            story.append(elem)
-        story.append(Spacer(1, 10))
-    
-    if grades_part2:
-        for elem in create_grades_table(grades_part2, "MATIÈRES SECONDAIRES"):
-            story.append(elem)
-        story.append(Spacer(1, 10))
-    
-    # ========== RÉSUMÉ GÉNÉRAL ==========
-    story.append(Paragraph("<b>RÉSUMÉ GÉNÉRAL</b>", section_style))
-    story.append(Spacer(1, 4))
-    
-    summary_table_data = [
-        ['Total des Points', f"{summary_data.get('total_points', 0):.2f}"],
-        ['Total des Coefficients', str(summary_data.get('total_coef', 0))],
-        ['Moyenne Générale', f"{summary_data.get('general_average', 0):.2f} / 20"],
-        ['Appréciation', summary_data.get('appreciation', '-')],
-        ['Rang', summary_data.get('rank', '-')],
-    ]
-    
-    summary_table = Table(summary_table_data, colWidths=[50*mm, 50*mm])
-    summary_table.setStyle(TableStyle([
-        ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, -1), 10),
-        ('ALIGN', (0, 0), (0, -1), 'LEFT'),
-        ('ALIGN', (1, 0), (1, -1), 'CENTER'),
-        ('BACKGROUND', (0, 0), (-1, -1), colors.Color(0.95, 0.95, 0.95)),
-        ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
-        ('BOX', (0, 0), (-1, -1), 1, colors.black),
-        ('TOPPADDING', (0, 0), (-1, -1), 5),
-        ('BOTTOMPADDING', (0, 0), (-1, -1), 5),
-        # Mise en évidence de la moyenne générale
-        ('BACKGROUND', (0, 2), (-1, 2), colors.Color(0.9, 0.95, 1)),
-        ('FONTNAME', (0, 2), (-1, 2), 'Helvetica-Bold'),
-    ]))
-    story.append(summary_table)
-    story.append(Spacer(1, 15))
-    
-    # ========== SIGNATURES ==========
-    story.append(Paragraph("<b>SIGNATURES</b>", section_style))
-    story.append(Spacer(1, 10))
-    
-    signature_data = [
-        ['Le Professeur Principal', 'Le Parent/Tuteur', 'Le Proviseur'],
-        ['', '', ''],
-        ['', '', ''],
-        ['', '', ''],
-        ['_____________________', '_____________________', '_____________________']
-    ]
-    
-    signature_table = Table(signature_data, colWidths=[60*mm, 60*mm, 60*mm])
-    signature_table.setStyle(TableStyle([
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, -1), 9),
-        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-        ('TOPPADDING', (0, 0), (-1, -1), 3),
-        ('BOTTOMPADDING', (0, 0), (-1, -1), 3),
-    ]))
-    story.append(signature_table)
-    story.append(Spacer(1, 15))
+        self.signature_block = self._build_signature_block()
+        self.section_titles = {}
+        self._school_headers = {}
+    
+    def _build_signature_block(self):
+        signature_data = [
+            ['Le Professeur Principal', 'Le Parent/Tuteur', 'Le Proviseur'],
+            ['', '', ''],
+            ['', '', ''],
+            ['', '', ''],
+            ['_____________________', '_____________________', '_____________________']
+        ]
+        signature_table = Table(signature_data, colWidths=SIGNATURE_COL_WIDTHS)
+        signature_table.setStyle(TableStyle([
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, -1), 9),
+            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+            ('TOPPADDING', (0, 0), (-1, -1), 3),
+            ('BOTTOMPADDING', (0, 0), (-1, -1), 3),
+        ]))
+        return [
+            Paragraph("<b>SIGNATURES</b>", self.section_style),
+            Spacer(1, 10),
+            signature_table,
+            Spacer(1, 15),
+        ]
     
-    # ========== PIED DE PAGE ==========
-    footer_style = ParagraphStyle(
-        'Footer',
-        parent=styles['Normal'],
-        fontSize=8,
-        alignment=TA_CENTER,
-        textColor=colors.grey
-    )
-    story.append(Paragraph(
-        f"Document généré le {datetime.now().strftime('%d/%m/%Y à %H:%M')} - {school_name}",
-        footer_style
-    ))
+    def section_title(self, title):
+        """Titre de section (paragraphe mis en cache)"""
+        paragraph = self.section_titles.get(title)
+        if paragraph is None:
+            paragraph = Paragraph(f"<b>{title}</b>", self.section_style)
+            self.section_titles[title] = paragraph
+        return paragraph
+    
+    def school_header(self, school_name):
+        """En-tête de l'établissement (construit une fois par établissement)"""
+        header = self._school_headers.get(school_name)
+        if header is None:
+            header_data = [
+                [Paragraph(f"<b>{school_name}</b>", self.header_style)],
+                [Paragraph("BP: 580 - Ségou, Mali", self.header_style)],
+                [Paragraph("Tél: 21-32-11-20 / 79 07 03 60", self.header_style)]
+            ]
+            header = Table(header_data, colWidths=[180*mm])
+            header.setStyle(self.header_table_style)
+            self._school_headers[school_name] = header
+        return header
     
-    # Construire le PDF
-    doc.build(story)
+    def grades_section(self, grades_list, title):
+        """Crée un tableau de notes formaté"""
+        data = [GRADES_HEADERS]
+        
+        total_coef = 0
+        total_weighted = 0
+        
+        for grade in grades_list:
+            coef = grade.get('coef', '-')
+            moy_coef = grade.get('moy_coef', '-')
+            
+            if isinstance(coef, (int, float)):
+                coef_str = str(int(coef))
+                total_coef += coef
+            else:
+                coef_str = str(coef)
+            
+            if isinstance(moy_coef, (int, float)):
+                total_weighted += moy_coef
+            
+            data.append([
+                grade.get('subject', 'N/A'),
+                _format_number(grade.get('moy_cl', '-')),
+                _format_number(grade.get('n_compo', '-')),
+                _format_number(grade.get('mg', '-')),
+                coef_str,
+                _format_number(moy_coef),
+                grade.get('appreciation', '-')
+            ])
+        
+        # Ligne de total
+        if total_coef > 0:
+            section_avg = total_weighted / total_coef
+            data.append(['TOTAL/MOYENNE', '', '', f"{section_avg:.2f}", str(int(total_coef)), f"{total_weighted:.2f}", ''])
+        
+        table = Table(data, colWidths=GRADES_COL_WIDTHS)
+        table.setStyle(self.grades_table_style)
+        return [self.section_title(title), Spacer(1, 4), table, Spacer(1, 10)]
+    
+    def render(self, output, student_data, grades_part1, grades_part2, summary_data):
+        """Rend un bulletin (voir generate_bulletin_pdf pour les arguments)"""
+        doc = SimpleDocTemplate(
+            output, 
+            pagesize=A4,
+            rightMargin=PAGE_MARGIN, 
+            leftMargin=PAGE_MARGIN,
+            topMargin=PAGE_MARGIN, 
+            bottomMargin=PAGE_MARGIN
+        )
+        now = datetime.now()
+        
+        # ========== EN-TÊTE ==========
+        school_name = student_data.get('school_name', 'Lycée Michel ALLAIRE')
+        story = [
+            self.school_header(school_name),
+            Spacer(1, 10),
+            self.separator,
+            Spacer(1, 10),
+        ]
+        
+        # ========== TITRE DU BULLETIN ==========
+        period = student_data.get('period', '1ère Période')
+        story.append(Paragraph(f"<b>BULLETIN DE NOTES - {period}</b>", self.title_style))
+        story.append(Spacer(1, 8))
+        
+        # ========== INFORMATIONS ÉLÈVE ==========
+        student_info_data = [
+            ['Élève:', student_data.get('name', 'N/A'), 'Classe:', student_data.get('class', 'N/A')],
+            ['Année scolaire:', '2024-2025', 'Date:', now.strftime('%d/%m/%Y')]
+        ]
+        student_table = Table(student_info_data, colWidths=STUDENT_COL_WIDTHS)
+        student_table.setStyle(self.student_table_style)
+        story.append(student_table)
+        story.append(Spacer(1, 12))
+        
+        # ========== TABLEAUX DES NOTES ==========
+        if grades_part1:
+            story.extend(self.grades_section(grades_part1, "MATIÈRES PRINCIPALES"))
+        if grades_part2:
+            story.extend(self.grades_section(grades_part2, "MATIÈRES SECONDAIRES"))
+        
+        # ========== RÉSUMÉ GÉNÉRAL ==========
+        story.append(self.section_title("RÉSUMÉ GÉNÉRAL"))
+        story.append(Spacer(1, 4))
+        
+        summary_table_data = [
+            ['Total des Points', f"{summary_data.get('total_points', 0):.2f}"],
+            ['Total des Coefficients', str(summary_data.get('total_coef', 0))],
+            ['Moyenne Générale', f"{summary_data.get('general_average', 0):.2f} / 20"],
+            ['Appréciation', summary_data.get('appreciation', '-')],
+            ['Rang', summary_data.get('rank', '-')],
+        ]
+        summary_table = Table(summary_table_data, colWidths=SUMMARY_COL_WIDTHS)
+        summary_table.setStyle(self.summary_table_style)
+        story.append(summary_table)
+        story.append(Spacer(1, 15))
+        
+        # ========== SIGNATURES ==========
+        story.extend(self.signature_block)
+        
+        # ========== PIED DE PAGE ==========
+        story.append(Paragraph(
+            f"Document généré le {now.strftime('%d/%m/%Y à %H:%M')} - {school_name}",
+            self.footer_style
+        ))
+        
+        # Construire le PDF
+        doc.build(story)
+        
+        return _rewind(output)
+
+
+_renderers = threading.local()
+
+
+def get_bulletin_renderer():
+    """Retourne le moteur de rendu du thread courant (créé au premier appel)"""
+    renderer = getattr(_renderers, 'renderer', None)
+    if renderer is None:
+        renderer = BulletinRenderer()
+        _renderers.renderer = renderer
+    return renderer
+
+
+def generate_bulletin_pdf(output, student_data, grades_part1, grades_part2, summary_data):
+    """
+    Génère un bulletin de notes au format PDF professionnel.
     
-    return pdf_path
+    Args:
+        output: Chemin où sauvegarder le PDF, ou objet fichier binaire
+            (BytesIO, new_pdf_buffer()...) replacé au début après écriture
+        student_data: Dict contenant les infos de l'école et de l'élève
+            - name: Nom complet de l'élève
+            - class: Nom de la classe
+            - period: Période (1ère Période, 2e Période, etc.)
+            - school_name: Nom de l'école
+        grades_part1: Liste des notes pour les matières principales
+            Chaque élément: {subject, moy_cl, n_compo, coef, mg, moy_coef, appreciation}
+        grades_part2: Liste des notes pour les matières secondaires
+        summary_data: Dict contenant les totaux et moyennes
+            - total_points: Total des points coefficientés
+            - total_coef: Total des coefficients
+            - general_average: Moyenne générale
+            - appreciation: Appréciation globale
+    """
+    return get_bulletin_renderer().render(output, student_data, grades_part1, grades_part2, summary_data)
 
 
-def generate_class_report(pdf_path, class_data, students_data, period):
+def generate_class_report(output, class_data, students_data, period):
     """
     Génère un rapport de classe complet.
     
     Args:
-        pdf_path: Chemin du fichier PDF
+        output: Chemin du fichier PDF, ou objet fichier binaire
         class_data: Informations sur la classe
         students_data: Liste des données des élèves avec leurs moyennes
         period: Période concernée
     """
     doc = SimpleDocTemplate(
-        pdf_path,
+        output,
         pagesize=A4,
         rightMargin=15*mm,
         leftMargin=15*mm,
@@ -419,4 +458,4 @@ def generate_class_report(pdf_path, class_data, students_data, period):
         story.append(stats_table)
     
     doc.build(story)
-    return pdf_path
+    return _rewind(output)
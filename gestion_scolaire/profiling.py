@@ -0,0 +1,225 @@
+"""
+Profilage SQL par requête HTTP (optionnel, SQL_PROFILING)
+
+Les événements before/after_cursor_execute du moteur SQLAlchemy mesurent
+chaque instruction exécutée pendant une requête : nombre de requêtes, temps
+SQL total et instructions les plus lentes. Le bilan est renvoyé dans les
+en-têtes X-SQL-Queries / X-SQL-Time-Ms et agrégé par endpoint pour la page
+/admin/perf.
+
+Un budget de requêtes (SQL_QUERY_BUDGET, SQL_QUERY_BUDGETS par endpoint)
+signale les routes qui dépassent : avertissement dans le journal, ou
+exception QueryBudgetExceeded si SQL_QUERY_BUDGET_STRICT est actif (tests).
+Le gestionnaire de contexte count_queries permet la même vérification
+autour d'un bloc de code.
+
+Pour les réponses en flux, seules les requêtes exécutées avant l'envoi du
+corps sont comptées.
+"""
+import heapq
+import threading
+import time
+from contextlib import contextmanager
+from flask import current_app, g, has_app_context, request
+from sqlalchemy import event
+from gestion_scolaire import db
+
+STATEMENT_MAX_LENGTH = 500  # Caractères conservés par instruction (sans les paramètres)
+
+# Blocs count_queries ouverts dans le thread courant (indépendants du contexte
+# Flask : un bloc englobe les requêtes du client de test)
+_local = threading.local()
+
+
+class QueryBudgetExceeded(AssertionError):
+    """Une route ou un bloc a exécuté plus de requêtes que son budget"""
+
+
+class QueryStats:
+    """Mesures SQL d'une requête HTTP ou d'un bloc"""
+
+    def __init__(self, top=5):
+        self.count = 0
+        self.total_ms = 0.0
+        self.top = top
+        self.slowest = []  # Tas (durée, ordre, instruction) des plus lentes
+
+    def record(self, statement, duration_ms):
+        self.count += 1
+        self.total_ms += duration_ms
+        item = (duration_ms, self.count, statement[:STATEMENT_MAX_LENGTH])
+        if len(self.slowest) < self.top:
+            heapq.heappush(self.slowest, item)
+        else:
+            heapq.heappushpop(self.slowest, item)
+
+    def slowest_statements(self):
+        """[(durée ms, instruction)] de la plus lente à la plus rapide"""
+        return [(duration, statement) for duration, _order, statement in sorted(self.slowest, reverse=True)]
+
+
+class PerfStore:
+    """Agrégats par endpoint des requêtes profilées, partagés entre threads"""
+
+    def __init__(self, top=20):
+        self.top = top
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.endpoints = {}
+            self.slowest = []  # Tas (durée, ordre, endpoint, instruction)
+            self._order = 0
+
+    def add(self, endpoint, stats, budget=None):
+        with self._lock:
+            entry = self.endpoints.setdefault(endpoint, {
+                'requests': 0, 'queries': 0, 'max_queries': 0,
+                'sql_ms': 0.0, 'max_sql_ms': 0.0, 'over_budget': 0, 'budget': budget
+            })
+            entry['requests'] += 1
+            entry['queries'] += stats.count
+            entry['max_queries'] = max(entry['max_queries'], stats.count)
+            entry['sql_ms'] += stats.total_ms
+            entry['max_sql_ms'] = max(entry['max_sql_ms'], stats.total_ms)
+            if budget is not None and stats.count > budget:
+                entry['over_budget'] += 1
+
+            for duration, statement in stats.slowest_statements():
+                self._order += 1
+                item = (duration, self._order, endpoint, statement)
+                if len(self.slowest) < self.top:
+                    heapq.heappush(self.slowest, item)
+                else:
+                    heapq.heappushpop(self.slowest, item)
+
+    def summary(self):
+        """(lignes par endpoint triées par requêtes moyennes, instructions les plus lentes)"""
+        with self._lock:
+            rows = [
+                dict(entry, endpoint=endpoint,
+                     avg_queries=entry['queries'] / entry['requests'],
+                     avg_sql_ms=entry['sql_ms'] / entry['requests'])
+                for endpoint, entry in self.endpoints.items()
+            ]
+            slowest = [
+                {'duration_ms': duration, 'endpoint': endpoint, 'statement': statement}
+                for duration, _order, endpoint, statement in sorted(self.slowest, reverse=True)
+            ]
+        rows.sort(key=lambda row: row['avg_queries'], reverse=True)
+        return rows, slowest
+
+
+# ============================================
+# ÉVÉNEMENTS DU MOTEUR
+# ============================================
+
+def _active_stats():
+    """Mesures en cours : blocs count_queries du thread et requête HTTP"""
+    active = list(getattr(_local, 'blocks', ()))
+    if has_app_context():
+        stats = g.get('_sql_request_stats')
+        if stats is not None:
+            active.append(stats)
+    return active
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('_query_start', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    starts = conn.info.get('_query_start')
+    if not starts:
+        return
+    duration_ms = (time.perf_counter() - starts.pop()) * 1000
+    for stats in _active_stats():
+        stats.record(statement, duration_ms)
+
+    if has_app_context():
+        threshold = current_app.config.get('SQL_SLOW_QUERY_MS')
+        if threshold and duration_ms >= threshold:
+            current_app.logger.warning(f'Requête SQL lente ({duration_ms:.1f} ms): {statement[:STATEMENT_MAX_LENGTH]}')
+
+
+def _attach_engine(engine):
+    if not event.contains(engine, 'before_cursor_execute', _before_cursor_execute):
+        event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(engine, 'after_cursor_execute', _after_cursor_execute)
+
+
+@contextmanager
+def count_queries(budget=None):
+    """
+    Compte les requêtes exécutées dans le bloc.
+
+    Exemple (test) :
+        with count_queries(budget=5) as stats:
+            client.get('/parent/dashboard')
+
+    Lève QueryBudgetExceeded à la sortie si le budget est dépassé. Le moteur
+    doit être instrumenté (SQL_PROFILING ou instrument_engine).
+    """
+    stats = QueryStats()
+    blocks = _local.__dict__.setdefault('blocks', [])
+    blocks.append(stats)
+    try:
+        yield stats
+    finally:
+        blocks.remove(stats)
+    if budget is not None and stats.count > budget:
+        raise QueryBudgetExceeded(f'{stats.count} requêtes SQL pour un budget de {budget}')
+
+
+# ============================================
+# INTÉGRATION FLASK
+# ============================================
+
+def get_perf_store(app=None):
+    """Agrégats du profilage (None si le profilage est désactivé)"""
+    app = app or current_app._get_current_object()
+    return app.extensions.get('sql_profiler')
+
+
+def query_budget_for(app, endpoint):
+    return app.config.get('SQL_QUERY_BUDGETS', {}).get(endpoint, app.config.get('SQL_QUERY_BUDGET'))
+
+
+def instrument_engine(app):
+    """Active les mesures du moteur de l'application (count_queries), sans les hooks de requête"""
+    with app.app_context():
+        _attach_engine(db.engine)
+
+
+def init_profiling(app):
+    """Instrumente le moteur de l'application et enregistre les hooks de requête"""
+    if 'sql_profiler' in app.extensions:
+        return
+    instrument_engine(app)
+    store = PerfStore(app.config.get('SQL_PROFILE_TOP', 20))
+    app.extensions['sql_profiler'] = store
+
+    @app.before_request
+    def start_query_profile():
+        g._sql_request_stats = QueryStats()
+
+    @app.after_request
+    def finish_query_profile(response):
+        stats = g.pop('_sql_request_stats', None)
+        if stats is None:
+            return response
+
+        endpoint = request.endpoint or request.path
+        budget = query_budget_for(app, endpoint)
+        store.add(endpoint, stats, budget)
+
+        response.headers['X-SQL-Queries'] = str(stats.count)
+        response.headers['X-SQL-Time-Ms'] = f'{stats.total_ms:.1f}'
+
+        if budget is not None and stats.count > budget:
+            message = f'{endpoint}: {stats.count} requêtes SQL pour un budget de {budget}'
+            if app.config.get('SQL_QUERY_BUDGET_STRICT'):
+                raise QueryBudgetExceeded(message)
+            app.logger.warning(message)
+        return response
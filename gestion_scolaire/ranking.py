@@ -0,0 +1,139 @@
+"""
+Classement des élèves - Calcul ensembliste des moyennes et des rangs
+
+Toutes les moyennes d'une classe (pour une période ou toutes périodes
+confondues) sont calculées en une seule requête SQL groupée :
+MG = (Moy.CL + 2*N.Compo) / 3, pondérée par le coefficient.
+"""
+from sqlalchemy import func, and_
+
+
+def compute_ranks(averages):
+    """
+    Calcule les rangs à partir d'un dict {student_id: moyenne}.
+
+    Rang "olympique" : les ex æquo (à 2 décimales) partagent le même rang (1, 2, 2, 4...)
+    """
+    ordered = sorted(averages.items(), key=lambda item: item[1], reverse=True)
+    ranks = {}
+    previous_avg = None
+    previous_rank = 0
+    for position, (student_id, avg) in enumerate(ordered, 1):
+        rounded = round(avg, 2)
+        if rounded != previous_avg:
+            previous_rank = position
+            previous_avg = rounded
+        ranks[student_id] = previous_rank
+    return ranks
+
+
+class ClassRanking:
+    """Résultat du classement d'une classe pour une période"""
+
+    def __init__(self, rows):
+        """
+        Args:
+            rows: Itérable de tuples (student_id, total_points, total_coef, grade_count)
+                  contenant tous les élèves de la classe, y compris ceux sans note
+        """
+        self.class_size = 0
+        self.averages = {}
+        self.totals = {}
+        self.grade_counts = {}
+
+        for student_id, total_points, total_coef, grade_count in rows:
+            self.class_size += 1
+            if not grade_count:
+                continue
+            total_points = float(total_points or 0)
+            total_coef = int(total_coef or 0)
+            self.totals[student_id] = (total_points, total_coef)
+            self.grade_counts[student_id] = int(grade_count)
+            self.averages[student_id] = total_points / total_coef if total_coef > 0 else 0.0
+
+        self.ranks = compute_ranks(self.averages)
+
+    def average_of(self, student_id):
+        """Moyenne générale d'un élève (None s'il n'a aucune note)"""
+        avg = self.averages.get(student_id)
+        return round(avg, 2) if avg is not None else None
+
+    def rank_of(self, student_id):
+        """Rang d'un élève (None s'il n'a aucune note)"""
+        return self.ranks.get(student_id)
+
+    @property
+    def student_with_grades(self):
+        return len(self.averages)
+
+    @property
+    def stats(self):
+        """Statistiques de la classe (moyenne, plus haute, plus basse)"""
+        values = list(self.averages.values())
+        if not values:
+            return {
+                'class_average': 0,
+                'highest': 0,
+                'lowest': 0,
+                'student_with_grades': 0,
+                'class_size': self.class_size
+            }
+        return {
+            'class_average': round(sum(values) / len(values), 2),
+            'highest': round(max(values), 2),
+            'lowest': round(min(values), 2),
+            'student_with_grades': len(values),
+            'class_size': self.class_size
+        }
+
+
+def class_averages_query(session, class_id, period=None, grade_model=None, user_model=None):
+    """
+    Construit la requête groupée des totaux par élève d'une classe.
+
+    Les modèles sont paramétrables pour permettre la réutilisation par
+    l'application historique (app.py) dont les colonnes portent les mêmes noms.
+    """
+    if grade_model is None or user_model is None:
+        from gestion_scolaire.models import Grade, User
+        grade_model = grade_model or Grade
+        user_model = user_model or User
+
+    mg = (grade_model.moy_cl + 2 * grade_model.n_compo) / 3.0
+
+    join_condition = grade_model.student_id == user_model.id
+    if period is not None:
+        join_condition = and_(join_condition, grade_model.period == period)
+
+    return session.query(
+        user_model.id,
+        func.sum(mg * grade_model.coef),
+        func.sum(grade_model.coef),
+        func.count(grade_model.id)
+    ).outerjoin(grade_model, join_condition)\
+        .filter(user_model.current_class_id == class_id, user_model.role == 'student')\
+        .group_by(user_model.id)
+
+
+def compute_class_ranking(class_id, period=None, session=None, grade_model=None, user_model=None):
+    """
+    Calcule moyennes, rangs et statistiques d'une classe en une seule requête.
+
+    Args:
+        class_id: ID de la classe
+        period: Période concernée (None = toutes les périodes)
+        session: Session SQLAlchemy (par défaut db.session)
+        grade_model, user_model: Modèles à utiliser (par défaut ceux de gestion_scolaire)
+
+    Returns:
+        ClassRanking
+    """
+    if session is None:
+        from gestion_scolaire import db
+        session = db.session
+
+    if not class_id:
+        return ClassRanking([])
+
+    query = class_averages_query(session, class_id, period, grade_model, user_model)
+    return ClassRanking(query.all())
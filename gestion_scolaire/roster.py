@@ -0,0 +1,409 @@
+"""
+Import en masse des élèves (CSV ou XLSX)
+
+Le fichier est validé en une passe : les classes, identifiants, matricules,
+emails et comptes parents sont résolus par des recherches groupées (une
+requête par ensemble de valeurs), puis les comptes sont insérés par lots,
+chaque lot dans sa propre transaction. Le hachage des mots de passe, lié au
+CPU, est réparti sur plusieurs processus.
+"""
+import csv
+import io
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, date
+from werkzeug.security import generate_password_hash
+from gestion_scolaire import db
+from gestion_scolaire.models import User, SchoolClass, parent_student
+from gestion_scolaire.user_cache import invalidate_user
+from gestion_scolaire.summaries import on_class_members_changed
+
+ROSTER_BATCH_SIZE = 500  # Comptes par transaction
+LOOKUP_CHUNK_SIZE = 500  # Valeurs par clause IN (limite de paramètres de SQLite)
+ROSTER_EXTENSIONS = ('.csv', '.xlsx')
+
+# En-têtes acceptés (minuscules, sans accents ni espaces) -> champ
+HEADER_ALIASES = {
+    'nom': 'last_name', 'last_name': 'last_name',
+    'prenom': 'first_name', 'first_name': 'first_name',
+    'matricule': 'matricule',
+    'classe': 'class_name', 'class': 'class_name', 'class_name': 'class_name',
+    'identifiant': 'username', 'username': 'username',
+    'email': 'email', 'courriel': 'email',
+    'mot_de_passe': 'password', 'password': 'password',
+    'parents': 'parents', 'parent': 'parents',
+    'date_de_naissance': 'date_of_birth', 'date_naissance': 'date_of_birth', 'date_of_birth': 'date_of_birth',
+    'sexe': 'gender', 'genre': 'gender', 'gender': 'gender',
+    'telephone': 'phone', 'phone': 'phone'
+}
+REQUIRED_FIELDS = ('last_name', 'first_name', 'class_name')
+GENDERS = {'m': 'M', 'f': 'F', 'autre': 'Autre'}
+DATE_FORMATS = ('%Y-%m-%d', '%d/%m/%Y')
+
+
+# ============================================
+# LECTURE DU FICHIER
+# ============================================
+
+def _normalize_header(value):
+    value = str(value or '').strip().lower()
+    for accented, plain in (('é', 'e'), ('è', 'e'), ('ê', 'e'), ('à', 'a'), ('ç', 'c')):
+        value = value.replace(accented, plain)
+    return re.sub(r'[\s\-]+', '_', value)
+
+
+def _records(header, rows):
+    """Associe chaque ligne aux champs connus ; renvoie [(numéro de ligne, dict)]"""
+    fields = [HEADER_ALIASES.get(_normalize_header(name)) for name in header]
+    if not any(fields):
+        raise ValueError('En-tête non reconnu : colonnes attendues nom, prenom, classe, matricule...')
+
+    records = []
+    for line, row in enumerate(rows, start=2):
+        record = {
+            field: value for field, value in zip(fields, row)
+            if field and value not in (None, '')
+        }
+        if record:
+            records.append((line, record))
+    return records
+
+
+def read_roster(stream, filename):
+    """
+    Lit un fichier d'élèves.
+
+    Args:
+        stream: Objet fichier binaire
+        filename: Nom du fichier, dont l'extension choisit le format (.csv ou .xlsx)
+
+    Returns:
+        Liste de (numéro de ligne, dict des champs)
+    """
+    extension = os.path.splitext(filename or '')[1].lower()
+    if extension == '.xlsx':
+        try:
+            from openpyxl import load_workbook
+        except ImportError:
+            raise ValueError("L'import XLSX nécessite openpyxl (pip install openpyxl) ; "
+                             "enregistrez le fichier en CSV ou installez le module.")
+        sheet = load_workbook(stream, read_only=True, data_only=True).active
+        rows = sheet.iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return []
+        return _records(header, rows)
+
+    if extension != '.csv':
+        raise ValueError('Format non supporté : utilisez un fichier .csv ou .xlsx')
+
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    sample = text.read(4096)
+    text.seek(0)
+    try:
+        dialect = csv.Sniffer().sniff(sample, delimiters=',;\t')
+    except csv.Error:
+        dialect = csv.excel
+    reader = csv.reader(text, dialect)
+    header = next(reader, None)
+    if header is None:
+        return []
+    return _records(header, reader)
+
+
+# ============================================
+# VALIDATION
+# ============================================
+
+def _text(record, field):
+    value = record.get(field)
+    return str(value).strip() if value is not None else ''
+
+
+def _parse_date(value):
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(str(value).strip(), fmt).date()
+        except ValueError:
+            continue
+    raise ValueError(f'Date de naissance invalide: {value}')
+
+
+def _existing_values(column, values):
+    """Valeurs déjà présentes en base pour une colonne (requêtes IN par paquets)"""
+    values = list(values)
+    found = set()
+    for start in range(0, len(values), LOOKUP_CHUNK_SIZE):
+        found.update(
+            value for (value,) in db.session.query(column)
+            .filter(column.in_(values[start:start + LOOKUP_CHUNK_SIZE])).all()
+        )
+    return found
+
+
+def _parent_ids(usernames):
+    """Comptes parents par identifiant : {username: id}"""
+    usernames = list(usernames)
+    found = {}
+    for start in range(0, len(usernames), LOOKUP_CHUNK_SIZE):
+        found.update(
+            db.session.query(User.username, User.id)
+            .filter(User.username.in_(usernames[start:start + LOOKUP_CHUNK_SIZE]),
+                    User.role == 'parent').all()
+        )
+    return found
+
+
+def _parse_record(record, classes, default_password):
+    """Convertit une ligne ; lève ValueError avec un message lisible"""
+    for field in REQUIRED_FIELDS:
+        if not _text(record, field):
+            raise ValueError(f'Champ requis manquant: {field}')
+
+    class_name = _text(record, 'class_name')
+    class_id = classes.get(class_name.lower())
+    if class_id is None:
+        raise ValueError(f'Classe inconnue: {class_name}')
+
+    matricule = _text(record, 'matricule') or None
+    username = _text(record, 'username') or (matricule.lower() if matricule else '')
+    if len(username) < 3:
+        raise ValueError("Identifiant requis (colonne identifiant ou matricule, 3 caractères minimum)")
+
+    password = _text(record, 'password') or default_password
+    if not password:
+        raise ValueError('Mot de passe requis (colonne mot_de_passe ou mot de passe par défaut)')
+
+    gender = _text(record, 'gender')
+    if gender:
+        if gender.lower() not in GENDERS:
+            raise ValueError(f'Sexe invalide: {gender}')
+        gender = GENDERS[gender.lower()]
+
+    return {
+        'username': username,
+        'email': _text(record, 'email') or None,
+        'password': password,
+        'first_name': _text(record, 'first_name'),
+        'last_name': _text(record, 'last_name'),
+        'phone': _text(record, 'phone') or None,
+        'gender': gender or None,
+        'date_of_birth': _parse_date(record['date_of_birth']) if record.get('date_of_birth') else None,
+        'matricule': matricule,
+        'current_class_id': class_id,
+        'parents': [p.strip() for p in re.split(r'[,;|]', _text(record, 'parents')) if p.strip()]
+    }
+
+
+def validate_roster(records, default_password=None):
+    """
+    Valide un fichier d'élèves en une passe.
+
+    Les doublons sont recherchés dans le fichier et en base ; les classes et
+    les parents sont résolus par nom / identifiant.
+
+    Args:
+        records: Résultat de read_roster
+        default_password: Mot de passe des lignes qui n'en fournissent pas
+
+    Returns:
+        (lignes valides, erreurs) où chaque erreur est {'line', 'error'}
+    """
+    classes = {name.lower(): class_id for class_id, name in
+               db.session.query(SchoolClass.id, SchoolClass.name).all()}
+
+    rows = []
+    errors = []
+    seen = {'username': set(), 'matricule': set(), 'email': set()}
+    for line, record in records:
+        try:
+            row = _parse_record(record, classes, default_password)
+        except ValueError as e:
+            errors.append({'line': line, 'error': str(e)})
+            continue
+
+        duplicate = next((field for field in seen if row[field] and row[field] in seen[field]), None)
+        if duplicate:
+            errors.append({'line': line, 'error': f'{duplicate} en double dans le fichier: {row[duplicate]}'})
+            continue
+        for field in seen:
+            if row[field]:
+                seen[field].add(row[field])
+        rows.append((line, row))
+
+    # Conflits avec la base et résolution des parents : une recherche par ensemble
+    existing = {
+        'username': _existing_values(User.username, seen['username']),
+        'matricule': _existing_values(User.matricule, seen['matricule']),
+        'email': _existing_values(User.email, seen['email'])
+    }
+    parents = _parent_ids({p for _line, row in rows for p in row['parents']})
+
+    valid = []
+    for line, row in rows:
+        conflict = next((field for field in existing if row[field] in existing[field]), None)
+        missing = [p for p in row['parents'] if p not in parents]
+        if conflict:
+            errors.append({'line': line, 'error': f'{conflict} déjà utilisé: {row[conflict]}'})
+        elif missing:
+            errors.append({'line': line, 'error': f"Parent introuvable: {', '.join(missing)}"})
+        else:
+            row['parent_ids'] = [parents[p] for p in row['parents']]
+            valid.append(row)
+
+    errors.sort(key=lambda e: e['line'])
+    return valid, errors
+
+
+# ============================================
+# IMPORT
+# ============================================
+
+class RosterReport:
+    """Bilan d'un import d'élèves"""
+
+    def __init__(self, total, dry_run=False):
+        self.total = total
+        self.dry_run = dry_run
+        self.valid = 0
+        self.created = 0
+        self.links = 0
+        self.batches = 0
+        self.workers = 0
+        self.elapsed = 0.0
+        self.errors = []
+
+    @property
+    def ok(self):
+        return not self.errors
+
+    def to_dict(self):
+        return {
+            'total': self.total,
+            'valid': self.valid,
+            'created': self.created,
+            'parent_links': self.links,
+            'batches': self.batches,
+            'workers': self.workers,
+            'elapsed': round(self.elapsed, 3),
+            'dry_run': self.dry_run,
+            'errors': self.errors
+        }
+
+    def __repr__(self):
+        return (f'<RosterReport {self.created}/{self.total} created, '
+                f'{len(self.errors)} errors in {self.elapsed:.2f}s>')
+
+
+def hash_passwords(passwords, executor=None, workers=1):
+    """Hache une liste de mots de passe, en parallèle si un executor est fourni"""
+    if executor is None:
+        return [generate_password_hash(password) for password in passwords]
+    chunksize = max(1, len(passwords) // (workers * 4))
+    return list(executor.map(generate_password_hash, passwords, chunksize=chunksize))
+
+
+def _insert_batch(rows, hashes):
+    """Insère un lot d'élèves et leurs liens parents ; renvoie le nombre de liens"""
+    now = datetime.utcnow()
+    db.session.bulk_insert_mappings(User, [
+        {
+            'username': row['username'],
+            'email': row['email'],
+            'password_hash': password_hash,
+            'first_name': row['first_name'],
+            'last_name': row['last_name'],
+            'phone': row['phone'],
+            'gender': row['gender'],
+            'date_of_birth': row['date_of_birth'],
+            'matricule': row['matricule'],
+            'current_class_id': row['current_class_id'],
+            'role': 'student',
+            'is_active': True,
+            'created_at': now,
+            'updated_at': now
+        }
+        for row, password_hash in zip(rows, hashes)
+    ])
+
+    links = [row for row in rows if row['parent_ids']]
+    if not links:
+        return 0
+
+    ids = dict(
+        db.session.query(User.username, User.id)
+        .filter(User.username.in_([row['username'] for row in links])).all()
+    )
+    values = [
+        {'parent_id': parent_id, 'student_id': ids[row['username']]}
+        for row in links for parent_id in set(row['parent_ids'])
+    ]
+    db.session.execute(parent_student.insert(), values)
+    return len(values)
+
+
+def import_roster(records, default_password=None, dry_run=False, batch_size=ROSTER_BATCH_SIZE,
+                  max_workers=None, progress=None):
+    """
+    Valide puis importe des élèves.
+
+    Rien n'est écrit si une ligne est invalide ou en mode dry_run. Chaque lot
+    est validé par un commit : en cas d'échec en cours d'import, les lots
+    précédents restent enregistrés et le bilan indique où l'import s'est arrêté.
+
+    Args:
+        records: Résultat de read_roster
+        default_password: Mot de passe des lignes qui n'en fournissent pas
+        dry_run: Valider uniquement
+        batch_size: Comptes par transaction
+        max_workers: Processus de hachage (par défaut: nombre de cœurs)
+        progress: Fonction appelée après chaque lot avec (importés, total)
+
+    Returns:
+        RosterReport
+    """
+    start = time.perf_counter()
+    report = RosterReport(len(records), dry_run=dry_run)
+
+    rows, report.errors = validate_roster(records, default_password)
+    report.valid = len(rows)
+    if report.errors or dry_run or not rows:
+        report.elapsed = time.perf_counter() - start
+        return report
+
+    workers = max_workers or os.cpu_count() or 1
+    report.workers = workers = max(1, min(workers, len(rows)))
+    executor = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+    try:
+        for offset in range(0, len(rows), batch_size):
+            batch = rows[offset:offset + batch_size]
+            hashes = hash_passwords([row['password'] for row in batch], executor, workers)
+            try:
+                report.links += _insert_batch(batch, hashes)
+                on_class_members_changed(*{row['current_class_id'] for row in batch})
+                db.session.commit()
+                # Les parents liés ont de nouveaux enfants
+                invalidate_user(*{parent_id for row in batch for parent_id in row['parent_ids']})
+            except Exception as e:
+                db.session.rollback()
+                report.errors.append({
+                    'line': None,
+                    'error': f'Lot {report.batches + 1} rejeté ({report.created} comptes déjà importés): {e}'
+                })
+                break
+            report.created += len(batch)
+            report.batches += 1
+            if progress:
+                progress(report.created, report.valid)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    report.elapsed = time.perf_counter() - start
+    return report
@@ -1,14 +1,23 @@
 """
 Routes administrateur - Gestion complète du système
 """
-from flask import Blueprint, render_template, redirect, url_for, flash, request, jsonify
+from flask import Blueprint, render_template, redirect, url_for, flash, request, jsonify, current_app
 from flask_login import login_required, current_user
+from sqlalchemy.orm import joinedload
 from functools import wraps
 from gestion_scolaire import db
 from gestion_scolaire.models import (
     User, SchoolClass, Subject, Grade, BulletinStructure,
     Announcement, AcademicYear, Attendance, AuditLog, STANDARD_PERIODS
 )
+from gestion_scolaire.user_cache import invalidate_user
+from gestion_scolaire.cache import invalidate_current_year
+from gestion_scolaire.announcements import announcement_feed, invalidate_announcements
+from gestion_scolaire.summaries import on_class_members_changed
+from gestion_scolaire.audit import audit_event
+from gestion_scolaire.audit_archive import list_archives, search_archive, ARCHIVE_PAGE_SIZE
+from gestion_scolaire.profiling import get_perf_store
+from gestion_scolaire.roster import read_roster, import_roster, ROSTER_EXTENSIONS
 from datetime import datetime
 
 admin_bp = Blueprint('admin', __name__)
@@ -42,7 +51,7 @@ def dashboard():
         'total_subjects': Subject.query.count(),
         'total_grades': Grade.query.count(),
         'recent_users': User.query.order_by(User.created_at.desc()).limit(5).all(),
-        'recent_announcements': Announcement.query.filter_by(is_active=True).order_by(Announcement.created_at.desc()).limit(5).all()
+        'recent_announcements': announcement_feed(current_user, 5)
     }
     return render_template('admin/dashboard.html', stats=stats)
 
@@ -129,6 +138,7 @@ def edit_user(user_id):
     school_classes = SchoolClass.query.order_by(SchoolClass.name).all()
     
     if request.method == 'POST':
+        previous_class_id = user.current_class_id
         user.first_name = request.form.get('first_name', '').strip()
         user.last_name = request.form.get('last_name', '').strip()
         user.email = request.form.get('email', '').strip() or None
@@ -147,7 +157,13 @@ def edit_user(user_id):
         if new_password:
             user.set_password(new_password)
         
+        # Rangs de l'ancienne et de la nouvelle classe
+        if user.current_class_id != previous_class_id:
+            on_class_members_changed(previous_class_id, user.current_class_id)
+        
+        audit_event('user_updated', user_id=current_user.id, entity_type='User', entity_id=user.id)
         db.session.commit()
+        invalidate_user(user.id)
         flash('Utilisateur modifié avec succès.', 'success')
         return redirect(url_for('admin.users'))
     
@@ -166,13 +182,56 @@ def delete_user(user_id):
         return redirect(url_for('admin.users'))
     
     username = user.username
+    parent_ids = [parent.id for parent in user.parents]
+    class_id = user.current_class_id
     db.session.delete(user)
+    on_class_members_changed(class_id)
+    audit_event('user_deleted', user_id=current_user.id, entity_type='User', entity_id=user_id,
+                details={'username': username})
     db.session.commit()
+    invalidate_user(user_id, *parent_ids)
     
     flash(f'Utilisateur "{username}" supprimé avec succès.', 'success')
     return redirect(url_for('admin.users'))
 
 
+@admin_bp.route('/users/import', methods=['GET', 'POST'])
+@login_required
+@admin_required
+def import_users():
+    """Importer une liste d'élèves (CSV ou XLSX)"""
+    report = None
+    
+    if request.method == 'POST':
+        upload = request.files.get('roster')
+        if not upload or not upload.filename:
+            flash('Veuillez choisir un fichier.', 'danger')
+            return redirect(url_for('admin.import_users'))
+        
+        try:
+            records = read_roster(upload.stream, upload.filename)
+        except (ValueError, UnicodeDecodeError) as e:
+            flash(f'Fichier illisible: {e}', 'danger')
+            return redirect(url_for('admin.import_users'))
+        
+        report = import_roster(
+            records,
+            default_password=request.form.get('default_password', '') or None,
+            dry_run=request.form.get('dry_run') == 'on',
+            max_workers=current_app.config.get('IMPORT_WORKERS')
+        )
+        current_app.logger.info(f'Import des élèves: {report}')
+        
+        if report.errors:
+            flash(f'{len(report.errors)} erreur(s) : {report.created} élève(s) importé(s).', 'danger')
+        elif report.dry_run:
+            flash(f'Vérification réussie : {report.valid} élève(s) prêts à être importés.', 'info')
+        else:
+            flash(f'{report.created} élève(s) importé(s) avec succès.', 'success')
+    
+    return render_template('admin/user_import.html', report=report, extensions=ROSTER_EXTENSIONS)
+
+
 # ============================================
 # GESTION DES CLASSES
 # ============================================
@@ -478,6 +537,7 @@ def add_announcement():
         
         db.session.add(announcement)
         db.session.commit()
+        invalidate_announcements()
         
         flash('Annonce créée avec succès.', 'success')
         return redirect(url_for('admin.announcements'))
@@ -503,6 +563,7 @@ def edit_announcement(announcement_id):
         announcement.is_active = request.form.get('is_active') == 'on'
         
         db.session.commit()
+        invalidate_announcements()
         flash('Annonce modifiée avec succès.', 'success')
         return redirect(url_for('admin.announcements'))
     
@@ -519,6 +580,7 @@ def delete_announcement(announcement_id):
     
     db.session.delete(announcement)
     db.session.commit()
+    invalidate_announcements()
     
     flash('Annonce supprimée avec succès.', 'success')
     return redirect(url_for('admin.announcements'))
@@ -564,6 +626,7 @@ def add_academic_year():
     
     db.session.add(year)
     db.session.commit()
+    invalidate_current_year()
     
     flash(f'Année scolaire "{name}" créée avec succès.', 'success')
     return redirect(url_for('admin.academic_years'))
@@ -582,6 +645,7 @@ def set_current_year(year_id):
     year.is_current = True
     
     db.session.commit()
+    invalidate_current_year()
     flash(f'Année scolaire "{year.name}" définie comme courante.', 'success')
     return redirect(url_for('admin.academic_years'))
 
@@ -594,7 +658,72 @@ def set_current_year(year_id):
 @login_required
 @admin_required
 def audit_logs():
-    """Journal des actions"""
+    """Journal des actions (lignes récentes ; les plus anciennes sont archivées)"""
+    page = request.args.get('page', 1, type=int)
+    user_id = request.args.get('user_id', type=int)
+    
+    # Auteurs chargés dans la même requête (un nom par ligne affichée)
+    query = AuditLog.query.options(joinedload(AuditLog.user))
+    if user_id:
+        query = query.filter(AuditLog.user_id == user_id)
+    logs = query.order_by(AuditLog.created_at.desc()).paginate(page=page, per_page=50)
+    return render_template('admin/audit_logs.html', logs=logs, user_id=user_id,
+                           archives=list_archives(current_app.config['AUDIT_ARCHIVE_DIR']))
+
+
+@admin_bp.route('/audit-logs/archives/<month>')
+@login_required
+@admin_required
+def audit_archive(month):
+    """Consultation d'une archive mensuelle du journal"""
+    archive_dir = current_app.config['AUDIT_ARCHIVE_DIR']
     page = request.args.get('page', 1, type=int)
-    logs = AuditLog.query.order_by(AuditLog.created_at.desc()).paginate(page=page, per_page=50)
-    return render_template('admin/audit_logs.html', logs=logs)
+    user_id = request.args.get('user_id', type=int)
+    action = request.args.get('action', '').strip()
+    
+    try:
+        entries, total = search_archive(archive_dir, month, user_id=user_id, action=action, page=page)
+    except ValueError:
+        flash('Archive introuvable.', 'danger')
+        return redirect(url_for('admin.audit_logs'))
+    
+    # Noms des auteurs encore présents en base
+    author_ids = {entry['user_id'] for entry in entries if entry['user_id']}
+    authors = {user.id: user.full_name for user in User.query.filter(User.id.in_(author_ids)).all()} if author_ids else {}
+    
+    return render_template('admin/audit_archive.html',
+                           month=month,
+                           entries=entries,
+                           authors=authors,
+                           total=total,
+                           page=page,
+                           pages=max(1, -(-total // ARCHIVE_PAGE_SIZE)),
+                           user_id=user_id,
+                           action=action)
+
+
+# ============================================
+# PERFORMANCES
+# ============================================
+
+@admin_bp.route('/perf')
+@login_required
+@admin_required
+def perf():
+    """Requêtes SQL par route (profilage SQL_PROFILING)"""
+    store = get_perf_store()
+    endpoints, slowest = store.summary() if store else ([], [])
+    return render_template('admin/perf.html', enabled=store is not None,
+                           endpoints=endpoints, slowest=slowest)
+
+
+@admin_bp.route('/perf/reset', methods=['POST'])
+@login_required
+@admin_required
+def reset_perf():
+    """Remettre à zéro les mesures"""
+    store = get_perf_store()
+    if store:
+        store.reset()
+    flash('Mesures remises à zéro.', 'success')
+    return redirect(url_for('admin.perf'))
@@ -1,13 +1,27 @@
 """
 Routes API - Endpoints REST pour les opérations AJAX
 """
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, jsonify, request, url_for, Response, stream_with_context
 from flask_login import login_required, current_user
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import joinedload
 from gestion_scolaire import db
 from gestion_scolaire.models import (
     User, SchoolClass, Subject, Grade, BulletinStructure,
     Attendance, STANDARD_PERIODS
 )
+from gestion_scolaire.summaries import on_grade_changed, get_period_summaries
+from gestion_scolaire.grades import validate_grade_entries, upsert_grades, save_grade
+from gestion_scolaire.attendance import attendance_stats, monthly_attendance_stats
+from gestion_scolaire.class_stats import compute_class_statistics, subject_analytics
+from gestion_scolaire.audit import audit_event
+from gestion_scolaire.pagination import keyset_page, parse_fields
+from gestion_scolaire.exports import (
+    iter_grades, iter_attendance, stream_rows,
+    EXPORT_FORMATS, GRADE_COLUMNS, ATTENDANCE_COLUMNS
+)
+from datetime import datetime
 
 api_bp = Blueprint('api', __name__)
 
@@ -16,16 +30,64 @@ api_bp = Blueprint('api', __name__)
 # API UTILISATEURS
 # ============================================
 
+# Champs exposés par les listes paginées (?fields=...)
+USER_FIELDS = {
+    'id': lambda u: u.id,
+    'username': lambda u: u.username,
+    'full_name': lambda u: u.full_name,
+    'role': lambda u: u.role,
+    'class_id': lambda u: u.current_class_id,
+    'class_name': lambda u: u.current_class.name if u.current_class else None
+}
+
+GRADE_FIELDS = {
+    'id': lambda g: g.id,
+    'student_id': lambda g: g.student_id,
+    'student_name': lambda g: g.student.full_name,
+    'subject_name': lambda g: g.subject_name,
+    'moy_cl': lambda g: g.moy_cl,
+    'n_compo': lambda g: g.n_compo,
+    'coef': lambda g: g.coef,
+    'average': lambda g: g.average,
+    'weighted_average': lambda g: g.weighted_average,
+    'appreciation': lambda g: g.appreciation,
+    'period': lambda g: g.period
+}
+
+
+def _paginated_response(rows, serializers, fields, next_cursor):
+    """
+    Liste JSON d'une page ; le curseur de la page suivante est renvoyé dans
+    l'en-tête X-Next-Cursor (et Link rel="next"), absent sur la dernière page.
+    """
+    response = jsonify([{field: serializers[field](row) for field in fields} for row in rows])
+    if next_cursor:
+        response.headers['X-Next-Cursor'] = next_cursor
+        args = request.args.to_dict()
+        args['cursor'] = next_cursor
+        response.headers['Link'] = f'<{url_for(request.endpoint, _external=True, **args)}>; rel="next"'
+    return response
+
+
 @api_bp.route('/users')
 @login_required
 def get_users():
-    """Récupérer la liste des utilisateurs"""
+    """
+    Récupérer la liste des utilisateurs (paginée).
+    
+    Paramètres : role, class_id, fields=id,full_name,..., limit, cursor
+    """
     if current_user.role not in ['admin', 'teacher']:
         return jsonify({'error': 'Non autorisé'}), 403
     
     role = request.args.get('role')
     class_id = request.args.get('class_id', type=int)
     
+    try:
+        fields = parse_fields(request.args.get('fields'), USER_FIELDS)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
     query = User.query
     
     if role:
@@ -34,16 +96,21 @@ def get_users():
     if class_id:
         query = query.filter_by(current_class_id=class_id)
     
-    users = query.order_by(User.last_name).all()
+    if 'class_name' in fields:
+        query = query.options(joinedload(User.current_class))
     
-    return jsonify([{
-        'id': u.id,
-        'username': u.username,
-        'full_name': u.full_name,
-        'role': u.role,
-        'class_id': u.current_class_id,
-        'class_name': u.current_class.name if u.current_class else None
-    } for u in users])
+    sort_name = func.coalesce(User.last_name, '')
+    try:
+        users, next_cursor = keyset_page(
+            query, [sort_name, User.id],
+            key=lambda u: (u.last_name or '', u.id),
+            cursor=request.args.get('cursor'),
+            limit=request.args.get('limit', type=int)
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    return _paginated_response(users, USER_FIELDS, fields, next_cursor)
 
 
 @api_bp.route('/users/<int:user_id>')
@@ -126,11 +193,20 @@ def get_class_subjects(class_id):
 @api_bp.route('/grades')
 @login_required
 def get_grades():
-    """Récupérer les notes"""
+    """
+    Récupérer les notes (paginées).
+    
+    Paramètres : student_id, period, class_id, fields=id,subject_name,..., limit, cursor
+    """
     student_id = request.args.get('student_id', type=int)
     period = request.args.get('period')
     class_id = request.args.get('class_id', type=int)
     
+    try:
+        fields = parse_fields(request.args.get('fields'), GRADE_FIELDS)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
     query = Grade.query
     
     if student_id:
@@ -140,25 +216,25 @@ def get_grades():
         query = query.filter_by(period=period)
     
     if class_id:
-        # Filtrer par classe (via les étudiants)
-        student_ids = [s.id for s in User.query.filter_by(current_class_id=class_id).all()]
-        query = query.filter(Grade.student_id.in_(student_ids))
+        # Filtrer par classe (via les étudiants), en sous-requête
+        class_students = db.session.query(User.id).filter(User.current_class_id == class_id)
+        query = query.filter(Grade.student_id.in_(class_students))
     
-    grades = query.order_by(Grade.subject_name).all()
+    if 'student_name' in fields:
+        # Noms des élèves chargés dans la même requête
+        query = query.options(joinedload(Grade.student).load_only(User.first_name, User.last_name, User.username))
     
-    return jsonify([{
-        'id': g.id,
-        'student_id': g.student_id,
-        'student_name': g.student.full_name,
-        'subject_name': g.subject_name,
-        'moy_cl': g.moy_cl,
-        'n_compo': g.n_compo,
-        'coef': g.coef,
-        'average': g.average,
-        'weighted_average': g.weighted_average,
-        'appreciation': g.appreciation,
-        'period': g.period
-    } for g in grades])
+    try:
+        grades, next_cursor = keyset_page(
+            query, [Grade.subject_name, Grade.id],
+            key=lambda g: (g.subject_name, g.id),
+            cursor=request.args.get('cursor'),
+            limit=request.args.get('limit', type=int)
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    return _paginated_response(grades, GRADE_FIELDS, fields, next_cursor)
 
 
 @api_bp.route('/grades', methods=['POST'])
@@ -188,28 +264,82 @@ def create_grade():
     if not (0 <= moy_cl <= 20 and 0 <= n_compo <= 20):
         return jsonify({'error': 'Les notes doivent être entre 0 et 20'}), 400
     
-    grade = Grade(
-        student_id=data['student_id'],
-        subject_name=data['subject_name'],
-        moy_cl=moy_cl,
-        n_compo=n_compo,
-        coef=coef,
-        period=data['period'],
-        teacher_id=current_user.id
-    )
-    grade.appreciation = Grade.get_appreciation(grade.average)
+    try:
+        student_id = int(data['student_id'])
+    except (ValueError, TypeError):
+        return jsonify({'error': 'Élève invalide'}), 400
+    
+    subject_name = str(data['subject_name']).strip()
+    period = str(data['period']).strip()
+    if not subject_name or not period:
+        return jsonify({'error': 'Matière et période requises'}), 400
+    
+    if not User.query.filter_by(id=student_id, role='student').first():
+        return jsonify({'error': 'Élève introuvable'}), 404
     
-    db.session.add(grade)
+    # Une seule note par (élève, matière, période) : une note existante est mise à jour
+    grade, created = save_grade(student_id, subject_name, period, moy_cl, n_compo, coef,
+                                teacher_id=current_user.id)
     db.session.commit()
     
     return jsonify({
-        'message': 'Note créée avec succès',
+        'message': 'Note créée avec succès' if created else 'Note mise à jour',
         'grade': {
             'id': grade.id,
             'average': grade.average,
             'appreciation': grade.appreciation
         }
-    }), 201
+    }), 201 if created else 200
+
+
+@api_bp.route('/grades/bulk', methods=['POST'])
+@login_required
+def bulk_grades():
+    """
+    Saisie groupée d'une grille de notes (une classe, une période).
+    
+    Corps JSON : {"period": "1", "class_id": 3 (optionnel),
+                  "grades": [{student_id, subject_name, moy_cl, n_compo, coef}, ...]}
+    
+    La grille est entièrement rejetée si une seule ligne est invalide.
+    """
+    if current_user.role not in ['admin', 'teacher']:
+        return jsonify({'error': 'Non autorisé'}), 403
+    
+    data = request.get_json()
+    
+    if not data:
+        return jsonify({'error': 'Données manquantes'}), 400
+    
+    period = str(data.get('period') or '').strip()
+    entries = data.get('grades')
+    if not period:
+        return jsonify({'error': 'Champ requis: period'}), 400
+    if not isinstance(entries, list) or not entries:
+        return jsonify({'error': 'Champ requis: grades'}), 400
+    
+    class_id = data.get('class_id')
+    subjects = None
+    if class_id is not None:
+        school_class = SchoolClass.query.get(class_id)
+        if not school_class:
+            return jsonify({'error': 'Classe introuvable'}), 404
+        if school_class.bulletin_structure:
+            subjects = set(school_class.bulletin_structure.get_all_subjects())
+        class_id = school_class.id
+    
+    rows, errors = validate_grade_entries(entries, class_id=class_id, subjects=subjects)
+    if errors:
+        return jsonify({'error': 'Grille invalide', 'errors': errors}), 400
+    
+    result = upsert_grades(rows, period, teacher_id=current_user.id)
+    db.session.commit()
+    
+    return jsonify({
+        'message': 'Notes enregistrées',
+        'created': result['created'],
+        'updated': result['updated']
+    })
 
 
 @api_bp.route('/grades/<int:grade_id>', methods=['PUT'])
@@ -225,6 +355,8 @@ def update_grade(grade_id):
     if not data:
         return jsonify({'error': 'Données manquantes'}), 400
     
+    previous_period = grade.period
+    
     try:
         if 'moy_cl' in data:
             grade.moy_cl = float(data['moy_cl'])
@@ -242,7 +374,13 @@ def update_grade(grade_id):
     
     grade.appreciation = Grade.get_appreciation(grade.average)
     
-    db.session.commit()
+    try:
+        on_grade_changed(grade.student_id, previous_period, grade.period)
+        audit_event('grade_updated', user_id=current_user.id, entity_type='Grade', entity_id=grade.id)
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
+        return jsonify({'error': 'Une note existe déjà pour cette matière et cette période'}), 409
     
     return jsonify({
         'message': 'Note mise à jour',
@@ -262,13 +400,88 @@ def delete_grade(grade_id):
         return jsonify({'error': 'Non autorisé'}), 403
     
     grade = Grade.query.get_or_404(grade_id)
+    student_id, period = grade.student_id, grade.period
     
     db.session.delete(grade)
+    on_grade_changed(student_id, period)
+    audit_event('grade_deleted', user_id=current_user.id, entity_type='Grade', entity_id=grade_id,
+                details={'student_id': student_id, 'period': period})
     db.session.commit()
     
     return jsonify({'message': 'Note supprimée'})
 
 
+# ============================================
+# EXPORTS
+# ============================================
+
+def _export_response(rows, columns, output_format, stem):
+    """Réponse en flux (NDJSON ou CSV) téléchargée sous le nom stem.<format>"""
+    response = Response(
+        stream_with_context(stream_rows(rows, columns, output_format)),
+        mimetype=EXPORT_FORMATS[output_format]
+    )
+    response.headers['Content-Disposition'] = f'attachment; filename={stem}.{output_format}'
+    return response
+
+
+@api_bp.route('/export/grades')
+@login_required
+def export_grades():
+    """
+    Export des notes en flux.
+    
+    Paramètres : format=ndjson|csv, class_id, period, academic_year (ex: 2024-2025)
+    """
+    if current_user.role != 'admin':
+        return jsonify({'error': 'Non autorisé'}), 403
+    
+    output_format = request.args.get('format', 'ndjson')
+    if output_format not in EXPORT_FORMATS:
+        return jsonify({'error': 'Format invalide (ndjson ou csv)'}), 400
+    
+    try:
+        rows = iter_grades(
+            class_id=request.args.get('class_id', type=int),
+            period=request.args.get('period'),
+            academic_year=request.args.get('academic_year')
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    return _export_response(rows, GRADE_COLUMNS, output_format, 'notes')
+
+
+@api_bp.route('/export/attendance')
+@login_required
+def export_attendance():
+    """
+    Export des présences en flux.
+    
+    Paramètres : format=ndjson|csv, class_id, academic_year, start, end (AAAA-MM-JJ)
+    """
+    if current_user.role != 'admin':
+        return jsonify({'error': 'Non autorisé'}), 403
+    
+    output_format = request.args.get('format', 'ndjson')
+    if output_format not in EXPORT_FORMATS:
+        return jsonify({'error': 'Format invalide (ndjson ou csv)'}), 400
+    
+    try:
+        start = request.args.get('start')
+        end = request.args.get('end')
+        rows = iter_attendance(
+            class_id=request.args.get('class_id', type=int),
+            academic_year=request.args.get('academic_year'),
+            start=datetime.strptime(start, '%Y-%m-%d').date() if start else None,
+            end=datetime.strptime(end, '%Y-%m-%d').date() if end else None
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    return _export_response(rows, ATTENDANCE_COLUMNS, output_format, 'presences')
+
+
 # ============================================
 # API STATISTIQUES
 # ============================================
@@ -282,23 +495,21 @@ def get_student_stats(student_id):
     # Vérifier les droits d'accès
     if current_user.role == 'student' and current_user.id != student_id:
         return jsonify({'error': 'Non autorisé'}), 403
-    if current_user.role == 'parent' and student not in current_user.children:
+    if current_user.role == 'parent' and not current_user.has_child(student.id):
         return jsonify({'error': 'Non autorisé'}), 403
     
     stats = {}
+    summaries = get_period_summaries(student_id)
     
     for period in STANDARD_PERIODS:
-        grades = Grade.query.filter_by(student_id=student_id, period=period).all()
+        summary = summaries.get(period)
         
-        if grades:
-            total_weighted = sum(g.weighted_average for g in grades)
-            total_coef = sum(g.coef for g in grades)
-            avg = round(total_weighted / total_coef, 2) if total_coef > 0 else 0
-            
+        if summary:
             stats[period] = {
-                'average': avg,
-                'grade_count': len(grades),
-                'appreciation': Grade.get_appreciation(avg)
+                'average': summary.general_average,
+                'grade_count': summary.grade_count,
+                'rank': summary.rank,
+                'appreciation': Grade.get_appreciation(summary.general_average)
             }
         else:
             stats[period] = {
@@ -310,48 +521,62 @@ def get_student_stats(student_id):
     return jsonify(stats)
 
 
+@api_bp.route('/stats/attendance/<int:student_id>')
+@login_required
+def get_attendance_stats(student_id):
+    """
+    Statistiques de présence d'un élève.
+    
+    Paramètres : month=1-12 (filtre sur un mois) ou by=month (détail mois par mois)
+    """
+    student = User.query.get_or_404(student_id)
+    
+    # Vérifier les droits d'accès
+    if current_user.role == 'student' and current_user.id != student_id:
+        return jsonify({'error': 'Non autorisé'}), 403
+    if current_user.role == 'parent' and not current_user.has_child(student.id):
+        return jsonify({'error': 'Non autorisé'}), 403
+    
+    month = request.args.get('month', type=int)
+    if month is not None and not 1 <= month <= 12:
+        return jsonify({'error': 'Mois invalide'}), 400
+    
+    result = {
+        'student_id': student.id,
+        'stats': attendance_stats(student.id, month=month)
+    }
+    if request.args.get('by') == 'month':
+        result['months'] = monthly_attendance_stats(student.id)
+    
+    return jsonify(result)
+
+
 @api_bp.route('/stats/class/<int:class_id>')
 @login_required
 def get_class_stats(class_id):
-    """Statistiques d'une classe"""
+    """Statistiques d'une classe par période et par matière (une requête)"""
     if current_user.role not in ['admin', 'teacher']:
         return jsonify({'error': 'Non autorisé'}), 403
     
-    school_class = SchoolClass.query.get_or_404(class_id)
-    students = User.query.filter_by(role='student', current_class_id=class_id).all()
+    SchoolClass.query.get_or_404(class_id)
     
-    stats = {
-        'student_count': len(students),
-        'periods': {}
-    }
+    return jsonify(compute_class_statistics(class_id))
+
+
+@api_bp.route('/stats/class/<int:class_id>/subjects')
+@login_required
+def get_subject_analytics(class_id):
+    """Analyse par matière d'une classe pour une période (distribution, classement)"""
+    if current_user.role not in ['admin', 'teacher']:
+        return jsonify({'error': 'Non autorisé'}), 403
     
-    for period in STANDARD_PERIODS:
-        period_averages = []
-        
-        for student in students:
-            grades = Grade.query.filter_by(student_id=student.id, period=period).all()
-            if grades:
-                total_weighted = sum(g.weighted_average for g in grades)
-                total_coef = sum(g.coef for g in grades)
-                if total_coef > 0:
-                    period_averages.append(total_weighted / total_coef)
-        
-        if period_averages:
-            stats['periods'][period] = {
-                'class_average': round(sum(period_averages) / len(period_averages), 2),
-                'highest': round(max(period_averages), 2),
-                'lowest': round(min(period_averages), 2),
-                'student_with_grades': len(period_averages)
-            }
-        else:
-            stats['periods'][period] = {
-                'class_average': 0,
-                'highest': 0,
-                'lowest': 0,
-                'student_with_grades': 0
-            }
+    period = request.args.get('period', '').strip()
+    if not period:
+        return jsonify({'error': 'Champ requis: period'}), 400
     
-    return jsonify(stats)
+    SchoolClass.query.get_or_404(class_id)
+    
+    return jsonify(subject_analytics(class_id, period))
 
 
 # ============================================
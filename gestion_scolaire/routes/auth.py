@@ -5,7 +5,9 @@ from flask import Blueprint, render_template, redirect, url_for, flash, request
 from flask_login import login_user, logout_user, login_required, current_user
 from datetime import datetime
 from gestion_scolaire import db
-from gestion_scolaire.models import User, SchoolClass, AuditLog
+from gestion_scolaire.models import User, SchoolClass
+from gestion_scolaire.audit import audit_event
+from gestion_scolaire.user_cache import invalidate_user
 
 auth_bp = Blueprint('auth', __name__)
 
@@ -35,15 +37,8 @@ def login():
             login_user(user, remember=remember)
             user.last_login = datetime.utcnow()
             
-            # Log de l'action
-            audit = AuditLog(
-                user_id=user.id,
-                action='user_login',
-                entity_type='User',
-                entity_id=user.id,
-                ip_address=request.remote_addr
-            )
-            db.session.add(audit)
+            # Log de l'action (écrit en arrière-plan, voir audit.py)
+            audit_event('user_login', user_id=user.id, entity_type='User', entity_id=user.id)
             db.session.commit()
             
             flash(f'Bienvenue, {user.full_name}!', 'success')
@@ -63,15 +58,8 @@ def login():
 @login_required
 def logout():
     """Déconnexion"""
-    # Log de l'action
-    audit = AuditLog(
-        user_id=current_user.id,
-        action='user_logout',
-        entity_type='User',
-        entity_id=current_user.id,
-        ip_address=request.remote_addr
-    )
-    db.session.add(audit)
+    # Log de l'action (écrit en arrière-plan, voir audit.py)
+    audit_event('user_logout', user_id=current_user.id, entity_type='User', entity_id=current_user.id)
     db.session.commit()
     
     logout_user()
@@ -180,6 +168,7 @@ def profile():
         current_user.address = address if address else None
         
         db.session.commit()
+        invalidate_user(current_user.id)
         flash('Profil mis à jour avec succès.', 'success')
     
     return render_template('auth/profile.html')
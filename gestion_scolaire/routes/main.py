@@ -1,9 +1,11 @@
 """
 Routes principales - Dashboard et redirection selon rôle
 """
-from flask import Blueprint, render_template, redirect, url_for
+from flask import Blueprint, render_template, redirect, url_for, request
 from flask_login import login_required, current_user
-from gestion_scolaire.models import User, SchoolClass, Grade, Announcement, Attendance
+from gestion_scolaire import db
+from gestion_scolaire.models import User, SchoolClass, Grade, Attendance
+from gestion_scolaire.announcements import announcement_page
 from datetime import datetime, date
 
 main_bp = Blueprint('main', __name__)
@@ -36,30 +38,7 @@ def dashboard():
 @main_bp.route('/announcements')
 @login_required
 def announcements():
-    """Liste des annonces pour tous les utilisateurs"""
-    # Filtrer les annonces selon le rôle
-    query = Announcement.query.filter_by(is_active=True)
-    
-    if current_user.role == 'student':
-        # Annonces pour tous, pour les étudiants, ou pour la classe de l'étudiant
-        query = query.filter(
-            (Announcement.target_audience == 'all') |
-            (Announcement.target_audience == 'students') |
-            (Announcement.target_class_id == current_user.current_class_id)
-        )
-    elif current_user.role == 'teacher':
-        query = query.filter(
-            (Announcement.target_audience == 'all') |
-            (Announcement.target_audience == 'teachers')
-        )
-    elif current_user.role == 'parent':
-        # Annonces pour tous, parents, ou classes des enfants
-        children_class_ids = [child.current_class_id for child in current_user.children if child.current_class_id]
-        query = query.filter(
-            (Announcement.target_audience == 'all') |
-            (Announcement.target_audience == 'parents') |
-            (Announcement.target_class_id.in_(children_class_ids))
-        )
-    
-    announcements = query.order_by(Announcement.created_at.desc()).all()
+    """Liste des annonces visibles par l'utilisateur (selon son rôle et sa classe)"""
+    page = request.args.get('page', 1, type=int)
+    announcements = announcement_page(current_user, page)
     return render_template('announcements.html', announcements=announcements)
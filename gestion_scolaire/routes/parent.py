@@ -3,12 +3,20 @@ Routes parent - Suivi des enfants
 """
 from flask import Blueprint, render_template, redirect, url_for, flash, request, send_file
 from flask_login import login_required, current_user
+from sqlalchemy.exc import IntegrityError
 from functools import wraps
 from gestion_scolaire import db
 from gestion_scolaire.models import (
-    User, Grade, Attendance, Message, Announcement, STANDARD_PERIODS
+    User, Grade, Attendance, Message, MessageThread, STANDARD_PERIODS
+)
+from gestion_scolaire.bulletins import build_flat_bulletin_data, cached_bulletin_path
+from gestion_scolaire.attendance import attendance_stats, attendance_stats_for_students
+from gestion_scolaire.ranking import compute_class_ranking
+from gestion_scolaire.announcements import announcement_feed
+from gestion_scolaire.messaging import (
+    send_message, reply_to_thread, mark_messages_read, mark_thread_read, unread_count,
+    mailbox_page, thread_list, thread_messages, MAILBOXES
 )
-from gestion_scolaire.pdf_generator import generate_bulletin_pdf
 from datetime import datetime
 from io import BytesIO
 
@@ -51,38 +59,21 @@ def dashboard():
         # Rang dans la classe
         rank = None
         class_size = 0
-        if child.school_class:
-            class_students = User.query.filter_by(school_class_id=child.school_class_id, role='student').all()
-            class_size = len(class_students)
-            # Calculer les moyennes de tous les élèves
-            student_averages = []
-            for s in class_students:
-                s_grades = Grade.query.filter_by(student_id=s.id).all()
-                if s_grades:
-                    s_weighted = sum(g.weighted_average for g in s_grades)
-                    s_coef = sum(g.coef for g in s_grades)
-                    s_avg = s_weighted / s_coef if s_coef > 0 else 0
-                    student_averages.append((s.id, s_avg))
-            # Trier et trouver le rang
-            student_averages.sort(key=lambda x: x[1], reverse=True)
-            for i, (sid, _) in enumerate(student_averages, 1):
-                if sid == child.id:
-                    rank = i
-                    break
+        if child.school_class_id:
+            ranking = compute_class_ranking(child.school_class_id)
+            class_size = ranking.class_size
+            rank = ranking.rank_of(child.id)
         
         child.average = avg
         child.rank = rank
         child.class_size = class_size
         children_data.append(child)
     
-    # Annonces
-    announcements = Announcement.query.filter(
-        Announcement.is_active == True,
-        (Announcement.target_audience == 'all') | (Announcement.target_audience == 'parents')
-    ).order_by(Announcement.created_at.desc()).limit(5).all()
+    # Annonces (parents et classes des enfants)
+    announcements = announcement_feed(current_user, 5)
     
-    # Messages non lus
-    unread_messages = Message.query.filter_by(recipient_id=current_user.id, is_read=False).count()
+    # Messages non lus (compteur dénormalisé)
+    unread_messages = unread_count(current_user.id)
     
     # Notes récentes de tous les enfants
     recent_grades = []
@@ -112,6 +103,9 @@ def children():
     count_with_avg = 0
     count_with_attendance = 0
     
+    # Présences de tous les enfants en une requête
+    children_attendance = attendance_stats_for_students(child.id for child in children_list)
+    
     for child in children_list:
         # Moyenne
         all_grades = Grade.query.filter_by(student_id=child.id).all()
@@ -127,19 +121,16 @@ def children():
         # Rang
         rank = None
         class_size = 0
-        if child.school_class:
-            class_students = User.query.filter_by(school_class_id=child.school_class_id, role='student').all()
-            class_size = len(class_students)
+        if child.school_class_id:
+            ranking = compute_class_ranking(child.school_class_id)
+            class_size = ranking.class_size
+            rank = ranking.rank_of(child.id)
         
         # Présence
-        all_attendance = Attendance.query.filter_by(student_id=child.id).all()
-        if all_attendance:
-            present_count = sum(1 for a in all_attendance if a.status == 'present')
-            attendance_rate = (present_count / len(all_attendance)) * 100
+        attendance_rate = children_attendance[child.id]['rate']
+        if attendance_rate is not None:
             global_attendance_sum += attendance_rate
             count_with_attendance += 1
-        else:
-            attendance_rate = None
         
         child.average = avg
         child.rank = rank
@@ -164,7 +155,7 @@ def child_grades(child_id):
     child = User.query.get_or_404(child_id)
     
     # Vérifier que c'est bien un enfant du parent
-    if child not in current_user.children:
+    if not current_user.has_child(child.id):
         flash('Vous n\'êtes pas autorisé à voir ces informations.', 'danger')
         return redirect(url_for('parent.dashboard'))
     
@@ -199,25 +190,15 @@ def child_attendance(child_id):
     """Voir les présences d'un enfant"""
     child = User.query.get_or_404(child_id)
     
-    if child not in current_user.children:
+    if not current_user.has_child(child.id):
         flash('Vous n\'êtes pas autorisé à voir ces informations.', 'danger')
         return redirect(url_for('parent.dashboard'))
     
     records = Attendance.query.filter_by(student_id=child_id)\
         .order_by(Attendance.date.desc()).all()
     
-    stats = {
-        'total': len(records),
-        'present': sum(1 for r in records if r.status == 'present'),
-        'absent': sum(1 for r in records if r.status == 'absent'),
-        'late': sum(1 for r in records if r.status == 'late'),
-        'excused': sum(1 for r in records if r.status == 'excused')
-    }
-    
-    if stats['total'] > 0:
-        stats['presence_rate'] = round((stats['present'] / stats['total']) * 100, 1)
-    else:
-        stats['presence_rate'] = 100
+    stats = attendance_stats(child_id)
+    stats['presence_rate'] = stats['rate'] if stats['rate'] is not None else 100
     
     return render_template('parent/child_attendance.html',
                           child=child,
@@ -232,14 +213,14 @@ def child_bulletin(child_id):
     """Voir/télécharger le bulletin d'un enfant"""
     child = User.query.get_or_404(child_id)
     
-    if child not in current_user.children:
+    if not current_user.has_child(child.id):
         flash('Vous n\'êtes pas autorisé à voir ces informations.', 'danger')
         return redirect(url_for('parent.dashboard'))
     
     period = request.args.get('period', 1, type=int)
     download = request.args.get('download', False, type=bool)
     
-    grades = Grade.query.filter_by(student_id=child_id, period=period).all()
+    grades = Grade.query.filter_by(student_id=child_id, period=str(period)).all()
     
     # Calculer la moyenne
     if grades:
@@ -250,10 +231,10 @@ def child_bulletin(child_id):
         overall_average = 0
     
     if download and grades:
-        # Générer le PDF
-        pdf_buffer = generate_bulletin_pdf(child, grades, period)
+        # Servir le PDF depuis le cache (rendu uniquement si les notes ont changé)
+        bulletin = build_flat_bulletin_data(child, grades, period)
         return send_file(
-            pdf_buffer,
+            cached_bulletin_path(bulletin, str(period)),
             mimetype='application/pdf',
             as_attachment=True,
             download_name=f'bulletin_{child.full_name}_{period}.pdf'
@@ -271,13 +252,31 @@ def child_bulletin(child_id):
 @login_required
 @parent_required
 def messages():
-    """Messagerie"""
-    received = Message.query.filter_by(recipient_id=current_user.id)\
-        .order_by(Message.created_at.desc()).all()
-    sent = Message.query.filter_by(sender_id=current_user.id)\
-        .order_by(Message.created_at.desc()).all()
-    
-    return render_template('parent/messages.html', received=received, sent=sent)
+    """Messagerie : conversations, boîte de réception ou messages envoyés, paginés"""
+    box = request.args.get('box', 'threads')
+    if box not in MAILBOXES:
+        box = 'threads'
+    
+    threads, page = [], []
+    if box == 'threads':
+        threads, next_cursor = thread_list(current_user.id, before=request.args.get('cursor', type=int))
+    else:
+        try:
+            page, next_cursor = mailbox_page(current_user.id, box, cursor=request.args.get('cursor'))
+        except ValueError:
+            return redirect(url_for('parent.messages', box=box))
+    
+    recipients = User.query.filter(User.role.in_(['teacher', 'admin']))\
+        .order_by(User.role.desc(), User.last_name).all()
+    
+    return render_template('parent/messages.html',
+                          box=box,
+                          threads=threads,
+                          messages=page,
+                          next_cursor=next_cursor,
+                          first_page=not request.args.get('cursor'),
+                          unread_messages=unread_count(current_user.id),
+                          recipients=recipients)
 
 
 @parent_bp.route('/messages/compose', methods=['GET', 'POST'])
@@ -285,9 +284,6 @@ def messages():
 @parent_required
 def compose_message():
     """Composer un message"""
-    # Destinataires possibles: enseignants et admin
-    recipients = User.query.filter(User.role.in_(['teacher', 'admin'])).order_by(User.last_name).all()
-    
     if request.method == 'POST':
         recipient_id = request.form.get('recipient_id', type=int)
         subject = request.form.get('subject', '').strip()
@@ -295,22 +291,27 @@ def compose_message():
         
         if not all([recipient_id, subject, content]):
             flash('Tous les champs sont requis.', 'danger')
-            return render_template('parent/compose_message.html', recipients=recipients)
+            return redirect(url_for('parent.messages'))
         
-        message = Message(
-            sender_id=current_user.id,
-            recipient_id=recipient_id,
-            subject=subject,
-            content=content
-        )
+        # Destinataires possibles: enseignants et admin
+        if not User.query.filter(User.id == recipient_id, User.role.in_(['teacher', 'admin'])).first():
+            flash('Destinataire invalide.', 'danger')
+            return redirect(url_for('parent.messages'))
         
-        db.session.add(message)
-        db.session.commit()
+        message = send_message(current_user.id, recipient_id, subject, content)
+        try:
+            db.session.commit()
+        except IntegrityError:
+            # Conversation créée en parallèle avec le même destinataire
+            db.session.rollback()
+            flash('Le message n\'a pas pu être envoyé. Veuillez réessayer.', 'warning')
+            return redirect(url_for('parent.messages'))
         
         flash('Message envoyé avec succès.', 'success')
-        return redirect(url_for('parent.messages'))
+        return redirect(url_for('parent.view_thread', thread_id=message.thread_id))
     
-    return render_template('parent/compose_message.html', recipients=recipients)
+    # La rédaction se fait depuis la messagerie
+    return redirect(url_for('parent.messages'))
 
 
 @parent_bp.route('/messages/<int:message_id>')
@@ -327,7 +328,50 @@ def view_message(message_id):
     
     # Marquer comme lu si c'est le destinataire
     if message.recipient_id == current_user.id and not message.is_read:
-        message.mark_as_read()
+        mark_messages_read(current_user.id, [message.id])
         db.session.commit()
     
     return render_template('parent/view_message.html', message=message)
+
+
+@parent_bp.route('/messages/threads/<int:thread_id>')
+@login_required
+@parent_required
+def view_thread(thread_id):
+    """Voir une conversation et la marquer comme lue"""
+    thread = MessageThread.query.get_or_404(thread_id)
+    
+    if not thread.has_participant(current_user.id):
+        flash('Vous n\'êtes pas autorisé à voir cette conversation.', 'danger')
+        return redirect(url_for('parent.messages'))
+    
+    if mark_thread_read(current_user.id, thread.id):
+        db.session.commit()
+    
+    return render_template('parent/thread.html',
+                          thread=thread,
+                          other=thread.other_participant(current_user.id),
+                          messages=thread_messages(thread.id))
+
+
+@parent_bp.route('/messages/threads/<int:thread_id>/reply', methods=['POST'])
+@login_required
+@parent_required
+def reply_thread(thread_id):
+    """Répondre dans une conversation"""
+    thread = MessageThread.query.get_or_404(thread_id)
+    
+    if not thread.has_participant(current_user.id):
+        flash('Vous n\'êtes pas autorisé à voir cette conversation.', 'danger')
+        return redirect(url_for('parent.messages'))
+    
+    content = request.form.get('content', '').strip()
+    if not content:
+        flash('Le message ne peut pas être vide.', 'danger')
+        return redirect(url_for('parent.view_thread', thread_id=thread.id))
+    
+    reply_to_thread(thread, current_user.id, content)
+    db.session.commit()
+    
+    flash('Message envoyé avec succès.', 'success')
+    return redirect(url_for('parent.view_thread', thread_id=thread.id))
@@ -6,11 +6,14 @@ from flask_login import login_required, current_user
 from functools import wraps
 from gestion_scolaire import db
 from gestion_scolaire.models import (
-    User, SchoolClass, Grade, BulletinStructure, Attendance, Announcement, STANDARD_PERIODS
+    User, SchoolClass, Grade, BulletinStructure, Attendance, STANDARD_PERIODS
 )
-from gestion_scolaire.pdf_generator import generate_bulletin_pdf
+from gestion_scolaire.bulletins import build_flat_bulletin_data, cached_bulletin_path
+from gestion_scolaire.attendance import attendance_stats
+from gestion_scolaire.ranking import compute_class_ranking
+from gestion_scolaire.summaries import get_period_summaries
+from gestion_scolaire.announcements import announcement_feed
 from datetime import datetime
-import tempfile
 
 student_bp = Blueprint('student', __name__)
 
@@ -47,36 +50,17 @@ def dashboard():
     # Calculer le rang
     rank = None
     class_size = 0
-    if current_user.current_class:
-        class_students = User.query.filter_by(current_class_id=current_user.current_class_id, role='student').all()
-        class_size = len(class_students)
-        
-        # Calculer les moyennes de tous les élèves
-        student_averages = []
-        for s in class_students:
-            s_grades = Grade.query.filter_by(student_id=s.id).all()
-            if s_grades:
-                s_weighted = sum(g.weighted_average for g in s_grades)
-                s_coef = sum(g.coef for g in s_grades)
-                s_avg = s_weighted / s_coef if s_coef > 0 else 0
-                student_averages.append((s.id, s_avg))
-        
-        # Trier et trouver le rang
-        student_averages.sort(key=lambda x: x[1], reverse=True)
-        for i, (sid, _) in enumerate(student_averages, 1):
-            if sid == current_user.id:
-                rank = i
-                break
+    if current_user.current_class_id:
+        ranking = compute_class_ranking(current_user.current_class_id)
+        class_size = ranking.class_size
+        rank = ranking.rank_of(current_user.id)
     
     # Nombre de matières notées
     subjects_count = len(set(g.subject_name for g in all_grades))
     
     # Taux de présence
-    attendance_records = Attendance.query.filter_by(student_id=current_user.id).all()
-    if attendance_records:
-        present_count = sum(1 for a in attendance_records if a.status == 'present')
-        attendance_rate = (present_count / len(attendance_records)) * 100
-    else:
+    attendance_rate = attendance_stats(current_user.id)['rate']
+    if attendance_rate is None:
         attendance_rate = 100
     
     # Notes par matière
@@ -90,11 +74,8 @@ def dashboard():
             period_num = 1
         grades_by_subject[grade.subject_name][period_num] = grade.average
     
-    # Annonces
-    announcements = Announcement.query.filter(
-        Announcement.is_active == True,
-        (Announcement.target_audience == 'all') | (Announcement.target_audience == 'students')
-    ).order_by(Announcement.created_at.desc()).limit(5).all()
+    # Annonces (élèves et classe de l'élève)
+    announcements = announcement_feed(current_user, 5)
     
     return render_template('student/dashboard.html',
                           recent_grades=recent_grades,
@@ -148,20 +129,13 @@ def bulletin():
     # Vérifier si le bulletin est disponible
     bulletin_available = len(grades_list) > 0
     
-    # Calculer la moyenne
-    if grades_list:
-        total_weighted = sum(g.weighted_average for g in grades_list)
-        total_coef = sum(g.coef for g in grades_list)
-        overall_average = round(total_weighted / total_coef, 2) if total_coef > 0 else 0
-    else:
-        overall_average = 0
-        total_coef = 0
+    # Moyenne et statuts des bulletins depuis les agrégats matérialisés
+    summaries = get_period_summaries(current_user.id)
+    summary = summaries.get(str(selected_period))
+    overall_average = summary.general_average if summary else 0
+    total_coef = summary.total_coef if summary else 0
     
-    # Statuts des bulletins par période
-    bulletins_status = {}
-    for p in [1, 2, 3]:
-        p_grades = Grade.query.filter_by(student_id=current_user.id, period=str(p)).count()
-        bulletins_status[p] = p_grades > 0
+    bulletins_status = {p: str(p) in summaries for p in [1, 2, 3]}
     
     return render_template('student/bulletin.html',
                           grades=grades_list,
@@ -192,48 +166,15 @@ def download_bulletin():
         flash('Aucune note disponible pour cette période.', 'warning')
         return redirect(url_for('student.bulletin', period=period))
     
-    # Calculer la moyenne
-    total_weighted = sum(g.weighted_average for g in grades_list)
-    total_coef = sum(g.coef for g in grades_list)
-    general_average = round(total_weighted / total_coef, 2) if total_coef > 0 else 0
-    
-    # Préparer les données pour le PDF
-    student_data = {
-        'name': current_user.full_name,
-        'matricule': current_user.matricule or '-',
-        'class': current_user.current_class.name,
-        'period': period,
-        'school_name': 'Lycée Michel ALLAIRE'
-    }
-    
-    grades_data = []
-    for g in grades_list:
-        grades_data.append({
-            'subject': g.subject_name,
-            'moy_cl': g.moy_cl,
-            'n_compo': g.n_compo,
-            'coef': g.coef,
-            'mg': g.average,
-            'appreciation': g.appreciation or g.auto_appreciation()
-        })
-    
-    summary_data = {
-        'total_points': round(total_weighted, 2),
-        'total_coef': total_coef,
-        'general_average': general_average,
-        'appreciation': Grade.get_appreciation(general_average)
-    }
+    bulletin = build_flat_bulletin_data(current_user, grades_list, period)
     
     try:
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as tmp:
-            generate_bulletin_pdf(tmp.name, student_data, grades_data, [], summary_data)
-            
-            return send_file(
-                tmp.name,
-                mimetype='application/pdf',
-                as_attachment=True,
-                download_name=f'bulletin_{current_user.username}_P{period}.pdf'
-            )
+        return send_file(
+            cached_bulletin_path(bulletin, str(period)),
+            mimetype='application/pdf',
+            as_attachment=True,
+            download_name=bulletin['filename']
+        )
     except Exception as e:
         flash(f'Erreur lors de la génération du bulletin: {str(e)}', 'danger')
         return redirect(url_for('student.bulletin', period=period))
@@ -258,19 +199,8 @@ def attendance():
     attendance_records = query.order_by(Attendance.date.desc()).all()
     
     # Statistiques globales
-    all_records = Attendance.query.filter_by(student_id=current_user.id).all()
-    stats = {
-        'total': len(all_records),
-        'present': sum(1 for r in all_records if r.status == 'present'),
-        'absent': sum(1 for r in all_records if r.status == 'absent'),
-        'late': sum(1 for r in all_records if r.status == 'late'),
-        'excused': sum(1 for r in all_records if r.status == 'excused')
-    }
-    
-    if stats['total'] > 0:
-        attendance_rate = round((stats['present'] / stats['total']) * 100, 1)
-    else:
-        attendance_rate = 100
+    stats = attendance_stats(current_user.id)
+    attendance_rate = stats['rate'] if stats['rate'] is not None else 100
     
     return render_template('student/attendance.html',
                           attendance_records=attendance_records,
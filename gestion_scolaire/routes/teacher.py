@@ -1,18 +1,30 @@
 """
 Routes enseignant - Gestion des notes, présences et bulletins
 """
-from flask import Blueprint, render_template, redirect, url_for, flash, request, send_file, jsonify
+from flask import Blueprint, render_template, redirect, url_for, flash, request, send_file, jsonify, current_app
 from flask_login import login_required, current_user
+from sqlalchemy.exc import IntegrityError
 from functools import wraps
 from gestion_scolaire import db
 from gestion_scolaire.models import (
     User, SchoolClass, Subject, Grade, BulletinStructure,
-    Attendance, Announcement, AuditLog, STANDARD_PERIODS
+    Attendance, AuditLog, StudentPeriodSummary, MessageThread, STANDARD_PERIODS
+)
+from gestion_scolaire.bulletins import (
+    build_bulletin_data, cached_bulletin_path, collect_class_bulletins,
+    collect_school_bulletins, generate_batch, OUTPUT_FORMATS
+)
+from gestion_scolaire.pdf_generator import new_pdf_buffer
+from gestion_scolaire.summaries import on_grade_changed
+from gestion_scolaire.grades import validate_grade_entries, upsert_grades, save_grade
+from gestion_scolaire.attendance import save_roll_call
+from gestion_scolaire.class_stats import subject_analytics
+from gestion_scolaire.audit import audit_event
+from gestion_scolaire.announcements import announcement_feed
+from gestion_scolaire.messaging import (
+    reply_to_thread, mark_thread_read, unread_count, thread_list, thread_messages
 )
-from gestion_scolaire.pdf_generator import generate_bulletin_pdf
 from datetime import datetime, date
-import tempfile
-import os
 
 teacher_bp = Blueprint('teacher', __name__)
 
@@ -46,10 +58,7 @@ def dashboard():
     subjects = Subject.query.filter_by(is_active=True).all()
     
     # Annonces pour les enseignants
-    announcements = Announcement.query.filter(
-        Announcement.is_active == True,
-        (Announcement.target_audience == 'all') | (Announcement.target_audience == 'teachers')
-    ).order_by(Announcement.created_at.desc()).limit(5).all()
+    announcements = announcement_feed(current_user, 5)
     
     return render_template('teacher/dashboard.html', 
                           classes=classes,
@@ -128,39 +137,16 @@ def add_grade():
         flash('Le coefficient doit être au moins 1.', 'danger')
         return redirect(url_for('teacher.grades'))
     
-    # Vérifier si une note existe déjà pour cette matière/période
-    existing = Grade.query.filter_by(
-        student_id=student_id,
-        subject_name=subject_name,
-        period=period
-    ).first()
-    
-    if existing:
-        # Mettre à jour la note existante
-        existing.moy_cl = moy_cl
-        existing.n_compo = n_compo
-        existing.coef = coef
-        existing.teacher_id = current_user.id
-        existing.appreciation = Grade.get_appreciation(existing.average)
-        existing.updated_at = datetime.utcnow()
-        flash('Note mise à jour avec succès.', 'success')
-    else:
-        # Créer une nouvelle note
-        grade = Grade(
-            student_id=student_id,
-            subject_name=subject_name,
-            moy_cl=moy_cl,
-            n_compo=n_compo,
-            coef=coef,
-            period=period,
-            teacher_id=current_user.id
-        )
-        grade.appreciation = Grade.get_appreciation(grade.average)
-        db.session.add(grade)
-        flash('Note ajoutée avec succès.', 'success')
-    
+    # Création ou mise à jour selon la clé (élève, matière, période)
+    _grade, created = save_grade(student_id, subject_name, period, moy_cl, n_compo, coef,
+                                 teacher_id=current_user.id)
     db.session.commit()
     
+    if created:
+        flash('Note ajoutée avec succès.', 'success')
+    else:
+        flash('Note mise à jour avec succès.', 'success')
+    
     # Redirection avec les filtres
     return redirect(request.referrer or url_for('teacher.grades'))
 
@@ -183,6 +169,8 @@ def edit_grade(grade_id):
     grade.appreciation = Grade.get_appreciation(grade.average)
     grade.updated_at = datetime.utcnow()
     
+    on_grade_changed(grade.student_id, grade.period)
+    audit_event('grade_updated', user_id=current_user.id, entity_type='Grade', entity_id=grade.id)
     db.session.commit()
     flash('Note modifiée avec succès.', 'success')
     
@@ -195,14 +183,100 @@ def edit_grade(grade_id):
 def delete_grade(grade_id):
     """Supprimer une note"""
     grade = Grade.query.get_or_404(grade_id)
+    student_id, period = grade.student_id, grade.period
     
     db.session.delete(grade)
+    on_grade_changed(student_id, period)
+    audit_event('grade_deleted', user_id=current_user.id, entity_type='Grade', entity_id=grade_id,
+                details={'student_id': student_id, 'period': period})
     db.session.commit()
     
     flash('Note supprimée avec succès.', 'success')
     return redirect(request.referrer or url_for('teacher.grades'))
 
 
+@teacher_bp.route('/grades/matrix', methods=['GET', 'POST'])
+@login_required
+@teacher_required
+def grades_matrix():
+    """Saisie de toutes les notes d'une classe pour une période (grille élèves × matières)"""
+    class_id = request.values.get('class_id', type=int)
+    selected_period = request.values.get('period', 1, type=int)
+    period = str(selected_period)
+    
+    classes = SchoolClass.query.join(BulletinStructure).order_by(SchoolClass.name).all()
+    selected_class = SchoolClass.query.get(class_id) if class_id else None
+    
+    students = []
+    subjects = []
+    if selected_class and selected_class.bulletin_structure:
+        students = User.query.filter_by(role='student', current_class_id=selected_class.id)\
+            .order_by(User.last_name, User.first_name).all()
+        subjects = selected_class.bulletin_structure.get_all_subjects()
+    
+    if request.method == 'POST':
+        if not students or not subjects:
+            flash('Classe invalide ou sans structure de bulletin.', 'danger')
+            return redirect(url_for('teacher.grades_matrix'))
+        
+        # Cellules de la grille : moy_cl_<élève>_<matière>, n_compo_<élève>_<matière>, coef_<matière>
+        entries = []
+        labels = []
+        for index, subject in enumerate(subjects):
+            coef = request.form.get(f'coef_{index}', '').strip() or 1
+            for student in students:
+                moy_cl = request.form.get(f'moy_cl_{student.id}_{index}', '').strip()
+                n_compo = request.form.get(f'n_compo_{student.id}_{index}', '').strip()
+                if not moy_cl and not n_compo:
+                    continue  # Cellule vide : note non saisie
+                entries.append({
+                    'student_id': student.id,
+                    'subject_name': subject,
+                    'moy_cl': moy_cl,
+                    'n_compo': n_compo,
+                    'coef': coef
+                })
+                labels.append(f'{student.full_name} / {subject}')
+        
+        rows, errors = validate_grade_entries(entries, class_id=selected_class.id, subjects=set(subjects))
+        if errors:
+            for error in errors[:5]:
+                flash(f"{labels[error['index']]} : {error['error']}", 'danger')
+            if len(errors) > 5:
+                flash(f'{len(errors) - 5} autre(s) erreur(s). Aucune note enregistrée.', 'danger')
+            else:
+                flash('Aucune note enregistrée.', 'danger')
+        elif rows:
+            result = upsert_grades(rows, period, teacher_id=current_user.id)
+            db.session.commit()
+            flash(f"{result['created']} note(s) ajoutée(s), {result['updated']} mise(s) à jour.", 'success')
+            return redirect(url_for('teacher.grades_matrix', class_id=selected_class.id, period=selected_period))
+        else:
+            flash('Aucune note saisie.', 'warning')
+    
+    # Notes existantes de la grille, en une requête
+    grid = {}
+    coefs = {}
+    if students:
+        existing = Grade.query.filter(
+            Grade.student_id.in_([s.id for s in students]),
+            Grade.period == period
+        ).all()
+        for grade in existing:
+            grid[(grade.student_id, grade.subject_name)] = grade
+            coefs.setdefault(grade.subject_name, grade.coef)
+    
+    return render_template('teacher/grades_matrix.html',
+                          classes=classes,
+                          selected_class=selected_class,
+                          selected_period=selected_period,
+                          students=students,
+                          subjects=subjects,
+                          grid=grid,
+                          coefs=coefs,
+                          submitted=request.form if request.method == 'POST' else {})
+
+
 # ============================================
 # VUE PAR ÉLÈVE
 # ============================================
@@ -242,10 +316,75 @@ def student_grades(student_id):
                           selected_period=period)
 
 
+@teacher_bp.route('/analytics')
+@login_required
+@teacher_required
+def analytics():
+    """Analyse par matière d'une classe : distribution des notes et classement"""
+    class_id = request.args.get('class_id', type=int)
+    selected_period = request.args.get('period', 1, type=int)
+    
+    classes = SchoolClass.query.order_by(SchoolClass.name).all()
+    selected_class = SchoolClass.query.get(class_id) if class_id else None
+    
+    class_analytics = None
+    if selected_class:
+        class_analytics = subject_analytics(selected_class.id, str(selected_period))
+    
+    return render_template('teacher/subject_analytics.html',
+                          classes=classes,
+                          selected_class=selected_class,
+                          selected_period=selected_period,
+                          analytics=class_analytics)
+
+
 # ============================================
 # GÉNÉRATION DE BULLETINS
 # ============================================
 
+@teacher_bp.route('/bulletins')
+@login_required
+@teacher_required
+def bulletins():
+    """Page de génération des bulletins"""
+    class_id = request.args.get('class_id', type=int)
+    selected_period = request.args.get('period', 1, type=int)
+    
+    classes = SchoolClass.query.join(BulletinStructure).order_by(SchoolClass.name).all()
+    selected_class = SchoolClass.query.get(class_id) if class_id else None
+    
+    students = []
+    grades_status = {}
+    students_with_grades = 0
+    
+    if selected_class:
+        students = User.query.filter_by(role='student', current_class_id=selected_class.id)\
+            .order_by(User.last_name, User.first_name).all()
+        subject_count = len(selected_class.bulletin_structure.get_all_subjects()) \
+            if selected_class.bulletin_structure else 0
+        
+        summaries = StudentPeriodSummary.query.filter(
+            StudentPeriodSummary.student_id.in_([s.id for s in students]),
+            StudentPeriodSummary.period == str(selected_period)
+        ).all()
+        for summary in summaries:
+            complete = subject_count > 0 and summary.grade_count >= subject_count
+            grades_status[summary.student_id] = {
+                'complete': complete,
+                'average': summary.general_average
+            }
+            if complete:
+                students_with_grades += 1
+    
+    return render_template('teacher/bulletins.html',
+                          classes=classes,
+                          selected_class=selected_class,
+                          selected_period=selected_period,
+                          students=students,
+                          grades_status=grades_status,
+                          students_with_grades=students_with_grades)
+
+
 @teacher_bp.route('/bulletin/<int:student_id>/<period>')
 @login_required
 @teacher_required
@@ -267,89 +406,133 @@ def generate_bulletin(student_id, period):
         flash('Aucune structure de bulletin définie pour cette classe.', 'warning')
         return redirect(url_for('teacher.grades'))
     
-    # Récupérer les notes
+    # Récupérer les notes et le rang
     grades = Grade.query.filter_by(student_id=student_id, period=period).all()
-    grades_dict = {g.subject_name: g for g in grades}
-    
-    # Préparer les données pour le PDF
-    student_data = {
-        'name': student.full_name,
-        'class': student.current_class.name,
-        'period': period,
-        'school_name': structure.school_name or 'Lycée Michel ALLAIRE'
-    }
+    period_summary = StudentPeriodSummary.query.filter_by(student_id=student_id, period=period).first()
     
-    # Construire les tableaux de notes
-    subjects_part1 = structure.get_subjects_part1_list()
-    subjects_part2 = structure.get_subjects_part2_list()
-    
-    def build_grades_table(subjects):
-        table = []
-        for subject in subjects:
-            grade = grades_dict.get(subject)
-            if grade:
-                row = {
-                    'subject': subject,
-                    'moy_cl': grade.moy_cl,
-                    'n_compo': grade.n_compo,
-                    'coef': grade.coef,
-                    'mg': grade.average,
-                    'moy_coef': grade.weighted_average,
-                    'appreciation': grade.appreciation or grade.auto_appreciation()
-                }
-            else:
-                row = {
-                    'subject': subject,
-                    'moy_cl': '-',
-                    'n_compo': '-',
-                    'coef': '-',
-                    'mg': '-',
-                    'moy_coef': '-',
-                    'appreciation': '-'
-                }
-            table.append(row)
-        return table
-    
-    grades_part1 = build_grades_table(subjects_part1)
-    grades_part2 = build_grades_table(subjects_part2)
-    
-    # Calculer le résumé
-    valid_grades = [g for g in grades if g.moy_cl is not None and g.n_compo is not None]
-    
-    if valid_grades:
-        total_weighted = sum(g.weighted_average for g in valid_grades)
-        total_coef = sum(g.coef for g in valid_grades)
-        general_average = round(total_weighted / total_coef, 2) if total_coef > 0 else 0
-    else:
-        total_weighted = 0
-        total_coef = 0
-        general_average = 0
-    
-    summary_data = {
-        'total_points': round(total_weighted, 2),
-        'total_coef': total_coef,
-        'general_average': general_average,
-        'appreciation': Grade.get_appreciation(general_average) if general_average > 0 else '-',
-        'rank': '-',  # À implémenter si nécessaire
-        'class_average': '-'  # À implémenter si nécessaire
-    }
+    bulletin = build_bulletin_data(student, student.current_class.name, structure, grades, period,
+                                   rank=period_summary.rank if period_summary else None)
     
-    # Générer le PDF
+    # Générer le PDF (ou le servir depuis le cache)
     try:
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as tmp:
-            generate_bulletin_pdf(tmp.name, student_data, grades_part1, grades_part2, summary_data)
-            
-            return send_file(
-                tmp.name,
-                mimetype='application/pdf',
-                as_attachment=True,
-                download_name=f'bulletin_{student.username}_{period.replace(" ", "_")}.pdf'
-            )
+        return send_file(
+            cached_bulletin_path(bulletin, period),
+            mimetype='application/pdf',
+            as_attachment=True,
+            download_name=bulletin['filename']
+        )
     except Exception as e:
         flash(f'Erreur lors de la génération du bulletin: {str(e)}', 'danger')
         return redirect(url_for('teacher.student_grades', student_id=student_id))
 
 
+def _send_batch(bulletins, output_format, download_stem, group_by_class=False):
+    """Génère un lot de bulletins et renvoie l'archive avec les mesures de débit"""
+    # Tampon en mémoire, basculé sur un fichier temporaire pour les gros lots
+    buffer = new_pdf_buffer()
+    report = generate_batch(
+        bulletins,
+        buffer,
+        output_format=output_format,
+        max_workers=current_app.config.get('BULLETIN_WORKERS'),
+        group_by_class=group_by_class
+    )
+    current_app.logger.info(f'Bulletins générés: {report}')
+    size = buffer.tell()
+    buffer.seek(0)
+    
+    if output_format == 'pdf':
+        mimetype, extension = 'application/pdf', 'pdf'
+    else:
+        mimetype, extension = 'application/zip', 'zip'
+    
+    response = send_file(
+        buffer,
+        mimetype=mimetype,
+        as_attachment=True,
+        download_name=f'{download_stem}.{extension}'
+    )
+    response.content_length = size
+    response.headers['X-Bulletins-Count'] = str(report.count)
+    response.headers['X-Bulletins-Elapsed'] = f'{report.elapsed:.3f}'
+    response.headers['X-Bulletins-Per-Second'] = f'{report.per_second:.2f}'
+    return response
+
+
+@teacher_bp.route('/bulletins/generate-all')
+@login_required
+@teacher_required
+def generate_all_bulletins():
+    """Générer les bulletins de toute une classe (ZIP ou PDF fusionné)"""
+    class_id = request.args.get('class_id', type=int)
+    period = request.args.get('period', '')
+    output_format = request.args.get('format', 'zip')
+    
+    if not class_id or not period or output_format not in OUTPUT_FORMATS:
+        flash('Paramètres de génération invalides.', 'danger')
+        return redirect(url_for('teacher.bulletins'))
+    
+    school_class = SchoolClass.query.get_or_404(class_id)
+    bulletins = collect_class_bulletins(class_id, period)
+    if not bulletins:
+        flash('Aucun bulletin à générer pour cette classe.', 'warning')
+        return redirect(url_for('teacher.bulletins', class_id=class_id, period=period))
+    
+    stem = f'bulletins_{school_class.name}_P{period}'.replace(' ', '_')
+    return _send_batch(bulletins, output_format, stem)
+
+
+@teacher_bp.route('/bulletins/generate-selected')
+@login_required
+@teacher_required
+def generate_selected_bulletins():
+    """Générer les bulletins des élèves sélectionnés"""
+    period = request.args.get('period', '')
+    output_format = request.args.get('format', 'zip')
+    try:
+        student_ids = [int(i) for i in request.args.get('students', '').split(',') if i]
+    except ValueError:
+        student_ids = []
+    
+    if not student_ids or not period or output_format not in OUTPUT_FORMATS:
+        flash('Paramètres de génération invalides.', 'danger')
+        return redirect(url_for('teacher.bulletins'))
+    
+    class_ids = [c for (c,) in db.session.query(User.current_class_id)
+                 .filter(User.id.in_(student_ids), User.current_class_id.isnot(None)).distinct()]
+    bulletins = []
+    for class_id in class_ids:
+        bulletins.extend(collect_class_bulletins(class_id, period, student_ids=student_ids))
+    
+    if not bulletins:
+        flash('Aucun bulletin à générer pour cette sélection.', 'warning')
+        return redirect(url_for('teacher.bulletins', period=period))
+    
+    return _send_batch(bulletins, output_format, f'bulletins_selection_P{period}',
+                       group_by_class=len(class_ids) > 1)
+
+
+@teacher_bp.route('/bulletins/generate-school')
+@login_required
+@teacher_required
+def generate_school_bulletins():
+    """Générer les bulletins de toutes les classes (fin de trimestre)"""
+    period = request.args.get('period', '')
+    output_format = request.args.get('format', 'zip')
+    
+    if not period or output_format not in OUTPUT_FORMATS:
+        flash('Paramètres de génération invalides.', 'danger')
+        return redirect(url_for('teacher.bulletins'))
+    
+    bulletins = collect_school_bulletins(period)
+    if not bulletins:
+        flash('Aucun bulletin à générer pour cette période.', 'warning')
+        return redirect(url_for('teacher.bulletins', period=period))
+    
+    return _send_batch(bulletins, output_format, f'bulletins_etablissement_P{period}',
+                       group_by_class=True)
+
+
 # ============================================
 # GESTION DES PRÉSENCES
 # ============================================
@@ -400,34 +583,26 @@ def save_attendance():
         flash('Date invalide.', 'danger')
         return redirect(url_for('teacher.attendance'))
     
-    students = User.query.filter_by(role='student', current_class_id=class_id).all()
+    period = request.form.get('period', '').strip()
     
-    for student in students:
-        status = request.form.get(f'status_{student.id}', 'present')
-        reason = request.form.get(f'reason_{student.id}', '').strip()
-        
-        # Chercher un enregistrement existant
-        record = Attendance.query.filter_by(
-            student_id=student.id,
-            class_id=class_id,
-            date=attendance_date
-        ).first()
-        
-        if record:
-            record.status = status
-            record.reason = reason if reason else None
-        else:
-            record = Attendance(
-                student_id=student.id,
-                class_id=class_id,
-                date=attendance_date,
-                status=status,
-                reason=reason if reason else None,
-                recorded_by=current_user.id
-            )
-            db.session.add(record)
+    student_ids = [student_id for (student_id,) in db.session.query(User.id)
+                   .filter_by(role='student', current_class_id=class_id).all()]
+    
+    entries = {
+        student_id: (request.form.get(f'status_{student_id}', 'present'),
+                     request.form.get(f'reason_{student_id}', '').strip())
+        for student_id in student_ids
+    }
+    
+    try:
+        save_roll_call(class_id, attendance_date, entries, recorded_by=current_user.id, period=period)
+        db.session.commit()
+    except IntegrityError:
+        # Appel enregistré en parallèle pour la même classe et le même jour
+        db.session.rollback()
+        flash('Ces présences viennent d\'être enregistrées par un autre utilisateur. Veuillez réessayer.', 'warning')
+        return redirect(url_for('teacher.attendance', class_id=class_id, date=date_str))
     
-    db.session.commit()
     flash('Présences enregistrées avec succès.', 'success')
     
     return redirect(url_for('teacher.attendance', class_id=class_id, date=date_str))
@@ -457,3 +632,64 @@ def class_detail(class_id):
     return render_template('teacher/class_detail.html',
                           school_class=school_class,
                           students=students)
+
+
+# ============================================
+# MESSAGERIE
+# ============================================
+
+@teacher_bp.route('/messages')
+@login_required
+@teacher_required
+def messages():
+    """Conversations avec les parents, de la plus récente à la plus ancienne"""
+    threads, next_cursor = thread_list(current_user.id, before=request.args.get('cursor', type=int))
+    
+    return render_template('teacher/messages.html',
+                          threads=threads,
+                          next_cursor=next_cursor,
+                          first_page=not request.args.get('cursor'),
+                          unread_messages=unread_count(current_user.id))
+
+
+@teacher_bp.route('/messages/<int:thread_id>')
+@login_required
+@teacher_required
+def view_thread(thread_id):
+    """Voir une conversation et la marquer comme lue"""
+    thread = MessageThread.query.get_or_404(thread_id)
+    
+    if not thread.has_participant(current_user.id):
+        flash('Vous n\'êtes pas autorisé à voir cette conversation.', 'danger')
+        return redirect(url_for('teacher.messages'))
+    
+    if mark_thread_read(current_user.id, thread.id):
+        db.session.commit()
+    
+    return render_template('teacher/thread.html',
+                          thread=thread,
+                          other=thread.other_participant(current_user.id),
+                          messages=thread_messages(thread.id))
+
+
+@teacher_bp.route('/messages/<int:thread_id>/reply', methods=['POST'])
+@login_required
+@teacher_required
+def reply_thread(thread_id):
+    """Répondre dans une conversation"""
+    thread = MessageThread.query.get_or_404(thread_id)
+    
+    if not thread.has_participant(current_user.id):
+        flash('Vous n\'êtes pas autorisé à voir cette conversation.', 'danger')
+        return redirect(url_for('teacher.messages'))
+    
+    content = request.form.get('content', '').strip()
+    if not content:
+        flash('Le message ne peut pas être vide.', 'danger')
+        return redirect(url_for('teacher.view_thread', thread_id=thread.id))
+    
+    reply_to_thread(thread, current_user.id, content)
+    db.session.commit()
+    
+    flash('Message envoyé avec succès.', 'success')
+    return redirect(url_for('teacher.view_thread', thread_id=thread.id))
@@ -0,0 +1,197 @@
+"""
+Moyennes matérialisées par élève et par période
+
+Maintient la table StudentPeriodSummary à jour lors de chaque écriture de note,
+afin que la lecture des moyennes et des rangs soit une simple recherche indexée.
+"""
+from sqlalchemy import func
+from gestion_scolaire import db
+from gestion_scolaire.models import Grade, User, StudentPeriodSummary
+from gestion_scolaire.ranking import compute_ranks
+from gestion_scolaire.pdf_cache import invalidate_student_bulletins
+from gestion_scolaire.class_stats import invalidate_class_analytics_on_commit
+
+
+def _mg_points():
+    """Expression SQL de la moyenne coefficientée d'une note"""
+    return (Grade.moy_cl + 2 * Grade.n_compo) / 3.0 * Grade.coef
+
+
+def refresh_student_summary(student_id, period, update_ranks=True):
+    """
+    Recalcule l'agrégat d'un élève pour une période (une requête groupée)
+    puis, si demandé, les rangs de sa classe pour cette période.
+
+    À appeler dans la même transaction que l'écriture de la note, avant le commit.
+    """
+    total_points, total_coef, grade_count = db.session.query(
+        func.sum(_mg_points()),
+        func.sum(Grade.coef),
+        func.count(Grade.id)
+    ).filter(Grade.student_id == student_id, Grade.period == period).one()
+    
+    summary = StudentPeriodSummary.query.filter_by(student_id=student_id, period=period).first()
+    
+    if not grade_count:
+        if summary:
+            db.session.delete(summary)
+    else:
+        if summary is None:
+            summary = StudentPeriodSummary(student_id=student_id, period=period)
+            db.session.add(summary)
+        summary.total_points = round(float(total_points or 0), 2)
+        summary.total_coef = int(total_coef or 0)
+        summary.general_average = round(summary.total_points / summary.total_coef, 2) if summary.total_coef > 0 else 0
+        summary.grade_count = int(grade_count)
+    
+    if update_ranks:
+        class_id = db.session.query(User.current_class_id).filter(User.id == student_id).scalar()
+        if class_id:
+            refresh_class_ranks(class_id, period)
+    
+    return summary
+
+
+def refresh_class_ranks(class_id, period):
+    """
+    Recalcule les rangs stockés d'une classe pour une période ; l'analyse
+    par matière de la classe en cache est invalidée au commit.
+    """
+    invalidate_class_analytics_on_commit(class_id)
+    db.session.flush()
+    summaries = StudentPeriodSummary.query.join(User, User.id == StudentPeriodSummary.student_id)\
+        .filter(User.current_class_id == class_id,
+                User.role == 'student',
+                StudentPeriodSummary.period == period).all()
+    
+    ranks = compute_ranks({s.student_id: s.general_average for s in summaries})
+    for summary in summaries:
+        new_rank = ranks.get(summary.student_id)
+        if summary.rank != new_rank:
+            summary.rank = new_rank
+
+
+def on_class_members_changed(*class_ids):
+    """
+    Recalcule les rangs des classes dont la composition a changé (élève
+    déplacé, supprimé ou ajouté), pour chaque période ayant des agrégats.
+
+    À appeler dans la même transaction que la modification, avant le commit.
+    """
+    class_ids = {class_id for class_id in class_ids if class_id}
+    if not class_ids:
+        return
+    invalidate_class_analytics_on_commit(*class_ids)
+    db.session.flush()
+    class_periods = db.session.query(User.current_class_id, StudentPeriodSummary.period)\
+        .join(StudentPeriodSummary, StudentPeriodSummary.student_id == User.id)\
+        .filter(User.current_class_id.in_(class_ids), User.role == 'student')\
+        .distinct().all()
+    for class_id, period in class_periods:
+        refresh_class_ranks(class_id, period)
+
+
+def on_grade_changed(student_id, *periods):
+    """
+    Met à jour les agrégats après création, modification ou suppression d'une note
+    et invalide les bulletins PDF en cache de l'élève pour ces périodes.
+    """
+    for period in set(p for p in periods if p):
+        refresh_student_summary(student_id, period)
+        invalidate_student_bulletins(student_id, period)
+
+
+def refresh_period_summaries(student_ids, period):
+    """
+    Recalcule les agrégats de plusieurs élèves pour une période (saisie groupée) :
+    une requête groupée pour les totaux, une pour les agrégats existants, puis
+    un recalcul des rangs par classe concernée.
+    """
+    student_ids = set(student_ids)
+    if not student_ids:
+        return
+    
+    totals = {
+        student_id: (total_points, total_coef, grade_count)
+        for student_id, total_points, total_coef, grade_count in db.session.query(
+            Grade.student_id,
+            func.sum(_mg_points()),
+            func.sum(Grade.coef),
+            func.count(Grade.id)
+        ).filter(Grade.student_id.in_(student_ids), Grade.period == period)
+        .group_by(Grade.student_id).all()
+    }
+    summaries = {
+        s.student_id: s for s in StudentPeriodSummary.query.filter(
+            StudentPeriodSummary.student_id.in_(student_ids),
+            StudentPeriodSummary.period == period
+        ).all()
+    }
+    
+    for student_id in student_ids:
+        summary = summaries.get(student_id)
+        if student_id not in totals:
+            if summary:
+                db.session.delete(summary)
+            continue
+        total_points, total_coef, grade_count = totals[student_id]
+        if summary is None:
+            summary = StudentPeriodSummary(student_id=student_id, period=period)
+            db.session.add(summary)
+        summary.total_points = round(float(total_points or 0), 2)
+        summary.total_coef = int(total_coef or 0)
+        summary.general_average = round(summary.total_points / summary.total_coef, 2) if summary.total_coef > 0 else 0
+        summary.grade_count = int(grade_count)
+    
+    class_ids = db.session.query(User.current_class_id)\
+        .filter(User.id.in_(student_ids), User.current_class_id.isnot(None))\
+        .distinct().all()
+    for (class_id,) in class_ids:
+        refresh_class_ranks(class_id, period)
+
+
+def on_grades_changed(student_ids, period):
+    """Équivalent groupé de on_grade_changed pour plusieurs élèves d'une même période"""
+    student_ids = set(student_ids)
+    refresh_period_summaries(student_ids, period)
+    for student_id in student_ids:
+        invalidate_student_bulletins(student_id, period)
+
+
+def get_period_summaries(student_id):
+    """Retourne les agrégats d'un élève indexés par période"""
+    summaries = StudentPeriodSummary.query.filter_by(student_id=student_id).all()
+    return {s.period: s for s in summaries}
+
+
+def rebuild_all_summaries():
+    """Reconstruit entièrement la table des agrégats (initialisation / rattrapage)"""
+    StudentPeriodSummary.query.delete()
+    
+    rows = db.session.query(
+        Grade.student_id,
+        Grade.period,
+        func.sum(_mg_points()),
+        func.sum(Grade.coef),
+        func.count(Grade.id)
+    ).group_by(Grade.student_id, Grade.period).all()
+    
+    for student_id, period, total_points, total_coef, grade_count in rows:
+        total_points = round(float(total_points or 0), 2)
+        total_coef = int(total_coef or 0)
+        db.session.add(StudentPeriodSummary(
+            student_id=student_id,
+            period=period,
+            total_points=total_points,
+            total_coef=total_coef,
+            general_average=round(total_points / total_coef, 2) if total_coef > 0 else 0,
+            grade_count=int(grade_count)
+        ))
+    db.session.flush()
+    
+    class_periods = db.session.query(User.current_class_id, StudentPeriodSummary.period)\
+        .join(StudentPeriodSummary, StudentPeriodSummary.student_id == User.id)\
+        .filter(User.current_class_id.isnot(None))\
+        .distinct().all()
+    for class_id, period in class_periods:
+        refresh_class_ranks(class_id, period)
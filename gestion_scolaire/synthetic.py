@@ -0,0 +1,371 @@
+"""
+Jeu de données synthétique pour les mesures de performance
+
+Construit un établissement réaliste de taille configurable (500 à 50 000
+élèves) : classes et structures de bulletin, enseignants, élèves, parents
+(fratries), trois périodes de notes, une année de présences, messages,
+annonces et journal d'audit.
+
+Les données sont déterministes pour une graine donnée (dates comprises,
+relatives à REFERENCE_NOW) et insérées en masse (executemany par paquets)
+avec des identifiants attribués à l'avance, sans aller-retour par ligne ;
+sous PostgreSQL, les séquences des clés primaires sont ensuite recalées.
+Tous les comptes générés partagent le mot de passe SYNTHETIC_PASSWORD,
+haché une seule fois.
+"""
+import math
+import random
+import time
+from datetime import date, datetime, timedelta
+from werkzeug.security import generate_password_hash
+from gestion_scolaire import db
+from gestion_scolaire.models import (
+    User, SchoolClass, Subject, Grade, BulletinStructure, AcademicYear,
+    Attendance, Message, Announcement, AuditLog, parent_student, teacher_subject
+)
+from gestion_scolaire.messaging import recount_unread_messages, assign_message_threads
+
+MIN_STUDENTS = 500
+MAX_STUDENTS = 50000
+INSERT_BATCH_SIZE = 5000
+SYNTHETIC_PASSWORD = 'synthetic123'
+SYNTHETIC_PREFIX = 'syn'
+PERIODS = ['1', '2', '3']
+REFERENCE_NOW = datetime(2025, 6, 30, 18, 0)  # « Maintenant » du jeu de données
+
+# Niveaux et matières (partie 1 / partie 2 du bulletin, coefficient)
+LEVELS = {
+    '10e': ([('Mathématiques', 4), ('Français', 4), ('Anglais', 3), ('Histoire-Géographie', 3),
+             ('Physique', 3), ('SVT', 3)],
+            [('E.C.M', 1), ('EPS', 1), ('Espagnol', 2)]),
+    '11e Sc': ([('Mathématiques', 5), ('Physique', 4), ('Chimie', 4), ('SVT', 3),
+                ('Français', 3), ('Anglais', 2)],
+               [('E.C.M', 1), ('EPS', 1), ('Informatique', 2)]),
+    '11e L': ([('Français', 5), ('Philosophie', 4), ('Histoire-Géographie', 4), ('Anglais', 4),
+               ('Mathématiques', 2), ('Espagnol', 3)],
+              [('E.C.M', 1), ('EPS', 1), ('Allemand', 2)]),
+    '12e SE': ([('Mathématiques', 5), ('Physique', 5), ('Chimie', 4), ('Philosophie', 2),
+                ('Anglais', 2), ('Informatique', 2)],
+               [('E.C.M', 1), ('EPS', 1), ('Français', 2)]),
+    '12e EXP': ([('Mathématiques', 5), ('Physique', 4), ('Chimie', 4), ('Philosophie', 3),
+                 ('Anglais', 3), ('SVT', 3)],
+                [('E.C.M', 2), ('EPS', 2), ('Informatique', 2)]),
+    '12e SS': ([('Philosophie', 4), ('Histoire-Géographie', 4), ('Français', 4), ('Anglais', 3),
+                ('Mathématiques', 2), ('SVT', 2)],
+               [('E.C.M', 1), ('EPS', 1), ('Espagnol', 2)])
+}
+
+FIRST_NAMES = [
+    'Aminata', 'Moussa', 'Fatoumata', 'Ibrahim', 'Awa', 'Seydou', 'Mariam', 'Oumar', 'Kadiatou',
+    'Boubacar', 'Aïssata', 'Mamadou', 'Hawa', 'Souleymane', 'Djeneba', 'Adama', 'Rokia', 'Bakary',
+    'Alice', 'Lucas', 'Emma', 'Hugo', 'Chloé', 'Louis', 'Inès', 'Jules', 'Léa', 'Nathan', 'Sarah', 'Yanis'
+]
+LAST_NAMES = [
+    'Traoré', 'Diarra', 'Coulibaly', 'Keïta', 'Koné', 'Sangaré', 'Touré', 'Cissé', 'Diallo', 'Sidibé',
+    'Sissoko', 'Dembélé', 'Camara', 'Konaté', 'Haïdara', 'Maïga', 'Martin', 'Bernard', 'Dubois',
+    'Durand', 'Lefebvre', 'Moreau', 'Laurent', 'Simon', 'Michel', 'Garcia', 'Roux', 'Fournier'
+]
+ABSENCE_REASONS = ['Maladie', 'Rendez-vous médical', 'Raison familiale', None]
+AUDIT_ACTIONS = ['user_login', 'grade_created', 'grade_updated', 'attendance_saved', 'bulletin_downloaded']
+MESSAGE_SUBJECTS = ['Absence', 'Résultats du trimestre', 'Rendez-vous', 'Comportement en classe', 'Devoirs']
+
+
+class SyntheticReport:
+    """Volumes insérés et durée de génération"""
+
+    def __init__(self, seed):
+        self.seed = seed
+        self.counts = {}
+        self.elapsed = 0.0
+
+    def to_dict(self):
+        return {'seed': self.seed, 'counts': self.counts, 'elapsed': round(self.elapsed, 2)}
+
+    def __repr__(self):
+        total = sum(self.counts.values())
+        return f'<SyntheticReport {total} rows in {self.elapsed:.1f}s (seed {self.seed})>'
+
+
+def _next_id(model):
+    return (db.session.query(db.func.max(model.id)).scalar() or 0) + 1
+
+
+def _sync_id_sequence(model):
+    """
+    Recale la séquence de la clé primaire après des insertions à identifiants
+    explicites (PostgreSQL ne l'avance pas ; SQLite repart de max(id)).
+    """
+    if db.session.get_bind().dialect.name != 'postgresql':
+        return
+    table = model.__tablename__
+    db.session.execute(db.text(
+        f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), (SELECT max(id) FROM {table}))"
+    ))
+    db.session.commit()
+
+
+def _bulk_insert(table, rows, report, key):
+    """Insère un itérable de dicts par paquets de INSERT_BATCH_SIZE"""
+    batch = []
+    count = 0
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= INSERT_BATCH_SIZE:
+            db.session.execute(table.insert(), batch)
+            count += len(batch)
+            batch = []
+    if batch:
+        db.session.execute(table.insert(), batch)
+        count += len(batch)
+    db.session.commit()
+    report.counts[key] = report.counts.get(key, 0) + count
+    return count
+
+
+def _school_days(start, count):
+    """Les count premiers jours ouvrés (lundi-vendredi) à partir de start"""
+    days = []
+    day = start
+    while len(days) < count:
+        if day.weekday() < 5:
+            days.append(day)
+        day += timedelta(days=1)
+    return days
+
+
+def _mark(rng, mean):
+    """Note sur 20 autour du niveau de l'élève, au quart de point"""
+    return round(min(20.0, max(0.0, rng.gauss(mean, 2.5))) * 4) / 4
+
+
+def generate_school(students=2000, seed=42, students_per_class=40, attendance_days=180, progress=None):
+    """
+    Génère un établissement synthétique dans la base courante.
+
+    Args:
+        students: Nombre d'élèves (MIN_STUDENTS à MAX_STUDENTS)
+        seed: Graine aléatoire ; même graine et mêmes paramètres = mêmes données
+        students_per_class: Effectif par classe
+        attendance_days: Jours ouvrés de présences (depuis la rentrée)
+        progress: Fonction appelée avec un message après chaque étape
+
+    Returns:
+        SyntheticReport
+    """
+    if not MIN_STUDENTS <= students <= MAX_STUDENTS:
+        raise ValueError(f"Le nombre d'élèves doit être entre {MIN_STUDENTS} et {MAX_STUDENTS}")
+    if db.session.query(User.id).filter(User.username.like(f'{SYNTHETIC_PREFIX}%')).first():
+        raise ValueError('La base contient déjà des données synthétiques (utilisez --reset)')
+
+    start_time = time.perf_counter()
+    rng = random.Random(seed)
+    report = SyntheticReport(seed)
+    progress = progress or (lambda message: None)
+    password_hash = generate_password_hash(SYNTHETIC_PASSWORD)
+    now = REFERENCE_NOW
+
+    # Année scolaire courante
+    year_start = date(2024, 9, 2)
+    year = AcademicYear.query.filter_by(name='2024-2025').first()
+    if not year:
+        AcademicYear.query.update({AcademicYear.is_current: False})
+        year = AcademicYear(name='2024-2025', start_date=year_start, end_date=date(2025, 6, 30), is_current=True)
+        db.session.add(year)
+        db.session.commit()
+
+    # Matières
+    subject_names = sorted({name for part1, part2 in LEVELS.values() for name, _coef in part1 + part2})
+    subject_ids = dict(db.session.query(Subject.name, Subject.id).filter(Subject.name.in_(subject_names)).all())
+    missing = [name for name in subject_names if name not in subject_ids]
+    if missing:
+        _bulk_insert(Subject.__table__, ({'name': name, 'default_coef': 1, 'is_active': True, 'created_at': now}
+                                         for name in missing), report, 'subjects')
+        subject_ids = dict(db.session.query(Subject.name, Subject.id).filter(Subject.name.in_(subject_names)).all())
+
+    # Enseignants : environ un pour 25 élèves, une ou deux matières chacun
+    next_user_id = _next_id(User)
+    teacher_count = max(len(subject_names), students // 25)
+    teachers = []
+    teacher_rows = []
+    for n in range(teacher_count):
+        teacher_id = next_user_id + n
+        subjects = {subject_names[n % len(subject_names)], rng.choice(subject_names)}
+        teachers.append((teacher_id, subjects))
+        teacher_rows.append({
+            'id': teacher_id, 'username': f'{SYNTHETIC_PREFIX}_t{n:05d}', 'password_hash': password_hash,
+            'email': f'{SYNTHETIC_PREFIX}_t{n:05d}@ecole.test', 'role': 'teacher', 'is_active': True,
+            'first_name': rng.choice(FIRST_NAMES), 'last_name': rng.choice(LAST_NAMES),
+            'created_at': now, 'updated_at': now
+        })
+    next_user_id += teacher_count
+    _bulk_insert(User.__table__, teacher_rows, report, 'teachers')
+    _bulk_insert(teacher_subject, ({'teacher_id': teacher_id, 'subject_id': subject_ids[name]}
+                                   for teacher_id, subjects in teachers for name in subjects),
+                 report, 'teacher_subjects')
+    teachers_by_subject = {}
+    for teacher_id, subjects in teachers:
+        for name in subjects:
+            teachers_by_subject.setdefault(name, []).append(teacher_id)
+    progress(f'{teacher_count} enseignants')
+
+    # Classes et structures de bulletin
+    class_count = math.ceil(students / students_per_class)
+    level_names = list(LEVELS)
+    next_class_id = _next_id(SchoolClass)
+    classes = []
+    for n in range(class_count):
+        level = level_names[n % len(level_names)]
+        classes.append({
+            'id': next_class_id + n, 'name': f'{level} {SYNTHETIC_PREFIX.upper()}{n // len(level_names) + 1:03d}',
+            'level': level, 'capacity': students_per_class, 'academic_year_id': year.id,
+            'main_teacher_id': teachers[n % teacher_count][0], 'created_at': now, 'updated_at': now
+        })
+    _bulk_insert(SchoolClass.__table__, classes, report, 'classes')
+    _sync_id_sequence(SchoolClass)
+    _bulk_insert(BulletinStructure.__table__, ({
+        'school_class_id': school_class['id'],
+        'subjects_part1': ','.join(name for name, _coef in LEVELS[school_class['level']][0]),
+        'subjects_part2': ','.join(name for name, _coef in LEVELS[school_class['level']][1]),
+        'title': 'Bulletin de notes', 'created_at': now, 'updated_at': now
+    } for school_class in classes), report, 'bulletin_structures')
+    progress(f'{class_count} classes')
+
+    # Élèves (niveau propre à chaque élève) puis parents par fratrie
+    student_rows = []
+    abilities = {}
+    for n in range(students):
+        student_id = next_user_id + n
+        school_class = classes[n % class_count]
+        abilities[student_id] = (school_class, min(18.0, max(4.0, rng.gauss(11.5, 3))))
+        student_rows.append({
+            'id': student_id, 'username': f'{SYNTHETIC_PREFIX}{n:06d}', 'password_hash': password_hash,
+            'role': 'student', 'is_active': True, 'current_class_id': school_class['id'],
+            'first_name': rng.choice(FIRST_NAMES), 'last_name': rng.choice(LAST_NAMES),
+            'gender': rng.choice(['M', 'F']), 'matricule': f'{SYNTHETIC_PREFIX.upper()}{n:06d}',
+            'date_of_birth': date(2006 + rng.randint(0, 3), rng.randint(1, 12), rng.randint(1, 28)),
+            'created_at': now, 'updated_at': now
+        })
+    next_user_id += students
+    _bulk_insert(User.__table__, student_rows, report, 'students')
+    student_ids = [row['id'] for row in student_rows]
+    progress(f'{students} élèves')
+
+    parent_rows = []
+    links = []
+    index = 0
+    while index < students:
+        siblings = student_ids[index:index + rng.choice([1, 1, 1, 2, 2, 3])]
+        index += len(siblings)
+        for _parent in range(rng.choice([1, 2])):
+            parent_id = next_user_id + len(parent_rows)
+            parent_rows.append({
+                'id': parent_id, 'username': f'{SYNTHETIC_PREFIX}_p{len(parent_rows):06d}',
+                'password_hash': password_hash, 'role': 'parent', 'is_active': True,
+                'first_name': rng.choice(FIRST_NAMES), 'last_name': rng.choice(LAST_NAMES),
+                'phone': f'+223 7{rng.randint(0, 9999999):07d}', 'created_at': now, 'updated_at': now
+            })
+            links.extend({'parent_id': parent_id, 'student_id': student_id} for student_id in siblings)
+    next_user_id += len(parent_rows)
+    _bulk_insert(User.__table__, parent_rows, report, 'parents')
+    _sync_id_sequence(User)
+    _bulk_insert(parent_student, links, report, 'parent_links')
+    progress(f'{len(parent_rows)} parents')
+
+    # Notes : trois périodes, toutes les matières de la structure de la classe
+    def grade_rows():
+        for period_index, period in enumerate(PERIODS):
+            grade_date = datetime.combine(year_start, datetime.min.time()) + timedelta(days=90 * period_index + 80)
+            for student_id in student_ids:
+                school_class, ability = abilities[student_id]
+                part1, part2 = LEVELS[school_class['level']]
+                for name, coef in part1 + part2:
+                    moy_cl = _mark(rng, ability)
+                    n_compo = _mark(rng, ability)
+                    yield {
+                        'student_id': student_id, 'subject_id': subject_ids[name], 'subject_name': name,
+                        'moy_cl': moy_cl, 'n_compo': n_compo, 'coef': coef, 'period': period,
+                        'academic_year': year.name,
+                        'appreciation': Grade.get_appreciation(round((moy_cl + 2 * n_compo) / 3, 2)),
+                        'teacher_id': rng.choice(teachers_by_subject[name]),
+                        'date': grade_date, 'created_at': grade_date, 'updated_at': grade_date
+                    }
+    _bulk_insert(Grade.__table__, grade_rows(), report, 'grades')
+    progress(f"{report.counts['grades']} notes")
+
+    from gestion_scolaire.summaries import rebuild_all_summaries
+    rebuild_all_summaries()
+    db.session.commit()
+    progress('Moyennes et rangs calculés')
+
+    # Présences : un relevé par élève et par jour ouvré
+    statuses = ['present', 'late', 'absent', 'excused']
+    weights = [92, 3, 4, 1]
+
+    def attendance_rows():
+        for day in _school_days(year_start, attendance_days):
+            for student_id in student_ids:
+                school_class, _ability = abilities[student_id]
+                status = rng.choices(statuses, weights)[0]
+                yield {
+                    'student_id': student_id, 'class_id': school_class['id'], 'date': day, 'period': '',
+                    'status': status,
+                    'reason': rng.choice(ABSENCE_REASONS) if status in ('absent', 'excused') else None,
+                    'recorded_by': school_class['main_teacher_id'], 'created_at': now
+                }
+    _bulk_insert(Attendance.__table__, attendance_rows(), report, 'attendance')
+    progress(f"{report.counts['attendance']} relevés de présence")
+
+    # Messages entre parents et enseignants
+    parent_ids = [row['id'] for row in parent_rows]
+    teacher_ids = [teacher_id for teacher_id, _subjects in teachers]
+
+    def message_rows():
+        for _n in range(students):
+            parent_id, teacher_id = rng.choice(parent_ids), rng.choice(teacher_ids)
+            sender, recipient = (parent_id, teacher_id) if rng.random() < 0.6 else (teacher_id, parent_id)
+            sent_at = now - timedelta(minutes=rng.randint(0, 60 * 24 * 200))
+            is_read = rng.random() < 0.7
+            yield {
+                'sender_id': sender, 'recipient_id': recipient, 'subject': rng.choice(MESSAGE_SUBJECTS),
+                'content': 'Message généré pour les tests de performance.', 'is_read': is_read,
+                'read_at': sent_at + timedelta(hours=rng.randint(1, 48)) if is_read else None,
+                'created_at': sent_at
+            }
+    _bulk_insert(Message.__table__, message_rows(), report, 'messages')
+    report.counts['message_threads'] = assign_message_threads()
+    recount_unread_messages()
+    db.session.commit()
+
+    # Annonces : générales et par classe
+    author_id = db.session.query(User.id).filter_by(role='admin').order_by(User.id).scalar() or teacher_ids[0]
+    audiences = ['all', 'teachers', 'students', 'parents']
+
+    def announcement_rows():
+        for n in range(max(20, class_count // 5)):
+            created = now - timedelta(days=rng.randint(0, 200))
+            target_class = rng.choice(classes) if n % 3 == 0 else None
+            yield {
+                'title': f'Annonce {n + 1}', 'content': 'Annonce générée pour les tests de performance.',
+                'target_audience': 'all' if target_class else rng.choice(audiences),
+                'target_class_id': target_class['id'] if target_class else None,
+                'priority': rng.choice(['low', 'normal', 'normal', 'high']), 'is_active': rng.random() < 0.8,
+                'expires_at': created + timedelta(days=rng.randint(7, 120)) if rng.random() < 0.5 else None,
+                'author_id': author_id, 'created_at': created, 'updated_at': created
+            }
+    _bulk_insert(Announcement.__table__, announcement_rows(), report, 'announcements')
+
+    # Journal d'audit : environ cinq actions par élève sur l'année
+    actors = teacher_ids + student_ids + parent_ids
+
+    def audit_rows():
+        for _n in range(students * 5):
+            yield {
+                'user_id': rng.choice(actors), 'action': rng.choice(AUDIT_ACTIONS),
+                'entity_type': 'User', 'ip_address': f'10.0.{rng.randint(0, 255)}.{rng.randint(1, 254)}',
+                'created_at': now - timedelta(minutes=rng.randint(0, 60 * 24 * 300))
+            }
+    _bulk_insert(AuditLog.__table__, audit_rows(), report, 'audit_logs')
+    progress('Messages, annonces et journal d\'audit')
+
+    report.elapsed = time.perf_counter() - start_time
+    return report
@@ -0,0 +1,142 @@
+"""
+Cache des utilisateurs connectés
+
+Le user_loader de Flask-Login est appelé à chaque requête authentifiée. Au
+lieu de recharger la ligne users (et les enfants d'un parent), il renvoie un
+UserPrincipal construit à partir d'un cache en mémoire par processus, avec
+une durée de vie (USER_CACHE_TTL). Les champs courants (id, rôle, nom,
+classe, enfants) sont servis par le cache ; tout autre attribut charge
+l'objet User à la demande, une fois par requête.
+
+Les routes qui modifient ces champs appellent invalidate_user ; dans un
+déploiement à plusieurs processus, les autres processus voient la
+modification au plus tard à l'expiration du TTL.
+"""
+from flask import current_app
+from flask_login import UserMixin
+from gestion_scolaire import db
+from gestion_scolaire.cache import TTLCache
+from gestion_scolaire.models import User, parent_student
+
+PRINCIPAL_COLUMNS = (
+    User.id, User.username, User.role, User.first_name, User.last_name,
+    User.email, User.current_class_id, User.is_active
+)
+USER_CACHE_MAX_ENTRIES = 10000
+
+
+class UserPrincipal(UserMixin):
+    """
+    Utilisateur courant servi par le cache.
+
+    Se comporte comme User : les attributs absents du cache (relations,
+    check_password...) et les affectations sont délégués à l'objet User,
+    chargé au premier besoin.
+    """
+
+    def __init__(self, data, children_ids):
+        object.__setattr__(self, '_data', dict(data))
+        object.__setattr__(self, '_children_ids', children_ids)
+        object.__setattr__(self, '_user', None)
+
+    def _record(self):
+        user = self.__dict__['_user']
+        if user is None:
+            user = db.session.get(User, self.__dict__['_data']['id'])
+            object.__setattr__(self, '_user', user)
+        return user
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        data = self.__dict__['_data']
+        if name in data:
+            return data[name]
+        return getattr(self._record(), name)
+
+    def __setattr__(self, name, value):
+        if name.startswith('_'):
+            object.__setattr__(self, name, value)
+            return
+        setattr(self._record(), name, value)
+        if name in self.__dict__['_data']:
+            self.__dict__['_data'][name] = value
+
+    @property
+    def is_active(self):
+        return bool(self._data['is_active'])
+
+    @property
+    def children_ids(self):
+        """Identifiants des enfants d'un parent (frozenset)"""
+        return self._children_ids
+
+    def has_child(self, student_id):
+        return student_id in self._children_ids
+
+    @property
+    def full_name(self):
+        if self._data['first_name'] and self._data['last_name']:
+            return f"{self._data['first_name']} {self._data['last_name']}"
+        return self._data['username']
+
+    @property
+    def school_class_id(self):
+        return self._data['current_class_id']
+
+    def is_admin(self):
+        return self._data['role'] == 'admin'
+
+    def is_teacher(self):
+        return self._data['role'] == 'teacher'
+
+    def is_student(self):
+        return self._data['role'] == 'student'
+
+    def is_parent(self):
+        return self._data['role'] == 'parent'
+
+    def __repr__(self):
+        return f"<UserPrincipal {self._data['username']} ({self._data['role']})>"
+
+
+def get_user_cache(app=None):
+    """Retourne le cache d'utilisateurs de l'application (créé à la demande)"""
+    app = app or current_app._get_current_object()
+    cache = app.extensions.get('user_cache')
+    if cache is None:
+        cache = TTLCache(app.config['USER_CACHE_TTL'], USER_CACHE_MAX_ENTRIES)
+        app.extensions['user_cache'] = cache
+    return cache
+
+
+def _fetch_principal_data(user_id):
+    """Champs du principal et enfants (deux requêtes au plus), None si inconnu"""
+    row = db.session.query(*PRINCIPAL_COLUMNS).filter(User.id == user_id).first()
+    if row is None:
+        return None
+    data = row._asdict()
+    children_ids = frozenset()
+    if data['role'] == 'parent':
+        children_ids = frozenset(
+            student_id for (student_id,) in db.session.query(parent_student.c.student_id)
+            .filter(parent_student.c.parent_id == user_id).all()
+        )
+    return data, children_ids
+
+
+def load_principal(user_id):
+    """user_loader : principal depuis le cache, sinon depuis la base"""
+    cache = get_user_cache()
+    value = cache.get(user_id)
+    if value is None:
+        value = _fetch_principal_data(user_id)
+        if value is None:
+            return None
+        cache.set(user_id, value)
+    return UserPrincipal(*value)
+
+
+def invalidate_user(*user_ids):
+    """À appeler après modification du profil, du rôle, de la classe ou des enfants"""
+    get_user_cache().invalidate(*user_ids)